@@ -1,11 +1,16 @@
 # -*- coding: utf-8 -*-
-from tictactoe_env import TicTacToeEnv
+from tictactoe_env import TicTacToeEnv, set_verbosity, pack_state, \
+    BITS_TO_PLANE
+from symmetry import canonical_code, inverse_transform_edge
+from selfplay_data import load_tree
 from gym.utils import seeding
 import numpy as np
-import h5py
-from collections import deque, defaultdict
+import argparse
+import logging
 
 
+logger = logging.getLogger(__name__)
+
 PLAYER = 0
 OPPONENT = 1
 MARK_O = 2
@@ -13,91 +18,144 @@ N, W, Q, P = 0, 1, 2, 3
 episode_count = 400
 
 
+# temperature: pi 계산 방식
+#  None: 방문 횟수의 softmax (기본값)
+#  τ > 0: AlphaZero 방식 N^(1/τ) 정규화, τ = 0: 방문 횟수가 최대인 칸만 (동점이면 나눠 가짐)
+# pi는 빈칸에만 확률을 줌 (이미 찬 칸은 0, 빈칸끼리 다시 정규화)
 class ZeroTree(object):
-    def __init__(self):
+    def __init__(self, data_dir='data', symmetry=True, block_size=65536,
+                 temperature=None):
+        self.data_dir = data_dir
+        # 대칭인 state를 대표 node 하나로 모아서 트리 구성
+        self.symmetry = symmetry
+        self.block_size = block_size
+        self.node_data = None
+        self.edge_data = None
+        self.tree_memory = {}
         self._load_data()
-        self.node_memory = deque(maxlen=len(self.state_memory))
-        self.tree_memory = defaultdict(lambda: 0)
         self._make_tree()
 
         # hyperparameter
         self.epsilon = 0.25
         self.alpha = 1.5
 
-        self.visit_count = deque(maxlen=9)
-        self.pi_val = deque(maxlen=9)
-        self.e_x = deque(maxlen=9)
-        self.state_data = deque(maxlen=len(self.tree_memory))
-        self.pi_data = deque(maxlen=len(self.tree_memory))
+        self.temperature = temperature
+        # (node 수, 3, 3) pi 배열 (node_data와 같은 순서)
+        self.pi_array = None
+        # dict{node: pi}: state의 packed code로 pi를 바로 찾음
+        self.pi_data = {}
         self._cal_pi()
+        self.seed()
+
+        # get_pi 호출 집계: 학습된 정책 사용 / 랜덤 정책 사용
+        self.hit_count = 0
+        self.miss_count = 0
+
+    def seed(self, seed=None):
+        self.np_random, seed = seeding.np_random(seed)
+        return [seed]
 
     def _load_data(self):
-        hfs = h5py.File('data/state_memory.hdf5', 'r')
-        state_memory = hfs.get('state')
-        self.state_memory = deque(state_memory)
-        hfs.close()
-        hfe = h5py.File('data/edge_memory.hdf5', 'r')
-        edge_memory = hfe.get('edge')
-        self.edge_memory = deque(edge_memory)
-        hfe.close()
+        # 블록 단위로 읽으면서 node(packed code)별로 edge를 바로 합침
+        self.node_data, self.edge_data = load_tree(
+            self.data_dir, self.symmetry, self.block_size)
 
     def _make_tree(self):
-        for v in self.state_memory:
-            v_tuple = tuple(v)
-            self.node_memory.append(v_tuple)
-        tree_tmp = list(zip(self.node_memory, self.edge_memory))
-        for v in tree_tmp:
-            self.tree_memory[v[0]] += v[1]
+        # 합친 edge 배열의 행을 node로 찾을 수 있게 dict{node: edge}
+        self.tree_memory = dict(zip(self.node_data.tolist(), self.edge_data))
 
     def _cal_pi(self):
-        for k, v in self.tree_memory.items():
-            self.state_data.append(k)
-            for r in range(3):
-                for c in range(3):
-                    self.visit_count.append(v[r][c][0])
-            self.pi_data.append(self.softmax(self.visit_count))
-
-    def softmax(self, visit_count):
-        for i in range(9):
-            self.e_x.append(
-                np.exp(visit_count[i] - np.max(visit_count)))
-        for j in range(9):
-            self.pi_val.append(self.e_x[j] / np.sum(self.e_x, axis=0))
-        return np.asarray(self.pi_val).reshape((3, 3))
+        # 모든 node의 방문 횟수를 (node 수, 9) 행렬로 모아 한번에 계산
+        visit_count = self.edge_data[:, :, :, N].reshape(-1, 9)
+        # node(대표 state)의 빈칸 마스크, 대표 좌표 기준이라 pi와 같은 좌표
+        codes = self.node_data.astype('int64')
+        legal = BITS_TO_PLANE[(codes | codes >> 9) & 511] == 0
+        if self.temperature is None:
+            pi = self.softmax(visit_count, legal)
+        else:
+            pi = self.visit_pi(visit_count, self.temperature, legal)
+        self.pi_array = pi.reshape(-1, 3, 3)
+        self.pi_data = dict(zip(self.node_data.tolist(), self.pi_array))
+
+    def set_temperature(self, temperature=None):
+        '''temperature를 바꾸고 모든 node의 pi를 다시 계산'''
+        self.temperature = temperature
+        self._cal_pi()
+
+    def _legal(self, visit_count, legal):
+        '''legal (..., 9) 마스크 (없거나 빈칸이 없는 행은 9칸 모두)'''
+        if legal is None:
+            return np.ones(visit_count.shape, bool)
+        legal = np.asarray(legal, bool)
+        return legal | ~legal.any(axis=-1, keepdims=True)
+
+    def softmax(self, visit_count, legal=None):
+        '''(..., 9) 방문 횟수의 softmax (행마다 최댓값을 빼서 overflow 방지)
+           legal을 주면 빈칸끼리만 (찬 칸은 0)
+        '''
+        visit_count = np.asarray(visit_count, 'float')
+        legal = self._legal(visit_count, legal)
+        visit_count = np.where(legal, visit_count, -np.inf)
+        e_x = np.exp(visit_count - visit_count.max(axis=-1, keepdims=True))
+        return e_x / e_x.sum(axis=-1, keepdims=True)
+
+    def visit_pi(self, visit_count, temperature=1., legal=None):
+        '''(..., 9) 방문 횟수로 AlphaZero 방식 pi = N^(1/τ) / sum(N^(1/τ))
+           방문이 없는 node는 빈칸(legal이 없으면 9칸)에 동일 확률
+        '''
+        visit_count = np.asarray(visit_count, 'float')
+        legal = self._legal(visit_count, legal)
+        visit_count = np.where(legal, visit_count, 0.)
+        if temperature == 0:
+            pi = (visit_count == visit_count.max(axis=-1, keepdims=True))
+            pi = pi & legal
+            pi = pi.astype('float')
+        else:
+            # 최댓값으로 나눠서 거듭제곱해도 overflow 나지 않게
+            top = np.maximum(visit_count.max(axis=-1, keepdims=True), 1)
+            pi = (visit_count / top) ** (1. / temperature)
+        total = pi.sum(axis=-1, keepdims=True)
+        uniform = legal / legal.sum(axis=-1, keepdims=True)
+        pi = np.where(total > 0, pi / np.maximum(total, 1e-300), uniform)
+        return pi
 
     def get_pi(self, state):
-        self.state = state.copy()
-        board = self.state[PLAYER] + self.state[OPPONENT] * 2
-        if tuple(state.flatten()) in self.state_data:
-            i = tuple(self.state.flatten())
-            j = self.state_data.index(i)
-            pi = self.pi_data[j]
-            print("----- board -----")
-            print(board)
-            print('-- zero policy --')
-            print(pi.round(decimals=4))
+        # state는 복사하지 않고 packed code로만 찾음 (보드는 출력, 랜덤 정책 때만 만듦)
+        node, transform = pack_state(state), 0
+        if self.symmetry:
+            node, transform = canonical_code(node)
+        pi = self.pi_data.get(node)
+        if pi is not None:
+            # 대표 좌표의 pi를 현재 state 좌표로 되돌림
+            pi = inverse_transform_edge(pi, transform)
+            self.hit_count += 1
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('----- board -----\n%s\n-- zero policy --\n%s',
+                             state[PLAYER] + state[OPPONENT] * 2,
+                             pi.round(decimals=4))
             return pi
         else:
+            board = state[PLAYER] + state[OPPONENT] * 2
             empty_loc = np.asarray(np.where(board == 0)).transpose()
             legal_move_n = empty_loc.shape[0]
-            pi = np.zeros((3, 3, 3), 'float')
+            pi = np.zeros((3, 3), 'float')
             prob = 1 / legal_move_n
             pr = (1 - self.epsilon) * prob + self.epsilon * \
                 self.np_random.dirichlet(self.alpha * np.ones(legal_move_n))
             for i in range(legal_move_n):
-                pi[empty_loc[i][0]][empty_loc[i][1]][P] = pr[i]
-            print("----- board -----")
-            print(board)
-            print('- ramdom policy -')
-            print(pi.round(decimals=4))
+                pi[empty_loc[i][0]][empty_loc[i][1]] = pr[i]
+            self.miss_count += 1
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('----- board -----\n%s\n- ramdom policy -\n%s',
+                             board, pi.round(decimals=4))
             return pi
 
 
 # 에이전트 클래스 (실제 플레이 용)
 class ZeroAgent(object):
-    def __init__(self):
+    def __init__(self, data_dir='data', symmetry=True, temperature=None):
         # 학습한 모델 불러오기
-        self.model = ZeroTree()
+        self.model = ZeroTree(data_dir, symmetry, temperature=temperature)
 
         # action space 좌표 공간 구성
         self.action_space = self._action_space()
@@ -119,6 +177,8 @@ class ZeroAgent(object):
 
     def seed(self, seed=None):
         self.np_random, seed = seeding.np_random(seed)
+        # 처음 보는 state의 랜덤 정책도 같은 시드로 재현
+        self.model.seed(seed)
         return [seed]
 
     def _action_space(self):
@@ -159,18 +219,29 @@ class ZeroAgent(object):
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-v', '--verbose', action='store_const', const=2,
+                        default=1, dest='verbosity', help='매 수마다 보드 출력')
+    parser.add_argument('-q', '--quiet', action='store_const', const=0,
+                        dest='verbosity', help='출력 없이 실행')
+    parser.add_argument('--temperature', type=float, default=None,
+                        help='pi = N^(1/τ) 정규화 (없으면 방문 횟수의 softmax)')
+    args = parser.parse_args()
+    set_verbosity(args.verbosity)
+    debug = logger.isEnabledFor(logging.DEBUG)
     # 환경 생성 및 시드 설정
     env = TicTacToeEnv()
     env.seed(2018)
     # 에이전트 생성 및 시드 생성
-    my_agent = ZeroAgent()
+    my_agent = ZeroAgent(temperature=args.temperature)
     my_agent.seed(2018)
     # 통계용
     result = {1: 0, 0: 0, -1: 0}
     # play game
     for e in range(episode_count):
         state = env.reset()
-        print('-' * 15, '\nepisode: %d' % (e + 1))
+        if debug:
+            logger.debug('%s\nepisode: %d', '-' * 15, e + 1)
         # 첫턴을 나와 상대 중 누가 할지 정하기
         my_agent.first_turn = my_agent.np_random.choice(2, replace=False)
         done = False
@@ -181,10 +252,13 @@ if __name__ == "__main__":
             state, reward, done, info = env.step(action)
         if done:
             # 승부난 보드 보기: 내 착수:1, 상대 착수:2
-            print(state[PLAYER] + state[OPPONENT] * 2)
+            if debug:
+                logger.debug(state[PLAYER] + state[OPPONENT] * 2)
             # 결과 dict에 기록
             result[reward] += 1
             my_agent.reset_episode()
     # 에피소드 통계
-    print('-' * 15, '\nWin: %d Lose: %d Draw: %d Winrate: %0.1f%%' %
-          (result[1], result[-1], result[0], result[1] / episode_count * 100))
+    logger.info('%s\nWin: %d Lose: %d Draw: %d Winrate: %0.1f%% ZeroPolicy: %d RandomPolicy: %d',
+                '-' * 15, result[1], result[-1], result[0],
+                result[1] / episode_count * 100,
+                my_agent.model.hit_count, my_agent.model.miss_count)
@@ -0,0 +1,578 @@
+# -*- coding: utf-8 -*-
+'''핫패스 성능 측정용 스크립트
+   python benchmark.py 로 실행하면 벤치마크 묶음(SUITE)을 돌려 지표별 결과를 출력함
+   모든 벤치마크는 고정 시드를 쓰고, 측정 전에 한번 돌려서 워밍업한 뒤
+   repeat번 측정한 최고값을 씀 (잡음은 느려지는 쪽으로만 끼므로 중앙값보다 안정적)
+   --output 결과.json으로 저장, --compare 이전결과.json으로 비교
+    (threshold와 양쪽 결과의 repeat간 흩어짐 중 큰 값보다 더 나빠지면 종료 코드 1)
+   지표 이름이 _per_sec으로 끝나면 클수록, _us/_sec으로 끝나면 작을수록 좋음
+   --detail: 예전처럼 세부 표 (메모리, 구간별 지연, 보드 크기별 등) 출력
+'''
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import h5py
+import numpy as np
+
+from tictactoe_env import TicTacToeEnv, BitboardTicTacToeEnv, \
+    BatchTicTacToeEnv, unpack_states
+from mcts_zero import MCTS
+from agent_rl import ZeroTree
+from neural_network_cpu import NeuralNetwork
+
+
+def _random_games(n_games, seed):
+    '''합법수만 두는 랜덤 게임의 action 목록 생성 (환경 비교용)'''
+    rng = np.random.RandomState(seed)
+    games = []
+    for _ in range(n_games):
+        first = rng.randint(2)
+        cells = rng.permutation(9)
+        games.append([[(first + t) % 2, c // 3, c % 3]
+                      for t, c in enumerate(cells)])
+    return games
+
+
+def bench_env_step(n_games=2000, seed=2018):
+    '''환경별 step 처리량(steps/sec) 측정'''
+    games = _random_games(n_games, seed)
+    envs = [('TicTacToeEnv', TicTacToeEnv()),
+            ('BitboardTicTacToeEnv', BitboardTicTacToeEnv()),
+            ('BitboardTicTacToeEnv(observe=False)',
+             BitboardTicTacToeEnv(observe=False))]
+    report = []
+    for name, env in envs:
+        steps = 0
+        start = time.perf_counter()
+        for actions in games:
+            env.reset()
+            for action in actions:
+                steps += 1
+                if env.step(action)[2]:
+                    break
+        report.append((name, steps / (time.perf_counter() - start)))
+    return report
+
+
+def _traced_call(func, *args):
+    '''func(*args)를 부르고 (리턴값, 호출 중 최대 사용량 - 호출 전 사용량) 리턴
+       tracemalloc이 켜져 있어야 함, 호출 안에서 잠깐 만들고 버린 객체도 잡힘
+       tracemalloc.reset_peak은 Python 3.9부터 있음 -> 그 전 버전은 사용량 대신 nan
+    '''
+    import tracemalloc
+    if not hasattr(tracemalloc, 'reset_peak'):
+        return func(*args), float('nan')
+    before, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    result = func(*args)
+    return result, tracemalloc.get_traced_memory()[1] - before
+
+
+def bench_step_allocations(n_games=2000, seed=2018):
+    '''tracemalloc으로 정상 상태(워밍업 후)의 메모리 측정
+       리턴: [(이름, step당 남는 바이트, reset당 임시 할당 바이트, step당 임시 할당 바이트)]
+       임시 할당: 호출마다 (호출 중 최대 - 호출 전)의 평균, 측정 자체의 몫은 뺌
+        -> 남지 않고 버려지는 배열, list도 잡히므로 재사용(buffer) 모드가 줄이는 양이 보임
+        (작은 dict, tuple은 CPython이 free list로 돌려써서 tracemalloc에 잡히지 않음)
+       MCTS는 착수마다 packed code, edge, action을 메모리에 쌓으므로 그만큼 남음
+    '''
+    import tracemalloc
+    games = _random_games(n_games, seed)
+    tracemalloc.start()
+    overhead = min(_traced_call(lambda: None)[1] for _ in range(10))
+    tracemalloc.stop()
+    report = []
+    for name, env in [('TicTacToeEnv', TicTacToeEnv()),
+                      ('TicTacToeEnv(buffer=float)',
+                       TicTacToeEnv(buffer=np.zeros((3, 3, 3)))),
+                      ('TicTacToeEnv(dtype=uint8)', TicTacToeEnv(dtype='uint8'))]:
+        for warmup in (True, False):
+            if not warmup:
+                tracemalloc.start()
+                start, _ = tracemalloc.get_traced_memory()
+            # 워밍업 중엔 추적이 꺼져 있어서 _traced_call이 0을 리턴
+            steps = reset_churn = step_churn = 0
+            for actions in games:
+                reset_churn += _traced_call(env.reset)[1] - overhead
+                for action in actions:
+                    steps += 1
+                    (_, _, done, _), size = _traced_call(env.step, action)
+                    step_churn += size - overhead
+                    if done:
+                        break
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        report.append((name, (current - start) / steps,
+                       reset_churn / len(games), step_churn / steps))
+    env = TicTacToeEnv(dtype='uint8')
+    env.seed(seed)
+    selfplay = MCTS()
+    selfplay.seed(seed)
+    for warmup in (True, False):
+        if not warmup:
+            tracemalloc.start()
+            start, _ = tracemalloc.get_traced_memory()
+        steps = reset_churn = churn = 0
+        for _ in range(n_games // 4):
+            state, size = _traced_call(env.reset)
+            reset_churn += size - overhead
+            selfplay.first_turn = selfplay.np_random.choice(2, replace=False)
+            done = False
+            while not done:
+                action, size = _traced_call(selfplay.select_action, state)
+                churn += size - overhead
+                (state, reward, done, info), size = _traced_call(env.step,
+                                                                 action)
+                churn += size - overhead
+                steps += 1
+            selfplay.backup(reward, info)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    report.append(('MCTS self-play (uint8 env)', (current - start) / steps,
+                   reset_churn / (n_games // 4), churn / steps))
+    return report
+
+
+def bench_batch_env(n_envs=4096, n_steps=200, seed=2018):
+    '''배치 환경에서 랜덤 합법수로 게임을 진행하며 steps/sec, games/sec 측정'''
+    env = BatchTicTacToeEnv(n_envs)
+    env.seed(seed)
+    env.reset()
+    rng = np.random.RandomState(seed)
+    first = rng.randint(2, size=n_envs)
+    steps = games = 0
+    start = time.perf_counter()
+    for _ in range(n_steps):
+        # 빈자리 중 하나를 랜덤으로 고르기
+        score = rng.rand(n_envs, 9) * env.legal_mask()
+        cell = score.argmax(axis=1)
+        who = (first + env.step_count) % 2
+        actions = np.stack([who, cell // 3, cell % 3], axis=1)
+        _, _, dones, _ = env.step(actions)
+        first[dones] = rng.randint(2, size=dones.sum())
+        steps += n_envs
+        games += dones.sum()
+    elapsed = time.perf_counter() - start
+    return steps / elapsed, games / elapsed
+
+
+def bench_mcts_latency(episodes=20000, window=1000, seed=2018):
+    '''셀프 플레이를 진행하며 구간(window)별 착수 1회당 평균 시간(us)을 측정
+       트리가 커져도 착수 시간이 일정해야 정상
+    '''
+    env = TicTacToeEnv()
+    env.seed(seed)
+    selfplay = MCTS()
+    selfplay.seed(seed)
+    report = []
+    moves = 0
+    elapsed = 0.
+    for e in range(episodes):
+        state = env.reset()
+        selfplay.first_turn = selfplay.np_random.choice(2, replace=False)
+        done = False
+        while not done:
+            start = time.perf_counter()
+            action = selfplay.select_action(state)
+            elapsed += time.perf_counter() - start
+            moves += 1
+            state, reward, done, info = env.step(action)
+        selfplay.backup(reward, info)
+        if (e + 1) % window == 0:
+            report.append((e + 1, len(selfplay.tree_memory),
+                           elapsed / moves * 1e6))
+            moves = 0
+            elapsed = 0.
+    return report
+
+
+def bench_board_sizes(shapes=((3, 3, 3), (9, 9, 5), (15, 15, 5)),
+                      episodes=20, seed=2018):
+    '''(m, n, k) 보드별 MCTS 셀프 플레이의 env step(us), 착수 1회(us), 트리 node 수'''
+    report = []
+    for m, n, k in shapes:
+        env = TicTacToeEnv(m, n, k)
+        env.seed(seed)
+        selfplay = MCTS(board_shape=(m, n))
+        selfplay.seed(seed)
+        moves = 0
+        step_time = move_time = 0.
+        for _ in range(episodes):
+            state = env.reset()
+            selfplay.first_turn = selfplay.np_random.choice(2, replace=False)
+            done = False
+            while not done:
+                start = time.perf_counter()
+                action = selfplay.select_action(state)
+                move_time += time.perf_counter() - start
+                start = time.perf_counter()
+                state, reward, done, info = env.step(action)
+                step_time += time.perf_counter() - start
+                moves += 1
+            selfplay.backup(reward, info)
+        report.append(('%dx%d k=%d' % (m, n, k), step_time / moves * 1e6,
+                       move_time / moves * 1e6, len(selfplay.tree_memory)))
+    return report
+
+
+def make_selfplay_data(episodes, data_dir, seed=2018):
+    '''mcts_zero.py와 같은 방식으로 셀프 플레이 데이터를 data_dir에 저장'''
+    env = TicTacToeEnv()
+    env.seed(seed)
+    selfplay = MCTS()
+    selfplay.seed(seed)
+    for _ in range(episodes):
+        state = env.reset()
+        selfplay.first_turn = selfplay.np_random.choice(2, replace=False)
+        done = False
+        while not done:
+            action = selfplay.select_action(state)
+            state, reward, done, info = env.step(action)
+        selfplay.backup(reward, info)
+    with h5py.File(os.path.join(data_dir, 'state_memory.hdf5'), 'w') as hf:
+        hf.create_dataset("state", data=unpack_states(selfplay.state_memory))
+    with h5py.File(os.path.join(data_dir, 'edge_memory.hdf5'), 'w') as hf:
+        hf.create_dataset("edge", data=selfplay.edge_memory)
+
+
+def bench_zerotree_lookup(episodes=20000, n_queries=2000, seed=2018,
+                          data_dir=None, linear=True):
+    '''ZeroTree 로딩 시간(sec)과 get_pi 조회 시간(us) 측정
+       예전 방식(state 목록 선형 검색)과 현재 방식(dict 조회)을 비교
+       data_dir: 이미 만든 셀프 플레이 데이터 (없으면 episodes판을 임시 폴더에 만들어 씀)
+       linear=False면 예전 방식은 재지 않고 None
+    '''
+    if data_dir is None:
+        with tempfile.TemporaryDirectory() as data_dir:
+            make_selfplay_data(episodes, data_dir, seed)
+            return bench_zerotree_lookup(episodes, n_queries, seed, data_dir,
+                                         linear)
+    start = time.perf_counter()
+    tree = ZeroTree(data_dir)
+    load = time.perf_counter() - start
+    with h5py.File(os.path.join(data_dir, 'state_memory.hdf5'), 'r') as hf:
+        states = hf['state'][...]
+    rng = np.random.RandomState(seed)
+    queries = states[rng.randint(len(states), size=n_queries)].reshape(
+        -1, 3, 3, 3)
+    slow = None
+    if linear:
+        # 예전 방식: tuple 목록에서 in + index 두번 선형 검색
+        state_data = list(dict.fromkeys(tuple(v) for v in states))
+        start = time.perf_counter()
+        for state in queries:
+            key = tuple(state.flatten())
+            if key in state_data:
+                state_data.index(key)
+        slow = (time.perf_counter() - start) / n_queries * 1e6
+    start = time.perf_counter()
+    for state in queries:
+        tree.get_pi(state)
+    hashed = (time.perf_counter() - start) / n_queries * 1e6
+    return len(tree.pi_data), load, slow, hashed
+
+
+def bench_nn_forward(batch_sizes=(1, 64, 1024), repeat=20, seed=2018):
+    '''NeuralNetwork.predict 배치 크기별 호출 1회 시간(us)과 position당 시간(us)'''
+    import torch
+    torch.manual_seed(seed)
+    net = NeuralNetwork()
+    rng = np.random.RandomState(seed)
+    report = []
+    for batch in batch_sizes:
+        states = (rng.rand(batch, 3, 3, 3) < 0.3).astype('float32')
+        net.predict(states)  # warmup
+        start = time.perf_counter()
+        for _ in range(repeat):
+            net.predict(states)
+        call = (time.perf_counter() - start) / repeat * 1e6
+        report.append((batch, call, call / batch))
+    return report
+
+
+def bench_frozen_forward(batch_sizes=(1, 64, 1024), repeat=20, seed=2018):
+    '''배치 크기별 추론 호출 1회 시간(us): eager predict, TorchScript(BN 접기 + freeze),
+       NumPy FrozenNetwork, 그리고 eager 대비 최대 오차
+       TorchScript는 입력 모양이 바뀌면 처음 두 번의 호출에서 그래프를 다시 최적화하므로
+       배치 크기마다 3번씩 워밍업한 뒤 잼
+    '''
+    import torch
+    from frozen_network import FrozenNetwork, export_torchscript
+    torch.manual_seed(seed)
+    net = NeuralNetwork()
+    net.eval()
+    script = export_torchscript(net)
+    frozen = FrozenNetwork(net)
+
+    def script_predict(states):
+        with torch.no_grad():
+            p, v = script(torch.from_numpy(states))
+        return p.numpy(), v.numpy()
+
+    rng = np.random.RandomState(seed)
+    report = []
+    for batch in batch_sizes:
+        states = (rng.rand(batch, 3, 3, 3) < 0.3).astype('float32')
+        times = []
+        outputs = []
+        for predict in (net.predict, script_predict, frozen.predict):
+            for _ in range(3):  # warmup
+                output = predict(states)
+            outputs.append(output)
+            start = time.perf_counter()
+            for _ in range(repeat):
+                predict(states)
+            times.append((time.perf_counter() - start) / repeat * 1e6)
+        error = max(np.abs(out[i] - outputs[0][i]).max()
+                    for out in outputs[1:] for i in range(2))
+        report.append((batch, times[0], times[1], times[2], error))
+    return report
+
+
+def bench_mcts_tree_sizes(tree_episodes=(0, 1000, 10000), moves=5000,
+                          seed=2018):
+    '''누적 트리를 tree_episodes판으로 키운 뒤 select_action + backup 처리량(moves/sec)
+       리턴: [(키운 판 수, 트리 node 수, moves/sec)]
+    '''
+    report = []
+    for episodes in tree_episodes:
+        env = TicTacToeEnv()
+        env.seed(seed)
+        selfplay = MCTS()
+        selfplay.seed(seed)
+        count = elapsed = 0
+        e = 0
+        while count < moves:
+            state = env.reset()
+            selfplay.first_turn = selfplay.np_random.choice(2, replace=False)
+            timed = e >= episodes
+            done = False
+            start = time.perf_counter()
+            while not done:
+                action = selfplay.select_action(state)
+                # env.step 시간은 빼고 셈
+                if timed:
+                    elapsed += time.perf_counter() - start
+                state, reward, done, info = env.step(action)
+                start = time.perf_counter()
+                count += timed
+            selfplay.backup(reward, info)
+            if timed:
+                elapsed += time.perf_counter() - start
+            e += 1
+        report.append((episodes, len(selfplay.tree_memory), count / elapsed))
+    return report
+
+
+def _suite_env(quick, seed):
+    n_games = 300 if quick else 2000
+    metrics = OrderedDict()
+    for name, rate in bench_env_step(n_games, seed):
+        metrics['env.%s.steps_per_sec' % name] = rate
+    steps, games = bench_batch_env(1024 if quick else 4096, 50 if quick else 200,
+                                   seed)
+    metrics['batch_env.steps_per_sec'] = steps
+    metrics['batch_env.games_per_sec'] = games
+    return metrics
+
+
+def _suite_mcts(quick, seed):
+    sizes = (0, 200, 1000) if quick else (0, 1000, 10000)
+    metrics = OrderedDict()
+    for episodes, nodes, rate in bench_mcts_tree_sizes(
+            sizes, 3000 if quick else 10000, seed):
+        metrics['mcts.tree_%d.moves_per_sec' % episodes] = rate
+    return metrics
+
+
+@contextmanager
+def _setup_zerotree(quick, seed):
+    '''셀프 플레이 데이터는 suite 실행마다 한번만 만듦 (측정하는 건 로딩과 조회뿐)'''
+    with tempfile.TemporaryDirectory() as data_dir:
+        make_selfplay_data(2000 if quick else 20000, data_dir, seed)
+        yield {'data_dir': data_dir}
+
+
+def _suite_zerotree(quick, seed, data_dir):
+    nodes, load, _, hashed = bench_zerotree_lookup(
+        n_queries=500 if quick else 2000, seed=seed, data_dir=data_dir,
+        linear=False)
+    return OrderedDict([('zerotree.load_sec', load),
+                        ('zerotree.get_pi_us', hashed)])
+
+
+def _suite_nn(quick, seed):
+    metrics = OrderedDict()
+    for batch, eager, script, frozen, _ in bench_frozen_forward(
+            (1, 64, 1024), 5 if quick else 20, seed):
+        metrics['nn.eager.batch_%d_us' % batch] = eager
+        metrics['nn.torchscript.batch_%d_us' % batch] = script
+        metrics['nn.frozen.batch_%d_us' % batch] = frozen
+    return metrics
+
+
+# 이름 -> (quick, seed)를 받아 {지표: 값}을 리턴하는 함수
+SUITE = OrderedDict([('env', _suite_env), ('mcts', _suite_mcts),
+                     ('zerotree', _suite_zerotree), ('nn', _suite_nn)])
+# 이름 -> 측정하지 않을 준비(데이터 생성 등)를 하는 context manager
+#  (quick, seed)를 받아 SUITE 함수에 keyword 인자로 넘길 dict를 줌, repeat 전에 한번만 실행
+SUITE_SETUP = {'zerotree': _setup_zerotree}
+
+
+@contextmanager
+def _no_setup(quick, seed):
+    yield {}
+
+
+def _reseed(seed):
+    import torch
+    np.random.seed(seed)
+    torch.manual_seed(seed)
+
+
+def run_suite(names=None, quick=False, repeat=5, seed=2018):
+    '''SUITE 벤치마크를 워밍업 1회 + repeat회 돌려 (지표별 최고값, 지표별 흩어짐) dict를 리턴
+       최고값: _per_sec 지표는 최대, 시간 지표는 최소
+       흩어짐: repeat 중 최악이 최고보다 나쁜 비율 (compare_results의 변화율과 같은 단위)
+    '''
+    results = OrderedDict()
+    spread = OrderedDict()
+    for name in names or SUITE:
+        runs = []
+        with SUITE_SETUP.get(name, _no_setup)(quick, seed) as fixture:
+            # 첫 회는 워밍업 (import, 메모리 할당, 캐시 등), 결과는 버림
+            for _ in range(repeat + 1):
+                _reseed(seed)
+                runs.append(SUITE[name](quick, seed, **fixture))
+        for metric in runs[-1]:
+            values = [run[metric] for run in runs[1:]]
+            if higher_is_better(metric):
+                best, worst = max(values), min(values)
+                noise = best / worst - 1 if worst else 0.
+            else:
+                best, worst = min(values), max(values)
+                noise = worst / best - 1 if best else 0.
+            results[metric] = float(best)
+            spread[metric] = float(noise)
+    return results, spread
+
+
+def environment_info(quick, repeat, seed):
+    '''결과 비교용 실행 환경 정보'''
+    import torch
+    try:
+        commit = subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL,
+            cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return OrderedDict([('time', time.strftime('%Y-%m-%dT%H:%M:%S')),
+                        ('commit', commit), ('python', platform.python_version()),
+                        ('numpy', np.__version__), ('torch', torch.__version__),
+                        ('platform', platform.platform()),
+                        ('cpu_count', os.cpu_count()), ('quick', quick),
+                        ('repeat', repeat), ('seed', seed)])
+
+
+def higher_is_better(metric):
+    return metric.endswith('_per_sec')
+
+
+def compare_results(baseline, current, threshold=0.1, noise=None):
+    '''두 결과의 공통 지표 비교: [(지표, 이전 값, 현재 값, 변화율, 허용치, 나빠졌는지)]
+       변화율은 좋아진 방향이 +, 허용치보다 많이 나빠지면 나빠졌다고 봄
+       허용치: threshold와 noise[지표] (양쪽 run_suite 흩어짐 중 큰 값) 중 큰 값
+    '''
+    noise = noise or {}
+    report = []
+    for metric, value in current.items():
+        base = baseline.get(metric)
+        if not base:
+            continue
+        if higher_is_better(metric):
+            change = value / base - 1
+        else:
+            change = base / value - 1 if value else 0.
+        limit = max(threshold, noise.get(metric, 0.))
+        report.append((metric, base, value, change, limit, change < -limit))
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--only', nargs='+', choices=list(SUITE),
+                        help='일부 벤치마크만 실행')
+    parser.add_argument('--quick', action='store_true',
+                        help='작은 크기로 빠르게 (같은 --quick 결과끼리만 비교할 것)')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='측정 횟수 (최고값 사용)')
+    parser.add_argument('--seed', type=int, default=2018)
+    parser.add_argument('--output', default=None, metavar='PATH',
+                        help='결과를 JSON으로 저장')
+    parser.add_argument('--compare', default=None, metavar='PATH',
+                        help='이전 결과 JSON과 비교')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='이만큼(비율)과 측정 흩어짐 중 큰 값보다 더 나빠지면 회귀로 표시')
+    parser.add_argument('--detail', action='store_true',
+                        help='세부 표 출력 (메모리, 구간별 지연, 보드 크기별 등)')
+    args = parser.parse_args()
+    if args.detail:
+        print('%-40s %14s' % ('env', 'steps/sec'))
+        for name, rate in bench_env_step():
+            print('%-40s %14.0f' % (name, rate))
+        print('batch env: %.0f steps/sec, %.0f games/sec' % bench_batch_env())
+        print('%-40s %14s %14s %14s' % ('allocation', 'bytes/step',
+                                        'temp B/reset', 'temp B/step'))
+        for name, per_step, reset, step in bench_step_allocations():
+            print('%-40s %14.1f %14.1f %14.1f' % (name, per_step, reset, step))
+        print('%10s %10s %14s' % ('episode', 'nodes', 'us/move'))
+        for episode, nodes, latency in bench_mcts_latency():
+            print('%10d %10d %14.1f' % (episode, nodes, latency))
+        print('%-14s %14s %14s %10s' % ('board', 'us/step', 'us/move', 'nodes'))
+        for board, step, move, nodes in bench_board_sizes():
+            print('%-14s %14.1f %14.1f %10d' % (board, step, move, nodes))
+        print('%10s %14s %14s' % ('batch', 'us/call', 'us/position'))
+        for batch, call, position in bench_nn_forward():
+            print('%10d %14.1f %14.2f' % (batch, call, position))
+        print('%10s %14s %14s %14s %10s' % ('batch', 'eager us', 'script us',
+                                            'numpy us', 'max err'))
+        for row in bench_frozen_forward():
+            print('%10d %14.1f %14.1f %14.1f %10.1e' % row)
+        print('ZeroTree (%d nodes): load %.3f sec, get_pi linear %.1f us, '
+              'hashed %.1f us' % bench_zerotree_lookup())
+        sys.exit(0)
+    results, spread = run_suite(args.only, args.quick, args.repeat, args.seed)
+    for metric, value in results.items():
+        print('%-56s %16.2f  (±%.0f%%)' % (metric, value, spread[metric] * 100))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'environment': environment_info(args.quick, args.repeat,
+                                                       args.seed),
+                       'results': results, 'spread': spread}, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline['environment'].get('quick') != args.quick:
+            print('warning: --quick 설정이 다른 결과와 비교함')
+        # 흩어짐이 없는 예전 결과 파일은 현재 결과의 흩어짐만 씀
+        base_spread = baseline.get('spread', {})
+        noise = {metric: max(value, base_spread.get(metric, 0.))
+                 for metric, value in spread.items()}
+        regressions = 0
+        print('%-56s %14s %14s %9s %9s' % ('metric', 'baseline', 'current',
+                                           'change', 'limit'))
+        for metric, base, value, change, limit, regressed in compare_results(
+                baseline['results'], results, args.threshold, noise):
+            regressions += regressed
+            print('%-56s %14.2f %14.2f %+8.1f%% %8.1f%%%s' %
+                  (metric, base, value, change * 100, -limit * 100,
+                   '  REGRESSION' if regressed else ''))
+        sys.exit(1 if regressions else 0)
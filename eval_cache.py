@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+''' 신경망 평가 캐시 ------------------------------------------------------
+# 같은 국면을 두번 forward하지 않도록 packed code -> (정책, 가치)를 저장
+ 틱택토는 합법 국면이 5478개뿐 (내 표시가 O인지까지 나누면 10955개) -> 기본 capacity면 전부 들어감
+ capacity를 넘으면 가장 오래 안 쓴 항목부터 버림 (LRU)
+# symmetry=True면 대칭 대표 국면(canonical code)으로 평가하고 저장
+ -> 대칭인 국면 8개가 캐시 항목 하나를 같이 씀, 정책은 원래 좌표로 되돌려서 리턴
+ (신경망이 대칭에 대해 같은 출력을 내지는 않으므로 결과가 대표 국면 기준으로 바뀜)
+# 신경망 weight가 바뀌면 (optimizer.step, load_state_dict 등) 다음 조회 때 캐시를 비움
+ PyTorch 텐서의 in-place 수정 횟수(_version)로 확인, FrozenNetwork처럼 weight가 고정이면 확인 안 함
+# 집계: hits, misses, evictions, invalidations
+--------------------------------------------------------------- '''
+from collections import OrderedDict
+import numpy as np
+
+from tictactoe_env import unpack_states
+from symmetry import canonical_codes, INV_PERMS
+
+
+def weight_tensors(net):
+    '''신경망의 parameter, buffer 텐서 목록 (PyTorch 모듈이 아니면 빈 목록)'''
+    if not hasattr(net, 'state_dict'):
+        return []
+    return list(net.state_dict(keep_vars=True).values())
+
+
+class EvalCache(object):
+    def __init__(self, net, capacity=16384, symmetry=False):
+        self.net = net
+        self.capacity = capacity
+        self.symmetry = symmetry
+        # code -> (정책 (9,), 가치), 맨 뒤가 가장 최근에 쓴 항목
+        self.entries = OrderedDict()
+        # load_state_dict, optimizer.step 모두 같은 텐서를 in-place로 바꾸므로 목록은 한번만 만듦
+        self.tensors = weight_tensors(net)
+        self.version = self._weight_version()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0,
+                      'invalidations': 0}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, code):
+        return code in self.entries
+
+    def hit_rate(self):
+        total = self.stats['hits'] + self.stats['misses']
+        return self.stats['hits'] / total if total else 0.
+
+    def clear(self):
+        '''캐시 비우기 (weight를 직접 바꿨는데 PyTorch 모듈이 아닌 경우 등)'''
+        if self.entries:
+            self.stats['invalidations'] += 1
+        self.entries.clear()
+
+    def _weight_version(self):
+        return tuple(t._version for t in self.tensors)
+
+    def _check_version(self):
+        version = self._weight_version()
+        if version != self.version:
+            self.version = version
+            self.clear()
+
+    def _insert(self, code, policy, value):
+        self.entries[code] = (policy, value)
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+            self.stats['evictions'] += 1
+
+    def evaluate(self, codes):
+        '''(M,) packed code의 (M, 9) 정책과 (M,) 가치 (없는 국면만 한번에 forward)'''
+        self._check_version()
+        codes = np.asarray(codes, 'int64')
+        if self.symmetry:
+            keys, transforms = canonical_codes(codes)
+        else:
+            keys, transforms = codes, None
+        policy = np.empty((len(codes), 9), 'float32')
+        value = np.empty(len(codes), 'float32')
+        missing = OrderedDict()  # 없는 code -> 결과를 채울 위치들
+        for i, key in enumerate(keys.tolist()):
+            entry = self.entries.get(key)
+            if entry is None:
+                missing.setdefault(key, []).append(i)
+                continue
+            self.entries.move_to_end(key)
+            policy[i], value[i] = entry
+            self.stats['hits'] += 1
+        if missing:
+            new = list(missing)
+            p, v = self.net.predict(unpack_states(new).reshape(-1, 3, 3, 3))
+            for key, row_p, row_v, rows in zip(new, p, v[:, 0],
+                                               missing.values()):
+                policy[rows] = row_p
+                value[rows] = row_v
+                self._insert(key, row_p, row_v)
+            self.stats['misses'] += len(new)
+            # 같은 배치 안에서 두번째부터 나온 code는 hit로 셈
+            self.stats['hits'] += sum(len(rows) - 1 for rows in missing.values())
+        if self.symmetry:
+            # 대표 국면 좌표의 정책을 원래 국면 좌표로 되돌림
+            policy = policy[np.arange(len(codes))[:, None], INV_PERMS[transforms]]
+        return policy, value
+
+    def preload(self, codes, batch_size=1024):
+        '''codes(예: policy_table.reachable_codes())를 미리 평가해서 채움'''
+        codes = np.asarray(codes, 'int64')
+        for start in range(0, len(codes), batch_size):
+            self.evaluate(codes[start:start + batch_size])
@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+''' 에이전트 평가 (대국, Elo) ---------------------------------------------
+# 두 에이전트 A, B를 N판 대국시켜 A 기준 승/무/패를 집계 (선공은 판마다 번갈아)
+# 에이전트는 문자열 spec으로 지정 (프로세스 풀 워커가 각자 만들어 씀)
+ random: 빈칸 중 랜덤, perfect: 완전 해석 테이블, mcts: 학습 안 된 MCTS
+ mcts:경로 -> 그 경로의 셀프 플레이 데이터로 누적 트리를 복구한 MCTS
+ zero: data/의 ZeroAgent, zero:경로 -> 그 경로에 저장된 셀프 플레이 데이터(체크포인트)로 ZeroAgent
+ policy: data/policy_table.npz의 PolicyAgent, policy:경로 -> 그 파일의 정책 테이블
+# env는 A를 PLAYER, B를 OPPONENT로 진행하고
+ B에게는 0, 1번 평면을 바꾼 state를 보여줘서 두 에이전트 모두 자기가 PLAYER인 것처럼 둠
+# 결과: 승/무/패 비율과 Wilson 95% 신뢰구간, 착수 지연시간 백분위수(us), 반칙 횟수
+# elo_ladder: 여러 에이전트(체크포인트)를 리그전으로 붙여 Elo 점수 계산
+--------------------------------------------------------------- '''
+import argparse
+import logging
+import multiprocessing
+import time
+import numpy as np
+from gym.utils import seeding
+
+from tictactoe_env import TicTacToeEnv, set_verbosity
+
+logger = logging.getLogger(__name__)
+
+PLAYER = 0
+OPPONENT = 1
+MARK_O = 2
+# B에게 보여줄 state: 0, 1번 평면 교환
+SWAP_PLANES = [OPPONENT, PLAYER, MARK_O]
+PERCENTILES = (50, 90, 99)
+
+
+# 빈칸 중 하나를 랜덤으로 두는 에이전트 (ZeroAgent와 같은 방식으로 사용)
+class RandomAgent(object):
+    def __init__(self):
+        self.first_turn = None
+        self.seed()
+
+    def seed(self, seed=None):
+        self.np_random, seed = seeding.np_random(seed)
+        return [seed]
+
+    def reset_episode(self):
+        pass
+
+    def select_action(self, state, mode=''):
+        cells = np.flatnonzero((state[PLAYER] + state[OPPONENT]).flatten() == 0)
+        cell = cells[self.np_random.choice(len(cells))]
+        return np.r_[PLAYER, divmod(cell, 3)]
+
+
+# MCTS를 평가용 에이전트로 감쌈: 누적 트리의 PUCT로 두고 backup(학습)은 하지 않음
+# data_dir을 주면 그 셀프 플레이 데이터로 트리를 한번 복구해서 씀 (없으면 빈 트리 -> 사실상 랜덤)
+class MCTSAgent(object):
+    def __init__(self, mcts=None, data_dir=None):
+        from mcts_zero import MCTS
+        self.mcts = mcts if mcts is not None else MCTS()
+        if data_dir is not None:
+            from selfplay_data import load_tree
+            self.mcts.restore_tree(*load_tree(data_dir, self.mcts.symmetry))
+
+    def seed(self, seed=None):
+        return self.mcts.seed(seed)
+
+    def reset_episode(self):
+        self.mcts._reset_episode()
+        # backup을 안 하므로 착수 기록이 판마다 쌓이지 않게 비움
+        self.mcts.state_memory.clear()
+        self.mcts.node_memory.clear()
+        self.mcts.edge_memory.clear()
+
+    def select_action(self, state, mode=''):
+        # 평가에선 항상 자기 차례 기준 state가 들어오므로 행동주체를 PLAYER로 고정
+        self.mcts.first_turn = -(self.mcts.action_count + 1)
+        return self.mcts.select_action(state)
+
+
+def make_agent(spec):
+    '''spec 문자열로 에이전트 생성'''
+    name, _, path = spec.partition(':')
+    if name == 'random':
+        return RandomAgent()
+    if name == 'perfect':
+        from solver import PerfectAgent, SolvedTable, TABLE_PATH
+        return PerfectAgent(SolvedTable(path or TABLE_PATH))
+    if name == 'mcts':
+        return MCTSAgent(data_dir=path or None)
+    if name == 'zero':
+        from agent_rl import ZeroAgent
+        return ZeroAgent(path or 'data')
+    if name == 'policy':
+        from policy_table import PolicyAgent, PolicyTable, POLICY_PATH
+        return PolicyAgent(PolicyTable(path or POLICY_PATH))
+    raise ValueError('unknown agent spec: %s' % spec)
+
+
+def wilson_interval(k, n, z=1.96):
+    '''n번 중 k번 나온 비율의 Wilson 신뢰구간 (low, high)'''
+    if n == 0:
+        return 0., 1.
+    p = k / n
+    center = (p + z * z / (2 * n)) / (1 + z * z / n)
+    half = z * np.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / (1 + z * z / n)
+    return max(0., center - half), min(1., center + half)
+
+
+def play_games(agent_a, agent_b, games, seed=2018):
+    '''games = [(판 번호, A가 선공인지)]를 진행하고 (결과 dict, A 지연, B 지연) 리턴
+       결과 dict: A 기준 {1: 승, 0: 무, -1: 패, 'illegal_a', 'illegal_b'}
+    '''
+    env = TicTacToeEnv()
+    env.seed(seed)
+    result = {1: 0, 0: 0, -1: 0, 'illegal_a': 0, 'illegal_b': 0}
+    latency = ([], [])
+    for _, a_first in games:
+        state = env.reset()
+        agent_a.reset_episode()
+        agent_b.reset_episode()
+        turn = PLAYER if a_first else OPPONENT
+        done = False
+        while not done:
+            if turn == PLAYER:
+                start = time.perf_counter()
+                action = agent_a.select_action(state)
+                latency[0].append(time.perf_counter() - start)
+            else:
+                start = time.perf_counter()
+                action = agent_b.select_action(state[SWAP_PLANES])
+                latency[1].append(time.perf_counter() - start)
+            action = [turn, action[1], action[2]]
+            illegal = (state[PLAYER] + state[OPPONENT])[action[1]][action[2]]
+            state, reward, done, info = env.step(action)
+            turn = 1 - turn
+        if illegal:
+            result['illegal_a' if turn == OPPONENT else 'illegal_b'] += 1
+        result[reward] += 1
+    env.close()
+    return result, latency
+
+
+def _match_worker(job):
+    '''프로세스 풀 워커: 에이전트를 직접 만들어 자기 몫의 판을 진행'''
+    spec_a, spec_b, games, seed = job
+    agent_a = make_agent(spec_a)
+    agent_b = make_agent(spec_b)
+    # 같은 seed에서도 두 에이전트의 난수가 겹치지 않게 시드를 따로 뽑음
+    seed_a, seed_b = np.random.RandomState(seed).randint(2 ** 31, size=2)
+    agent_a.seed(int(seed_a))
+    agent_b.seed(int(seed_b))
+    return play_games(agent_a, agent_b, games, seed)
+
+
+def play_match(spec_a, spec_b, n_games=1000, workers=1, seed=2018):
+    '''A, B를 n_games판 대국 (짝수 판은 A 선공), 판을 workers개 프로세스에 나눠 진행
+       워커 i는 seed + i를 씀 -> 같은 seed, workers면 결과가 같음
+    '''
+    start = time.perf_counter()
+    games = [(g, g % 2 == 0) for g in range(n_games)]
+    jobs = [(spec_a, spec_b, games[i::workers], seed + i)
+            for i in range(workers)]
+    if workers > 1:
+        with multiprocessing.Pool(workers) as pool:
+            outputs = pool.map(_match_worker, jobs)
+    else:
+        outputs = [_match_worker(jobs[0])]
+    result = {1: 0, 0: 0, -1: 0, 'illegal_a': 0, 'illegal_b': 0}
+    latency = ([], [])
+    for worker_result, worker_latency in outputs:
+        for k in result:
+            result[k] += worker_result[k]
+        latency[0].extend(worker_latency[0])
+        latency[1].extend(worker_latency[1])
+    report = {'a': spec_a, 'b': spec_b, 'games': n_games,
+              'win': result[1], 'draw': result[0], 'loss': result[-1],
+              'illegal_a': result['illegal_a'],
+              'illegal_b': result['illegal_b'],
+              'score': (result[1] + 0.5 * result[0]) / max(n_games, 1)}
+    for key, k in (('win', 1), ('draw', 0), ('loss', -1)):
+        report[key + '_ci'] = wilson_interval(result[k], n_games)
+    for key, times in (('latency_a', latency[0]), ('latency_b', latency[1])):
+        report[key] = tuple(np.percentile(times, PERCENTILES) * 1e6) \
+            if times else (0.,) * len(PERCENTILES)
+    report['elapsed'] = time.perf_counter() - start
+    return report
+
+
+def elo_ratings(names, scores, iterations=2000, prior_draws=1):
+    '''리그전 결과로 Elo 점수 계산 (첫 에이전트를 0점 기준)
+       scores: {(i, j): (i의 점수 합, 판 수)}, 승 1, 무 0.5
+       전승/전패면 점수 차가 무한대가 되므로 쌍마다 가상의 무승부 prior_draws판을 더함
+    '''
+    n = len(names)
+    won = np.zeros((n, n))
+    played = np.zeros((n, n))
+    for (i, j), (score, games) in scores.items():
+        won[i, j] += score + 0.5 * prior_draws
+        won[j, i] += games - score + 0.5 * prior_draws
+        played[i, j] += games + prior_draws
+        played[j, i] += games + prior_draws
+    ratings = np.zeros(n)
+    total = played.sum(axis=1)
+    for _ in range(iterations):
+        # 기대 점수와 실제 점수의 차이만큼 조금씩 보정 (로지스틱 최대우도)
+        expected = played / (1 + 10 ** ((ratings[None, :] - ratings[:, None]) / 400))
+        step = 400 * (won.sum(axis=1) - expected.sum(axis=1)) / np.maximum(total, 1)
+        ratings += step
+        ratings -= ratings[0]
+        if np.abs(step).max() < 1e-6:
+            break
+    return ratings
+
+
+def elo_ladder(specs, n_games=200, workers=1, seed=2018):
+    '''specs의 모든 쌍을 n_games판씩 대국시켜 [(spec, Elo)]를 높은 순으로 리턴'''
+    scores = {}
+    for i in range(len(specs)):
+        for j in range(i + 1, len(specs)):
+            report = play_match(specs[i], specs[j], n_games, workers, seed)
+            scores[i, j] = (report['score'] * n_games, n_games)
+            logger.info('%s vs %s: %d/%d/%d', specs[i], specs[j],
+                        report['win'], report['draw'], report['loss'])
+    ratings = elo_ratings(specs, scores)
+    return sorted(zip(specs, ratings.tolist()), key=lambda x: -x[1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('agents', nargs='+',
+                        help='에이전트 spec: random, perfect, mcts[:경로], zero[:경로], '
+                             'policy[:경로]')
+    parser.add_argument('-v', '--verbose', action='store_const', const=2,
+                        default=1, dest='verbosity')
+    parser.add_argument('-q', '--quiet', action='store_const', const=0,
+                        dest='verbosity')
+    parser.add_argument('--games', type=int, default=1000,
+                        help='대국(쌍) 당 판 수')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='대국을 나눠 돌릴 프로세스 수')
+    parser.add_argument('--seed', type=int, default=2018)
+    parser.add_argument('--ladder', action='store_true',
+                        help='모든 쌍을 붙여 Elo 점수 출력')
+    args = parser.parse_args()
+    set_verbosity(args.verbosity)
+    if args.ladder or len(args.agents) > 2:
+        for spec, rating in elo_ladder(args.agents, args.games, args.workers,
+                                       args.seed):
+            logger.info('%-30s %8.1f', spec, rating)
+    else:
+        spec_b = args.agents[1] if len(args.agents) > 1 else 'random'
+        report = play_match(args.agents[0], spec_b, args.games, args.workers,
+                            args.seed)
+        logger.info('%s vs %s (%d games, %.2f sec)', report['a'], report['b'],
+                    report['games'], report['elapsed'])
+        for key in ('win', 'draw', 'loss'):
+            low, high = report[key + '_ci']
+            logger.info('%-5s %5d  %5.1f%% [%5.1f%%, %5.1f%%]', key,
+                        report[key], report[key] / report['games'] * 100,
+                        low * 100, high * 100)
+        logger.info('score: %.3f illegal A: %d B: %d', report['score'],
+                    report['illegal_a'], report['illegal_b'])
+        for key in ('latency_a', 'latency_b'):
+            logger.info('%s us p50/p90/p99: %.1f / %.1f / %.1f', key,
+                        *report[key])
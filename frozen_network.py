@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+''' 추론 전용 (고정된) 신경망 ----------------------------------------------
+# 학습이 끝난 NeuralNetwork를 서빙용으로 변환
+# BatchNorm 접기: eval 모드 BN은 채널별 y = γ(x - μ)/√(σ² + ε) + β 이므로
+ 앞의 conv weight에 채널별로 s = γ/√(σ² + ε)를 곱하고 bias를 (b - μ)s + β로 바꾸면 BN이 없어짐
+# FrozenNetwork: NumPy 행렬곱만으로 추론
+ 보드가 작아서 padding 있는 conv도 (입력 채널 * 칸 수) x (출력 채널 * 칸 수) 행렬 하나로 표현됨
+ -> 신경망 전체가 행렬곱 8번 + relu, softmax, tanh (PyTorch 디스패치 없음)
+# export_torchscript: BN을 접은 같은 구조의 모듈을 torch.jit.script + freeze
+ TorchScript는 처음 두 번의 호출에서 입력 모양을 보고 그래프를 최적화함 (두번째 호출이 수 ms)
+ -> 변환할 때 미리 두 번 불러 둠 (파일로 저장했다 다시 불러오면 다시 두 번 느림)
+ 작은 batch에서 eager predict보다 빠르지만 가장 빠른 건 NumPy FrozenNetwork
+ (수치는 기기마다 다르므로 python frozen_network.py 또는 benchmark.py --only nn으로 측정)
+ optimize_for_inference(MKLDNN 변환)는 작은 batch에서 오히려 느려서 쓰지 않음
+# 원래 신경망의 weight가 바뀌면 다시 변환해야 함 (변환 시점의 weight를 복사해둠)
+--------------------------------------------------------------- '''
+import copy
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+
+
+def fold_batchnorm(conv, bn):
+    '''conv 다음 eval 모드 bn을 conv 하나로 합친 (weight, bias) 텐서'''
+    scale = bn.weight / torch.sqrt(bn.running_var + bn.eps)
+    weight = conv.weight * scale[:, None, None, None]
+    bias = conv.bias if conv.bias is not None else torch.zeros_like(bn.bias)
+    bias = (bias - bn.running_mean) * scale + bn.bias
+    return weight.detach(), bias.detach()
+
+
+def conv_matrix(weight, bias, board_shape):
+    '''(BN을 접은) conv를 펼친 입력 (C_in * 칸 수)에 곱할 행렬과 bias로 변환
+       리턴: (C_in * 칸 수, C_out * 칸 수) 행렬, (C_out * 칸 수,) bias
+    '''
+    in_channels = weight.shape[1]
+    size = in_channels * board_shape[0] * board_shape[1]
+    # 단위 행렬의 행 하나 = 입력 한 칸만 1 -> conv 결과가 그대로 행렬의 행
+    basis = torch.eye(size).view(size, in_channels, *board_shape)
+    with torch.no_grad():
+        matrix = F.conv2d(basis, weight, padding=weight.shape[-1] // 2)
+    cells = board_shape[0] * board_shape[1]
+    return (matrix.view(size, -1).numpy().astype('float32'),
+            np.repeat(bias.numpy(), cells).astype('float32'))
+
+
+# BN을 접은 NeuralNetwork (구조와 출력은 같음, TorchScript 변환용)
+class FusedNetwork(nn.Module):
+    def __init__(self, net):
+        super(FusedNetwork, self).__init__()
+        self.conv = self._fuse(net.conv, net.conv_bn)
+        self.conv1 = self._fuse(net.conv1, net.conv1_bn)
+        self.conv2 = self._fuse(net.conv2, net.conv2_bn)
+        self.policy_head = self._fuse(net.policy_head, net.policy_bn)
+        # Linear도 복사 (freeze가 원래 텐서를 그대로 쓰므로 공유하면 학습이 이어질 때 같이 바뀜)
+        self.policy_fc = copy.deepcopy(net.policy_fc)
+        self.value_head = self._fuse(net.value_head, net.value_bn)
+        self.value_fc = copy.deepcopy(net.value_fc)
+        self.value_scalar = copy.deepcopy(net.value_scalar)
+
+    @staticmethod
+    def _fuse(conv, bn):
+        weight, bias = fold_batchnorm(conv, bn)
+        fused = nn.Conv2d(conv.in_channels, conv.out_channels,
+                          conv.kernel_size, padding=conv.padding)
+        fused.weight.data.copy_(weight)
+        fused.bias.data.copy_(bias)
+        return fused
+
+    def forward(self, state):
+        x = F.relu(self.conv(state))
+        x = F.relu(self.conv2(F.relu(self.conv1(x))) + x)
+        p = F.relu(self.policy_head(x)).flatten(1)
+        p = F.softmax(self.policy_fc(p), dim=1)
+        v = F.relu(self.value_head(x)).flatten(1)
+        v = torch.tanh(self.value_scalar(F.relu(self.value_fc(v))))
+        return p, v
+
+
+def export_torchscript(net, path=None, warmup=2):
+    '''BN을 접고 script + freeze한 추론 모듈 (path가 있으면 파일로도 저장)
+       warmup: 리턴 전에 batch 1 입력으로 미리 불러 둘 횟수 (그래프 최적화가 끝나도록)
+    '''
+    fused = FusedNetwork(net).eval()
+    module = torch.jit.freeze(torch.jit.script(fused))
+    if path is not None:
+        module.save(path)
+    example = torch.zeros((1, 3) + tuple(net.board_shape))
+    with torch.no_grad():
+        for _ in range(warmup):
+            module(example)
+    return module
+
+
+# NumPy 행렬곱만으로 추론하는 NeuralNetwork (predict와 같은 입출력)
+class FrozenNetwork(object):
+    def __init__(self, net):
+        self.board_shape = net.board_shape
+        shape = self.board_shape
+        self.conv = conv_matrix(*fold_batchnorm(net.conv, net.conv_bn), shape)
+        self.conv1 = conv_matrix(*fold_batchnorm(net.conv1, net.conv1_bn), shape)
+        self.conv2 = conv_matrix(*fold_batchnorm(net.conv2, net.conv2_bn), shape)
+        self.policy_head = conv_matrix(
+            *fold_batchnorm(net.policy_head, net.policy_bn), shape)
+        self.value_head = conv_matrix(
+            *fold_batchnorm(net.value_head, net.value_bn), shape)
+        self.policy_fc = self._linear(net.policy_fc)
+        self.value_fc = self._linear(net.value_fc)
+        self.value_scalar = self._linear(net.value_scalar)
+
+    @staticmethod
+    def _linear(layer):
+        '''nn.Linear -> (입력, 출력) 행렬, bias'''
+        return (layer.weight.detach().numpy().T.astype('float32').copy(),
+                layer.bias.detach().numpy().astype('float32').copy())
+
+    @staticmethod
+    def _affine(x, layer, relu=True):
+        x = x.dot(layer[0])
+        x += layer[1]
+        if relu:
+            np.maximum(x, 0, out=x)
+        return x
+
+    def predict(self, states):
+        '''states: (3, m, n) 또는 (B, 3, m, n) 배열
+           리턴: (B, m * n) 정책, (B, 1) 가치 (NeuralNetwork.predict와 같음)
+        '''
+        states = np.asarray(states, 'float32')
+        x = states.reshape(-1 if states.ndim == 4 else 1, self.conv[0].shape[0])
+        x = self._affine(x, self.conv)
+        residual = x
+        x = self._affine(x, self.conv1)
+        x = self._affine(x, self.conv2, relu=False)
+        x += residual
+        np.maximum(x, 0, out=x)
+
+        p = self._affine(x, self.policy_head)
+        p = self._affine(p, self.policy_fc, relu=False)
+        p -= p.max(axis=1, keepdims=True)
+        np.exp(p, out=p)
+        p /= p.sum(axis=1, keepdims=True)
+
+        v = self._affine(x, self.value_head)
+        v = self._affine(v, self.value_fc)
+        v = self._affine(v, self.value_scalar, relu=False)
+        np.tanh(v, out=v)
+        return p, v
+
+
+if __name__ == "__main__":
+    from benchmark import bench_frozen_forward
+    print('%10s %14s %14s %14s %10s' % ('batch', 'eager us', 'script us',
+                                        'numpy us', 'max err'))
+    for row in bench_frozen_forward():
+        print('%10d %14.1f %14.1f %14.1f %10.1e' % row)
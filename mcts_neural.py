@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+'''AlphaZero 방식의 신경망 MCTS
+   leaf를 만나면 NeuralNetwork의 정책(P)과 가치(v)로 확장하고 v를 백업 (랜덤 롤아웃 없음)
+   여러 시뮬레이션의 leaf를 모아서 한번의 배치 forward로 평가,
+   모으는 동안 같은 경로로 몰리지 않도록 virtual loss를 걸어둠
+   cache(eval_cache.EvalCache)를 주면 이미 평가한 국면은 신경망을 다시 부르지 않음
+'''
+import time
+import numpy as np
+from gym.utils import seeding
+
+from tictactoe_env import WIN_TABLE, POPCOUNT, pack_state, unpack_state
+
+PLAYER = 0
+OPPONENT = 1
+MARK_O = 2
+N, W, Q, P = 0, 1, 2, 3
+
+
+# node: (packed code, 둘 차례) -> edge (9, 4) 배열 (9칸에 N, W, Q, P)
+# W, Q는 그 node에서 둘 차례인 쪽 기준, 신경망 가치 v도 둘 차례인 쪽 기준
+class NeuralMCTS(object):
+    def __init__(self, net, n_simulations=100, batch_size=8, c_puct=5,
+                 virtual_loss=1, cache=None):
+        self.net = net
+        self.cache = cache
+        # hyperparameter
+        self.n_simulations = n_simulations  # 착수 1회당 시뮬레이션 수
+        self.batch_size = batch_size  # 한번에 평가할 leaf 수
+        self.c_puct = c_puct
+        self.virtual_loss = virtual_loss
+        self.epsilon = 0.25
+        self.alpha = 1.5
+
+        self.tree = {}
+        self.first_turn = None
+        self.action_count = None
+        # 탐색 통계: 확장한 node 수, 시뮬레이션 수, 신경망 호출 수, 탐색 시간
+        self.stats = {'nodes': 0, 'simulations': 0, 'evaluations': 0,
+                      'batches': 0, 'time': 0.}
+        self.reset_episode()
+        self.seed()
+
+    def seed(self, seed=None):
+        self.np_random, seed = seeding.np_random(seed)
+        return [seed]
+
+    def reset_episode(self):
+        self.action_count = -1
+
+    def reset_tree(self):
+        self.tree = {}
+
+    def nodes_per_sec(self):
+        if self.stats['time'] == 0:
+            return 0.
+        return self.stats['nodes'] / self.stats['time']
+
+    @staticmethod
+    def _key(code, to_move):
+        return code | to_move << 27
+
+    @staticmethod
+    def _legal(code):
+        '''빈칸 9비트 마스크'''
+        return ~(code | code >> 9) & 511
+
+    @staticmethod
+    def _play(code, to_move, cell):
+        '''착수 결과 (code, 끝났는지, 둔 쪽 기준 보상)'''
+        bit = 1 << cell
+        board = (code | code >> 9) & 511
+        # 돌 개수가 짝수면 O 차례 -> O표시 평면에도 기록
+        if POPCOUNT[board] % 2 == 0:
+            code |= bit << 18
+        code |= bit << (9 * to_move)
+        if WIN_TABLE[(code >> (9 * to_move)) & 511]:
+            return code, True, 1
+        if board | bit == 511:
+            return code, True, 0
+        return code, False, 0
+
+    def _expand(self, key, code, policy):
+        '''신경망 정책을 빈칸에만 나눠서 P로 설정'''
+        legal = (self._legal(code) >> np.arange(9)) & 1
+        prior = policy * legal
+        total = prior.sum()
+        edge = np.zeros((9, 4), 'float')
+        edge[:, P] = prior / total if total > 0 else legal / legal.sum()
+        self.tree[key] = edge
+        self.stats['nodes'] += 1
+        return edge
+
+    def _puct(self, edge, code):
+        total_visit = edge[:, N].sum()
+        puct = edge[:, Q] + self.c_puct * edge[:, P] * \
+            np.sqrt(total_visit) / (1 + edge[:, N])
+        legal = (self._legal(code) >> np.arange(9)) & 1
+        puct[legal == 0] = -np.inf
+        return puct
+
+    def _select(self, code, to_move):
+        '''root에서 PUCT로 내려가며 경로를 만들고 virtual loss를 걸어둠
+           리턴: (경로 [(edge, 칸)], leaf key, leaf code, leaf 차례, 끝난 경우 leaf 가치)
+        '''
+        path = []
+        while True:
+            key = self._key(code, to_move)
+            edge = self.tree.get(key)
+            if edge is None:
+                return path, key, code, to_move, None
+            puct = self._puct(edge, code)
+            best = np.flatnonzero(puct == puct.max())
+            cell = best[self.np_random.choice(len(best))]
+            edge[cell, N] += self.virtual_loss
+            edge[cell, W] -= self.virtual_loss
+            edge[cell, Q] = edge[cell, W] / edge[cell, N]
+            path.append((edge, cell))
+            code, done, reward = self._play(code, to_move, cell)
+            to_move = 1 - to_move
+            if done:
+                # 둔 쪽이 이겼으면 다음 차례 쪽 기준 -1
+                return path, None, code, to_move, -reward
+
+    def _backup(self, path, value):
+        '''virtual loss를 풀고 leaf 가치를 경로를 거슬러 올라가며 반영
+           value: leaf에서 둘 차례인 쪽 기준 가치
+        '''
+        for edge, cell in reversed(path):
+            value = -value
+            edge[cell, N] += 1 - self.virtual_loss
+            edge[cell, W] += value + self.virtual_loss
+            edge[cell, Q] = edge[cell, W] / edge[cell, N]
+
+    def _revert(self, path):
+        '''평가하지 않을 경로의 virtual loss만 되돌림'''
+        for edge, cell in path:
+            edge[cell, N] -= self.virtual_loss
+            edge[cell, W] += self.virtual_loss
+            if edge[cell, N] > 0:
+                edge[cell, Q] = edge[cell, W] / edge[cell, N]
+            else:
+                edge[cell, Q] = 0
+
+    def _evaluate(self, codes):
+        '''leaf들을 한번의 배치 forward로 평가'''
+        self.stats['evaluations'] += len(codes)
+        self.stats['batches'] += 1
+        if self.cache is not None:
+            return self.cache.evaluate(codes)
+        states = np.stack([unpack_state(c) for c in codes])
+        policy, value = self.net.predict(states)
+        return policy, value[:, 0]
+
+    def search(self, state, to_move, add_noise=True):
+        '''state에서 to_move 차례로 시뮬레이션을 돌리고 root의 방문 횟수 분포(9,)를 리턴'''
+        start = time.perf_counter()
+        code = pack_state(state)
+        root_key = self._key(code, to_move)
+        if root_key not in self.tree:
+            policy, _ = self._evaluate([code])
+            self._expand(root_key, code, policy[0])
+        root = self.tree[root_key]
+        # root 노이즈는 이번 탐색에만 쓰고 원래 P로 되돌림
+        prior = root[:, P].copy()
+        if add_noise:
+            legal = np.flatnonzero((self._legal(code) >> np.arange(9)) & 1)
+            root[legal, P] = (1 - self.epsilon) * root[legal, P] + \
+                self.epsilon * self.np_random.dirichlet(
+                    self.alpha * np.ones(len(legal)))
+        done = 0
+        while done < self.n_simulations:
+            pending = []
+            pending_keys = set()
+            while len(pending) < self.batch_size and \
+                    done + len(pending) < self.n_simulations:
+                path, key, leaf, leaf_move, value = self._select(code, to_move)
+                if value is not None:  # 게임이 끝난 leaf는 바로 백업
+                    self._backup(path, value)
+                    done += 1
+                    continue
+                if key in pending_keys:
+                    # 이미 평가 대기중인 leaf와 충돌: virtual loss만 풀고 이번 배치 마감
+                    self._revert(path)
+                    break
+                pending.append((path, key, leaf))
+                pending_keys.add(key)
+            if pending:
+                policy, value = self._evaluate([leaf for _, _, leaf in pending])
+                for i, (path, key, leaf) in enumerate(pending):
+                    self._expand(key, leaf, policy[i])
+                    self._backup(path, value[i])
+                done += len(pending)
+        root[:, P] = prior
+        self.stats['simulations'] += done
+        self.stats['time'] += time.perf_counter() - start
+        visit = root[:, N]
+        return visit / visit.sum()
+
+    def select_action(self, state, mode=''):
+        '''ZeroAgent와 같은 방식: mode='self'면 첫턴 기준으로 행동주체를 교대'''
+        if mode == 'self':
+            self.action_count += 1
+            user_type = (self.first_turn + self.action_count) % 2
+        else:
+            user_type = PLAYER
+        pi = self.search(state, user_type)
+        best = np.flatnonzero(pi == pi.max())
+        cell = best[self.np_random.choice(len(best))]
+        return np.r_[user_type, divmod(cell, 3)]
+
+
+if __name__ == "__main__":
+    import argparse
+    from tictactoe_env import TicTacToeEnv
+    from neural_network_cpu import NeuralNetwork
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--simulations', type=int, default=100,
+                        help='착수 1회당 시뮬레이션 수')
+    parser.add_argument('--batch-size', type=int, default=8,
+                        help='한번에 평가할 leaf 수')
+    parser.add_argument('--episodes', type=int, default=20)
+    parser.add_argument('--frozen', action='store_true',
+                        help='BN을 접은 NumPy 추론(FrozenNetwork)으로 평가')
+    parser.add_argument('--cache-size', type=int, default=0,
+                        help='평가 캐시 크기 (0이면 캐시 없음)')
+    args = parser.parse_args()
+    env = TicTacToeEnv()
+    env.seed(2018)
+    net = NeuralNetwork()
+    if args.frozen:
+        from frozen_network import FrozenNetwork
+        net = FrozenNetwork(net)
+    cache = None
+    if args.cache_size:
+        from eval_cache import EvalCache
+        cache = EvalCache(net, args.cache_size)
+    agent = NeuralMCTS(net, args.simulations, args.batch_size, cache=cache)
+    agent.seed(2018)
+    result = {1: 0, 0: 0, -1: 0}
+    for e in range(args.episodes):
+        state = env.reset()
+        agent.first_turn = agent.np_random.choice(2, replace=False)
+        agent.reset_episode()
+        done = False
+        while not done:
+            action = agent.select_action(state, mode='self')
+            state, reward, done, info = env.step(action)
+        result[reward] += 1
+    print('Win: %d Lose: %d Draw: %d' % (result[1], result[-1], result[0]))
+    print('nodes: %d simulations: %d batches: %d nodes/sec: %.0f' %
+          (agent.stats['nodes'], agent.stats['simulations'],
+           agent.stats['batches'], agent.nodes_per_sec()))
+    if cache is not None:
+        print('cache: %d entries, hits: %d misses: %d evictions: %d '
+              'hit rate: %.1f%%' % (len(cache), cache.stats['hits'],
+                                    cache.stats['misses'],
+                                    cache.stats['evictions'],
+                                    cache.hit_rate() * 100))
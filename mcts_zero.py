@@ -1,17 +1,38 @@
 # -*- coding: utf-8 -*-
-from tictactoe_env import TicTacToeEnv
+from tictactoe_env import TicTacToeEnv, set_verbosity, pack_state, \
+    unpack_states, BITS_TO_PLANE
+from solver import SolvedTable, TABLE_PATH, code_index
+from selfplay_data import SelfPlayWriter, load_tree
+from symmetry import transform_code, augment, PERMS, INV_PERMS
+from node_pool import NodePool, CANONICAL_TRANSFORM, CANONICAL_KEY, node_key
 from gym.utils import seeding
 import numpy as np
-import h5py
-import math
-from collections import deque, defaultdict
+import argparse
+import logging
+import multiprocessing
+import queue
+import traceback
+from collections import deque
 
 
+logger = logging.getLogger(__name__)
+
 PLAYER = 0
 OPPONENT = 1
 MARK_O = 2
 N, W, Q, P = 0, 1, 2, 3
 episode_count = 20000
+# 돌이 놓인 칸의 비트보드별 합법수 마스크 (매 수 계산하지 않도록 미리 만듦)
+LEGAL_MASK = tuple(BITS_TO_PLANE[b] == 0 for b in range(512))
+# 비트보드별 비트가 켜진 칸 번호 (빈칸, 바로 이기는 칸 목록)
+BITS_TO_CELLS = tuple(tuple(np.flatnonzero(BITS_TO_PLANE[b]).tolist())
+                      for b in range(512))
+# 변환별 원래 좌표 -> 대표 좌표 (파이썬 리스트로 한 칸씩 찾는 용)
+INV_PERM_LISTS = tuple(INV_PERMS.tolist())
+# 비트보드별 root가 아닌 수의 사전확률: 빈칸마다 1 / 빈칸 수 (다 찬 보드는 0)
+UNIFORM_PRIOR = tuple(LEGAL_MASK[b] * (1 / (9 - bin(b).count('1')))
+                      if b != 511 else LEGAL_MASK[b] * 0.
+                      for b in range(512))
 
 
 # 몬테카를로 트리 탐색 클래스 (최초 train 데이터 생성 용)
@@ -19,30 +40,58 @@ episode_count = 20000
 # edge 구성: (3*3*4)array: 9개 좌표에 4개의 정보 매칭
 # 4개의 정보: (N, W, Q, P) N: edge 방문횟수, W: 보상누적값, Q: 보상평균(W/N), P: edge 선택확률
 # edge[좌표행][좌표열][번호]로 접근
+# symmetry=True면 대칭인 state를 대표 node 하나로 모아 통계를 공유 (트리의 edge는 대표 좌표 기준)
+# 누적 트리(tree_memory)는 NodePool에 node마다 (9, 4) float32 edge로 저장
+# solver(SolvedTable)를 주면 바로 이기는 수가 있을 때 탐색 없이 그 수를 둠
+# board_shape=(m, n)이면 TicTacToeEnv(m, n, k) 보드에서 동작 (edge는 (m, n, 4))
+#  대칭과 solver는 3x3 보드만 지원 -> 다른 보드에선 symmetry를 끄고 solver는 ValueError
 class MCTS(object):
-    def __init__(self):
+    def __init__(self, symmetry=True, solver=None, board_shape=(3, 3)):
+        self.board_shape = tuple(board_shape)
+        self.n_cells = self.board_shape[0] * self.board_shape[1]
+        square = self.board_shape == (3, 3)
+        if solver is not None and not square:
+            raise ValueError('solver는 3x3 보드만 지원: %s' % (board_shape,))
+        self.symmetry = symmetry and square
+        self.solver = solver
         # memories
-        self.state_memory = deque(maxlen=9 * episode_count)
-        self.node_memory = deque(maxlen=9 * episode_count)
-        self.edge_memory = deque(maxlen=9 * episode_count)
-        self.pi_memory = deque(maxlen=9 * episode_count)
+        self.state_memory = deque(maxlen=self.n_cells * episode_count)
+        self.node_memory = deque(maxlen=self.n_cells * episode_count)
+        self.edge_memory = deque(maxlen=self.n_cells * episode_count)
+        self.pi_memory = deque(maxlen=self.n_cells * episode_count)
+        # 누적 트리: node(packed code) -> (칸 수, 4) edge, backup()에서 제자리 업데이트
+        self.tree_memory = NodePool(n_cells=self.n_cells)
 
         # reset_step member
-        self.tree_memory = None
         self.pr = None
-        self.puct = None
         self.edge = None
-        self.pi = None
+        self.edge_cells = None
         self.legal_move_n = None
-        self.empty_loc = None
+        self.legal = None
+        self.legal_cells = None
+        self.uniform_prior = False
         self.total_visit = None
         self.first_turn = None
 
         # reset_episode member
         self.action_memory = None
+        self.transform_memory = None
         self.action_count = None
         self.board = None
         self.state = None
+        self.code = None
+        self.key = None  # 대표 node의 node 번호 (3x3에서 대칭을 쓸 때만, 아니면 None)
+
+        # 수마다 쓰는 버퍼 (매 수 새로 만들지 않음)
+        # edge: 칸 수만큼의 수를 담는 버퍼에서 한 칸씩 꺼내 씀, edge_memory가 참조하므로
+        #  다 쓰면 덮어쓰지 않고 새로 만듦
+        self.edge_buffer = None
+        self.edge_cell_buffer = None
+        self.edge_slot = self.n_cells
+        # PUCT 계산용 (트리와 같은 float32), self.puct는 계산 결과 (대표 좌표 리스트)
+        self.puct = None
+        self.puct_buffer = np.zeros(self.n_cells, self.tree_memory.data.dtype)
+        self.work_buffer = np.zeros(self.n_cells, self.tree_memory.data.dtype)
 
         # hyperparameter
         self.c_puct = 5
@@ -59,143 +108,238 @@ class MCTS(object):
         return [seed]
 
     def _reset_step(self):
-        self.edge = np.zeros((3, 3, 4), 'float')
-        self.pi = np.zeros((3, 3), 'float')
-        self.puct = np.zeros((3, 3), 'float')
+        if self.edge_slot == self.n_cells:
+            self.edge_buffer = np.zeros((self.n_cells,) + self.board_shape + (4,),
+                                        'float')
+            # 같은 버퍼를 (수, 칸 수, 4)로 본 것 (수마다 reshape하지 않음)
+            self.edge_cell_buffer = self.edge_buffer.reshape(
+                self.n_cells, self.n_cells, 4)
+            self.edge_slot = 0
+        self.edge = self.edge_buffer[self.edge_slot]
+        self.edge_cells = self.edge_cell_buffer[self.edge_slot]
+        self.edge_slot += 1
         self.total_visit = 0
         self.legal_move_n = 0
-        self.empty_loc = None
+        self.legal = None
+        self.legal_cells = None
         self.pr = 0
-        self.tree_memory = defaultdict(lambda: 0)
 
     def _reset_episode(self):
-        self.action_memory = deque(maxlen=9)
+        self.action_memory = deque(maxlen=self.n_cells)
+        self.transform_memory = deque(maxlen=self.n_cells)
         self.action_count = -1
-        self.board = np.zeros((3, 3), 'float')
-        self.state = np.zeros((3, 3, 3), 'float')
 
     def select_action(self, state):
         self.action_count += 1
-        # save raw state
-        self.state_memory.appendleft(state.flatten())
-        # state를 hash로 변환 (dict의 key로 쓰려고)
-        self.state = np.copy(state)
-        state_hash = hash(self.state.tostring())
+        # state를 packed code로 변환 (복사하지 않고 dict의 key, 저장용으로 사용)
+        # state는 환경이 재사용하는 배열일 수 있으므로 이번 호출 안에서만 참조
+        self.state = state
+        self.code = pack_state(state)
+        # save raw state (packed code로 저장, 파일로 쓸 때 unpack_states로 되돌림)
+        self.state_memory.appendleft(self.code)
+        node = self.code
+        # 대칭인 state는 대표 code로 모으고 그때의 변환도 기억 (node 번호로 미리 계산한 표에서 찾음)
+        transform = 0
+        self.key = None
+        if self.symmetry:
+            key = node_key(node)
+            transform = CANONICAL_TRANSFORM[key]
+            node = transform_code(node, transform)
+            self.key = CANONICAL_KEY[key]
         # 변환한 state를 node로 부르자. 저장!
-        self.node_memory.appendleft(state_hash)
+        self.node_memory.appendleft(node)
+        self.transform_memory.appendleft(transform)
         # 호출될 때마다 첫턴 기준 교대로 행동주체 바꿈, 최종 action에 붙여줌
-        user_type = (self.first_turn + self.action_count) % 2
+        # (first_turn은 넘파이 정수일 수 있으므로 파이썬 int로 바꿔서 계산)
+        user_type = (int(self.first_turn) + self.action_count) % 2
         self.init_edge()
         self._cal_puct()
-        # print(self.puct)
-        # 빈자리가 아닌 곳은 -9999로 최댓값 방지
-        puct = self.puct.tolist()
-        for i, v in enumerate(puct):
-            for k, s in enumerate(v):
-                if [i, k] not in self.empty_loc.tolist():
-                    puct[i][k] = -9999
-        # PUCT가 최댓값인 곳 찾기
-        self.puct = np.asarray(puct)
-        puct_max = np.argwhere(self.puct == self.puct.max()).tolist()
-        # 동점 처리
-        move_target = puct_max[self.np_random.choice(
-            len(puct_max), replace=False)]
-        # 두 배열을 붙여서 최종 action 구성
-        action = np.r_[user_type, move_target]
+        # 후보는 빈자리만
+        cells = self.legal_cells
+        # 바로 이기는 수가 있으면 그 수만 남김 (terminal value shortcut)
+        if self.solver is not None:
+            win_moves = int(self.solver.win_moves[code_index(self.code)])
+            if win_moves:
+                cells = BITS_TO_CELLS[win_moves]
+        # PUCT가 최댓값인 곳 찾기 (칸 수가 적어서 리스트로 찾는게 더 빠름)
+        # PUCT는 대표 좌표 기준이므로 후보 칸을 대표 좌표로 바꿔서 찾음
+        puct = self.puct
+        if self.symmetry:
+            to_node = INV_PERM_LISTS[transform]
+            values = [puct[to_node[i]] for i in cells]
+        else:
+            values = [puct[i] for i in cells]
+        puct_best = max(values)
+        puct_max = [i for i, v in zip(cells, values) if v == puct_best]
+        # 동점일 때만 랜덤으로 고름
+        move_target = puct_max[0]
+        if len(puct_max) > 1:
+            move_target = puct_max[self.np_random.randint(len(puct_max))]
+        # 행동주체와 좌표로 최종 action 구성
+        move_row, move_col = divmod(move_target, self.board_shape[1])
+        action = np.array([user_type, move_row, move_col])
         self.action_memory.appendleft(action)
         self._reset_step()
         return action
 
-    def init_edge(self, pr=0):
+    def init_edge(self, pr=None):
         '''들어온 상태에서 가능한 action 자리의 엣지를 초기화 (P값 배치)
            빈자리를 검색하여 규칙위반 방지 및 랜덤 확률 생성
+           pr: (m, n) 사전확률 (None 또는 예전 호출처럼 0 같은 스칼라면 빈자리에 동일 확률)
         '''
+        if self.n_cells == 9:
+            # 빈 자리 마스크: packed code의 0, 1번 평면을 합친 비트보드에서 바로 구함
+            board_bits = (self.code | self.code >> 9) & 511
+            self.legal = LEGAL_MASK[board_bits]
+            self.legal_cells = BITS_TO_CELLS[511 ^ board_bits]
+        else:
+            board = self.state[PLAYER] + self.state[OPPONENT]
+            self.legal = board.reshape(self.n_cells) == 0
+            self.legal_cells = np.flatnonzero(self.legal).tolist()
+        self.legal_move_n = len(self.legal_cells)
+        self.uniform_prior = False
         # 들어 온 사전확률이 없으면
-        if pr == 0:
-            # 빈 자리의 좌표와 개수를 저장하고 이를 이용해 동일 확률을 계산
-            self.board = self.state[PLAYER] + self.state[OPPONENT]
-            self.empty_loc = np.asarray(np.where(self.board == 0)).transpose()
-            self.legal_move_n = self.empty_loc.shape[0]
+        if pr is None or np.isscalar(pr):
+            # 빈 자리의 개수를 이용해 동일 확률을 계산
             prob = 1 / self.legal_move_n
             # root node 일땐 확률에 노이즈를 줘라
             if self.action_count == 0:
                 self.pr = (1 - self.epsilon) * prob + self.epsilon * \
                     self.np_random.dirichlet(
                         self.alpha * np.ones(self.legal_move_n))
-            else:  # 아니면 랜덤 확률로 n분의 1
-                self.pr = prob * np.ones(self.legal_move_n)
-            # 빈자리의 엣지에 넣기
-            for i in range(self.legal_move_n):
-                self.edge[self.empty_loc[i][0]
-                          ][self.empty_loc[i][1]][P] = self.pr[i]
+                # 빈자리의 엣지에 넣기
+                self.edge_cells[self.legal, P] = self.pr
+            elif self.n_cells == 9:
+                # 아니면 랜덤 확률로 n분의 1: 비트보드별로 미리 만든 행을 통째로 씀
+                # (_cal_puct도 대표 node의 비트보드로 같은 표에서 꺼냄)
+                self.pr = prob
+                self.edge_cells[:, P] = UNIFORM_PRIOR[board_bits]
+                self.uniform_prior = True
+            else:
+                self.pr = prob
+                self.edge_cells[self.legal, P] = self.pr
         else:  # 사전확률 값이 들어오면 그걸로 넣기
             self.pr = pr
-            for i in range(3):
-                for k in range(3):
-                    self.edge[i][k][P] = self.pr[i][k]
+            self.edge[:, :, P] = self.pr
         # edge 메모리에 저장
         self.edge_memory.appendleft(self.edge)
 
     def _cal_puct(self):
-        '''9개의 좌표에 PUCT값을 계산하여 매칭'''
-        # 지금까지의 액션을 반영한 트리 구성 하기. dict{node: edge}로 해봄
-        memory = list(zip(self.node_memory, self.edge_memory))
-        # 지금까지의 동일한 state에 대한 edge의 N,W 누적
-        # Q,P는 덧셈이라 손상되므로 보정함
-        for v in memory:
-            key = v[0]
-            value = v[1]
-            self.tree_memory[key] += value
-        if self.node_memory[0] in self.tree_memory:
-            edge = self.tree_memory[self.node_memory[0]]
-            for i in range(3):
-                for k in range(3):
-                    self.total_visit += edge[i][k][N]
-            for c in range(3):
-                for r in range(3):
-                    if edge[c][r][N] != 0:
-                        # Q 보정
-                        edge[c][r][Q] = edge[c][r][W] / edge[c][r][N]
-                    # P 보정
-                    edge[c][r][P] = self.edge[c][r][P]
-                    # PUCT 계산!
-                    self.puct[c][r] = edge[c][r][Q] + \
-                        self.c_puct * edge[c][r][P] * \
-                        math.sqrt(self.total_visit - edge[c][r][N]) / \
-                        (1 + edge[c][r][N])
-            # 보정한 edge를 최종 트리에 업데이트
-            self.tree_memory[self.node_memory[0]] = edge
+        '''모든 좌표에 PUCT값을 계산하여 매칭'''
+        # 누적 트리에서 현재 node의 edge를 바로 꺼냄 (매 수마다 재구성하지 않음)
+        node = self.node_memory[0]
+        transform = self.transform_memory[0]
+        edge = self.tree_memory.edge(node, self.key)
+        # 대칭을 안 쓰면 대표 좌표 = 현재 좌표
+        perm = slice(None)
+        if self.symmetry:
+            perm = PERMS[transform]
+        # P 보정 (트리에는 대표 좌표로 저장)
+        # 동일 확률이면 대표 node의 빈칸이 곧 대표 좌표의 빈칸이므로 표에서 바로 꺼냄
+        if self.uniform_prior:
+            edge[:, P] = UNIFORM_PRIOR[(node | node >> 9) & 511]
+        else:
+            edge[:, P] = self.edge_cells[perm, P]
+        # PUCT 계산! Q + c_puct * P * sqrt(총 방문 - N) / (1 + N)
+        # 대표 좌표에서 모든 칸을 한번에 계산해서 리스트로 둠 (select_action에서 현재 좌표로 찾음)
+        # 칸 수가 적어서 연산보다 호출 비용이 크므로 미리 만든 float32 버퍼에 제자리로 계산
+        # (파이썬 스칼라와 섞지 않고 배열끼리 연산, 연산 순서와 float32 반올림은 그대로)
+        n, q, p = edge[:, N], edge[:, Q], edge[:, P]
+        # 방문 횟수는 정수라 더하는 순서와 관계없이 값이 같음
+        self.total_visit = sum(n.tolist())
+        puct, work = self.puct_buffer, self.work_buffer
+        work.fill(self.total_visit)
+        work -= n
+        np.sqrt(work, out=work)
+        puct.fill(self.c_puct)
+        puct *= p
+        puct *= work
+        work.fill(1)
+        work += n
+        puct /= work
+        puct += q
+        self.puct = puct.tolist()
 
     def backup(self, reward, info):
         '''에피소드가 끝나면 지나 온 edge의 N과 W를 업데이트 함'''
         steps = info['steps']
         for i in range(steps):
+            row = self.action_memory[i][1]
+            col = self.action_memory[i][2]
+            # 이번 에피소드의 edge(저장용)와 누적 트리의 edge를 같이 업데이트
+            # 누적 트리는 (칸 수, 4) 대표 좌표 기준
+            edge = self.edge_memory[i]
+            tree_edge = self.tree_memory[self.node_memory[i]]
+            cell = row * self.board_shape[1] + col
+            if self.symmetry:
+                cell = INV_PERM_LISTS[self.transform_memory[i]][cell]
             if self.action_memory[i][0] == PLAYER:
-                self.edge_memory[i][self.action_memory[i][1]
-                                    ][self.action_memory[i][2]][W] += reward
+                edge[row][col][W] += reward
+                tree_edge[cell][W] += reward
             else:
-                self.edge_memory[i][self.action_memory[i][1]
-                                    ][self.action_memory[i][2]][W] -= reward
-            self.edge_memory[i][self.action_memory[i][1]
-                                ][self.action_memory[i][2]][N] += 1
+                edge[row][col][W] -= reward
+                tree_edge[cell][W] -= reward
+            edge[row][col][N] += 1
+            tree_edge[cell][N] += 1
+            # Q 보정
+            tree_edge[cell][Q] = tree_edge[cell][W] / tree_edge[cell][N]
         self._reset_episode()
 
+    def merge_tree(self, nodes, edges):
+        '''다른 MCTS(병렬 워커)의 누적 트리를 합침: N, W는 더하고 Q는 다시 계산
+           nodes: (K,) packed code, edges: (K, 9, 4) 또는 (K, 3, 3, 4)
+        '''
+        self.tree_memory.merge(nodes, edges)
 
-if __name__ == "__main__":
+    def restore_tree(self, nodes, sums):
+        '''load_tree()로 읽은 (node, 합친 edge)로 누적 트리를 다시 만듦 (이어하기용)
+           N, W만 합치고 Q, P는 버림
+        '''
+        sums = np.array(sums, 'float')
+        sums[:, :, :, Q] = 0
+        sums[:, :, :, P] = 0
+        self.merge_tree(nodes, sums)
+
+
+def run_selfplay(episodes, seed=2018, symmetry=True, solver=None,
+                 log_interval=0, writer=None, augment_data=False,
+                 profiler=None, tree=None):
+    '''MCTS 셀프 플레이를 episodes판 진행하고 (MCTS, 통계 dict)를 리턴
+       writer(SelfPlayWriter)를 주면 에피소드가 끝날 때마다 데이터를 파일로 보내고
+       메모리에는 남기지 않음, writer에 이미 저장된 데이터가 있으면 트리를 복구하고 이어서 진행
+       tree: 미리 채워 둘 load_tree() 결과 (주면 writer의 데이터로 복구하지 않음)
+       profiler(profiling.Profiler)를 주면 env.step, select_action, init_edge, _cal_puct,
+       backup, 파일 쓰기의 시간을 재고 중간 집계에 처리량을 같이 출력
+    '''
+    # 매 수 출력 여부는 한번만 확인 (꺼져 있으면 보드 계산도 안 함)
+    debug = logger.isEnabledFor(logging.DEBUG)
     # 환경 생성 및 시드 설정
     env = TicTacToeEnv()
-    env.seed(2018)
+    env.seed(seed)
     # 셀프 플레이 인스턴스 생성
-    selfplay = MCTS()
-    selfplay.seed(2018)
+    selfplay = MCTS(symmetry=symmetry, solver=solver)
+    selfplay.seed(seed)
+    if tree is None and writer is not None and writer.episodes:
+        tree = load_tree(writer.data_dir, symmetry)
+    if tree is not None:
+        selfplay.restore_tree(*tree)
+    if profiler is not None:
+        profiler.instrument(env, 'step', 'env.step')
+        profiler.instrument(selfplay, 'select_action', 'MCTS.select_action')
+        profiler.instrument(selfplay, 'init_edge', 'MCTS.init_edge')
+        profiler.instrument(selfplay, '_cal_puct', 'MCTS._cal_puct')
+        profiler.instrument(selfplay, 'backup', 'MCTS.backup')
+        if writer is not None:
+            profiler.instrument(writer, 'append_episode', 'io.append_episode')
     # 통계용
     result = {1: 0, 0: 0, -1: 0}
     play_mark_O = 0
     win_mark_O = 0
     # train data 생성
-    for e in range(episode_count):
+    for e in range(episodes):
         state = env.reset()
-        print('-' * 22, '\nepisode: %d' % (e + 1))
+        if debug:
+            logger.debug('%s\nepisode: %d', '-' * 22, e + 1)
         # 첫턴을 나와 상대 중 누가 할지 정하기
         selfplay.first_turn = selfplay.np_random.choice(2, replace=False)
         # 첫턴인 경우 기록
@@ -204,27 +348,268 @@ if __name__ == "__main__":
         done = False
         while not done:
             # 보드 상황 출력: 내 착수:1, 상대 착수:2
-            print(state[PLAYER] + state[OPPONENT] * 2)
+            if debug:
+                logger.debug(state[PLAYER] + state[OPPONENT] * 2)
             # action 선택하기
             action = selfplay.select_action(state)
             # action 진행
             state, reward, done, info = env.step(action)
         if done:
             # 승부난 보드 보기: 내 착수:1, 상대 착수:2
-            print(state[PLAYER] + state[OPPONENT] * 2)
+            if debug:
+                logger.debug(state[PLAYER] + state[OPPONENT] * 2)
             # 보상을 edge에 백업
             selfplay.backup(reward, info)
+            # 이번 에피소드 데이터를 파일로 (메모리는 최근 것부터 저장되어 있음)
+            if writer is not None:
+                steps = info['steps']
+                states = unpack_states(
+                    [selfplay.state_memory[i] for i in range(steps - 1, -1, -1)])
+                edges = np.asarray(
+                    [selfplay.edge_memory[i] for i in range(steps - 1, -1, -1)])
+                if augment_data:
+                    states, edges = augment(states, edges)
+                writer.append_episode(states, edges)
+                selfplay.state_memory.clear()
+                selfplay.edge_memory.clear()
             # 결과 dict에 기록
             result[reward] += 1
             if reward == 1:
                 if env.mark_O == PLAYER:
                     win_mark_O += 1
-    # 에피소드 통계
-    print('-' * 22, '\nWin: %d Lose: %d Draw: %d Winrate: %0.1f%% PlayMarkO: %d WinMarkO: %d' %
-          (result[1], result[-1], result[0], result[1] / episode_count * 100, play_mark_O, win_mark_O))
+            if profiler is not None:
+                profiler.episode_done(info['steps'])
+        # 중간 집계 출력
+        if log_interval and (e + 1) % log_interval == 0:
+            logger.info('episode: %d Win: %d Lose: %d Draw: %d Nodes: %d',
+                        e + 1, result[1], result[-1], result[0],
+                        len(selfplay.tree_memory))
+            if profiler is not None:
+                logger.info('episodes/sec: %.1f moves/sec: %.1f',
+                            *profiler.rates())
     env.close()
-    # data save
-    with h5py.File('data/state_memory.hdf5', 'w') as hf:
-        hf.create_dataset("state", data=selfplay.state_memory)
-    with h5py.File('data/edge_memory.hdf5', 'w') as hf:
-        hf.create_dataset("edge", data=selfplay.edge_memory)
+    stats = {'result': result, 'play_mark_O': play_mark_O,
+             'win_mark_O': win_mark_O}
+    return selfplay, stats
+
+
+class _QueueWriter(object):
+    '''워커 프로세스용 writer: 끝난 에피소드를 batch판씩 모아 큐로 부모 프로세스에 보냄
+       메시지에 (워커 번호, 배치 번호)를 붙여서 부모가 정해진 순서로 쓸 수 있게 함
+    '''
+
+    def __init__(self, results, batch, worker_id):
+        self.results = results
+        self.batch = batch
+        self.worker_id = worker_id
+        self.batch_index = 0
+        # run_selfplay가 이어하기 여부를 확인하는 값 (복구는 부모가 읽은 트리로 함)
+        self.episodes = 0
+        self.states = []
+        self.edges = []
+        self.buffer_episodes = 0
+
+    def append_episode(self, states, edges, episodes=1):
+        self.states.append(states)
+        self.edges.append(edges)
+        self.buffer_episodes += episodes
+        if self.buffer_episodes >= self.batch:
+            self.flush()
+
+    def flush(self):
+        if self.buffer_episodes:
+            self.results.put(('episodes', self.worker_id, self.batch_index,
+                              np.concatenate(self.states),
+                              np.concatenate(self.edges),
+                              self.buffer_episodes))
+            self.batch_index += 1
+        self.states = []
+        self.edges = []
+        self.buffer_episodes = 0
+
+
+def _selfplay_worker(worker_id, episodes, seed, symmetry, solver,
+                     augment_data, batch, tree, send_data, results):
+    '''워커 프로세스: 자기 몫의 에피소드를 자기 시드로 진행하면서 끝난 에피소드를 results 큐로 보냄
+       (send_data가 False면 데이터는 보내지 않음) 마지막에 자기 트리, 통계, 보낸 배치 수를 보냄
+    '''
+    try:
+        writer = _QueueWriter(results, batch, worker_id) if send_data else None
+        selfplay, stats = run_selfplay(episodes, seed + worker_id, symmetry,
+                                       solver, writer=writer,
+                                       augment_data=augment_data, tree=tree)
+        batches = 0
+        if writer is not None:
+            writer.flush()
+            batches = writer.batch_index
+        if tree is not None:
+            # 복구한 트리는 부모가 한번만 합치므로 빼고 이번에 늘어난 몫만 보냄
+            selfplay.restore_tree(tree[0], -tree[1])
+        results.put(('done', worker_id, batches, selfplay.tree_memory.nodes(),
+                     selfplay.tree_memory.edges(), stats))
+    except Exception:
+        results.put(('error', worker_id, traceback.format_exc()))
+
+
+def parallel_selfplay(episodes, workers, seed=2018, symmetry=True,
+                      solver=None, writer=None, augment_data=False, batch=100):
+    '''에피소드를 workers개 프로세스에 나눠 셀프 플레이하고 (합친 MCTS, 통계 dict)를 리턴
+       워커 i는 시드 seed + i로 자기 MCTS, 환경을 만듦
+       워커는 batch판이 끝날 때마다 데이터를 보내고 부모가 받는 대로 writer로 씀
+        -> 파일에는 (배치 번호, 워커 번호) 순서로 돌아가며 씀
+           (워커 0의 첫 배치, 워커 1의 첫 배치, ..., 워커 0의 둘째 배치, ...)
+           순서보다 먼저 도착한 배치는 차례가 올 때까지 메모리에 들고 있음
+        -> 같은 seed, workers면 워커들이 끝내는 순서와 관계없이 같은 파일이 나옴
+       writer에 이미 저장된 데이터가 있으면 블록 단위로 읽어 복구한 트리로 모든 워커가 시작
+       writer가 없으면 워커는 데이터를 보내지 않고 트리와 통계만 합침
+    '''
+    tree = None
+    if writer is not None and writer.episodes:
+        tree = load_tree(writer.data_dir, symmetry)
+    shares = [episodes // workers + (i < episodes % workers)
+              for i in range(workers)]
+    # 쓰는 순서: 배치 번호 -> 워커 번호, 워커별 배치 수는 자기 몫의 에피소드로 정해짐
+    n_batches = [(share + batch - 1) // batch for share in shares]
+    order = [(w, b) for b in range(max(n_batches, default=0))
+             for w in range(workers) if b < n_batches[w]]
+    # 부모가 쓰는 속도보다 빨리 쌓이지 않도록 큐 크기를 제한
+    results = multiprocessing.Queue(maxsize=2 * workers)
+    processes = [multiprocessing.Process(
+        target=_selfplay_worker,
+        args=(i, shares[i], seed, symmetry, solver, augment_data, batch, tree,
+              writer is not None, results), daemon=True)
+        for i in range(workers)]
+    for process in processes:
+        process.start()
+    selfplay = MCTS(symmetry=symmetry, solver=solver)
+    selfplay.seed(seed)
+    if tree is not None:
+        selfplay.restore_tree(*tree)
+    stats = {'result': {1: 0, 0: 0, -1: 0}, 'play_mark_O': 0, 'win_mark_O': 0}
+    # 차례가 오기 전에 도착한 배치, 끝난 워커의 (트리, 통계)
+    pending = {}
+    finished = {}
+    position = 0
+    try:
+        while len(finished) < workers:
+            try:
+                message = results.get(timeout=1.)
+            except queue.Empty:
+                if any(p.exitcode not in (None, 0) for p in processes):
+                    raise RuntimeError('셀프 플레이 워커가 비정상 종료됨')
+                continue
+            if message[0] == 'episodes':
+                _, worker_id, batch_index, states, edges, n = message
+                pending[worker_id, batch_index] = (states, edges, n)
+                while position < len(order) and order[position] in pending:
+                    writer.append_episode(*pending.pop(order[position]))
+                    position += 1
+            elif message[0] == 'error':
+                raise RuntimeError('셀프 플레이 워커 %d 실패:\n%s' % message[1:])
+            else:
+                _, worker_id, batches, nodes, edges, worker_stats = message
+                if writer is not None and batches != n_batches[worker_id]:
+                    raise RuntimeError('셀프 플레이 워커 %d의 배치 수가 다름: %d != %d'
+                                       % (worker_id, batches,
+                                          n_batches[worker_id]))
+                finished[worker_id] = (nodes, edges, worker_stats)
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+            process.join()
+    # 트리도 워커 번호 순서로 합침
+    for worker_id in range(workers):
+        nodes, edges, worker_stats = finished[worker_id]
+        selfplay.merge_tree(nodes, edges)
+        for k in worker_stats['result']:
+            stats['result'][k] += worker_stats['result'][k]
+        stats['play_mark_O'] += worker_stats['play_mark_O']
+        stats['win_mark_O'] += worker_stats['win_mark_O']
+    return selfplay, stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-v', '--verbose', action='store_const', const=2,
+                        default=1, dest='verbosity', help='매 수마다 보드 출력')
+    parser.add_argument('-q', '--quiet', action='store_const', const=0,
+                        dest='verbosity', help='출력 없이 실행')
+    parser.add_argument('--no-symmetry', action='store_true',
+                        help='대칭인 state를 따로 저장')
+    parser.add_argument('--augment', action='store_true',
+                        help='저장할 학습 데이터를 8가지 대칭으로 늘림')
+    parser.add_argument('--solver', action='store_true',
+                        help='완전 해석 테이블로 바로 이기는 수를 찾음')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='셀프 플레이를 나눠 돌릴 프로세스 수')
+    parser.add_argument('--seed', type=int, default=2018)
+    parser.add_argument('--log-interval', type=int, default=1000,
+                        help='중간 집계를 출력할 에피소드 간격')
+    parser.add_argument('--chunk-size', type=int, default=4096,
+                        help='파일에 한번에 붙여 쓸 행 수')
+    parser.add_argument('--compression', default=None,
+                        help='hdf5 압축 방식 (예: gzip)')
+    parser.add_argument('--resume', action='store_true',
+                        help='data/에 저장된 데이터에 이어서 진행')
+    parser.add_argument('--profile', nargs='?', const='-', default=None,
+                        metavar='PATH',
+                        help='단계별 시간 측정 (PATH를 주면 요약을 JSON으로 저장, '
+                             '--workers 1에서만)')
+    parser.add_argument('--trace', default=None, metavar='PATH',
+                        help='호출마다 시간을 Chrome trace JSON으로 저장 (--profile 포함)')
+    parser.add_argument('--cprofile', default=None, metavar='PATH',
+                        help='cProfile로 실행하고 통계를 PATH에 저장')
+    args = parser.parse_args()
+    # 단계별 측정은 이 프로세스의 MCTS에 붙이므로 워커 프로세스에서 돈 시간은 잡히지 않음
+    if (args.profile or args.trace) and args.workers > 1:
+        parser.error('--profile, --trace는 --workers 1에서만 쓸 수 있음')
+    set_verbosity(args.verbosity)
+    profiler = None
+    if args.profile or args.trace:
+        from profiling import Profiler
+        profiler = Profiler(window=max(args.log_interval, 2),
+                            trace=args.trace is not None)
+    if args.cprofile:
+        import cProfile
+        cprofiler = cProfile.Profile()
+        cprofiler.enable()
+    solved = SolvedTable(TABLE_PATH) if args.solver else None
+    # data save: 에피소드가 끝날 때마다 chunk 단위로 저장
+    with SelfPlayWriter('data', args.chunk_size, args.compression,
+                        args.resume, args.augment) as writer:
+        # 이어하는 경우 남은 에피소드만, 시드도 겹치지 않게 밀어서 진행
+        done_episodes = writer.episodes
+        remain = episode_count - done_episodes
+        if done_episodes:
+            logger.info('resume from episode: %d', done_episodes)
+        # 이어 쓸 때는 파일에 기록된 augment 설정을 따름 (섞이면 load_tree의 N, W가 틀어짐)
+        if writer.augment != args.augment:
+            logger.warning('기존 데이터의 augment=%s 설정으로 이어서 씀 (--augment 무시)',
+                           writer.augment)
+        if args.workers > 1:
+            # 병렬 모드도 워커가 보낸 에피소드를 받는 대로 저장
+            selfplay, stats = parallel_selfplay(
+                remain, args.workers, args.seed + done_episodes,
+                not args.no_symmetry, solved, writer, writer.augment)
+        else:
+            selfplay, stats = run_selfplay(
+                remain, args.seed + done_episodes, not args.no_symmetry,
+                solved, args.log_interval, writer, writer.augment, profiler)
+    if args.cprofile:
+        import pstats
+        cprofiler.disable()
+        cprofiler.dump_stats(args.cprofile)
+        pstats.Stats(cprofiler).sort_stats('cumulative').print_stats(20)
+    if profiler is not None:
+        logger.info(profiler.format_summary())
+        if args.profile and args.profile != '-':
+            profiler.save_summary(args.profile)
+        if args.trace:
+            profiler.save_trace(args.trace)
+    result = stats['result']
+    # 에피소드 통계
+    logger.info('%s\nWin: %d Lose: %d Draw: %d Winrate: %0.1f%% PlayMarkO: %d WinMarkO: %d',
+                '-' * 22, result[1], result[-1], result[0],
+                result[1] / max(remain, 1) * 100, stats['play_mark_O'],
+                stats['win_mark_O'])
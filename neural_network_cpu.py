@@ -1,11 +1,16 @@
 import math
+import numpy as np
+import torch
 import torch.nn as nn
 
 
 # 신경망 클래스: forward 자동 호출
+# board_shape=(m, n): 입력 (B, 3, m, n), 정책 출력 (B, m * n)
 class NeuralNetwork(nn.Module):
-    def __init__(self):
+    def __init__(self, board_shape=(3, 3)):
         super(NeuralNetwork, self).__init__()
+        self.board_shape = tuple(board_shape)
+        n_cells = self.board_shape[0] * self.board_shape[1]
         # convolutional layer
         self.conv = nn.Conv2d(3, 4, kernel_size=3, padding=1)
         self.conv_bn = nn.BatchNorm2d(4)
@@ -24,16 +29,16 @@ class NeuralNetwork(nn.Module):
         self.policy_head = nn.Conv2d(4, 2, kernel_size=1)
         self.policy_bn = nn.BatchNorm2d(2)
         self.policy_relu = nn.ReLU(inplace=True)
-        self.policy_fc = nn.Linear(9, 9)
+        self.policy_fc = nn.Linear(2 * n_cells, n_cells)  # 2채널 * 칸 수
         self.policy_softmax = nn.Softmax(dim=1)
 
         # 가치 헤드: 가치함수 인풋 받는 곳
         self.value_head = nn.Conv2d(4, 1, kernel_size=1)
         self.value_bn = nn.BatchNorm2d(1)
         self.value_relu1 = nn.ReLU(inplace=True)
-        self.value_fc = nn.Linear(9, 9)
+        self.value_fc = nn.Linear(n_cells, n_cells)
         self.value_relu2 = nn.ReLU(inplace=True)
-        self.value_scalar = nn.Linear(9, 1)
+        self.value_scalar = nn.Linear(n_cells, 1)
         self.value_out = nn.Tanh()
 
         # weight 초기화
@@ -63,22 +68,36 @@ class NeuralNetwork(nn.Module):
         x = self.conv2_bn(x)
         x += residual  # skip connection
         x = self.conv2_relu(x)
-        print(x)
 
         p = self.policy_head(x)
         p = self.policy_bn(p)
         p = self.policy_relu(p)
-        p = p.view(p.size(1), -1)  # 텐서 펼치기
+        p = p.view(p.size(0), -1)  # 텐서 펼치기: (B, 2, m, n) -> (B, 2mn)
         p = self.policy_fc(p)
         p = self.policy_softmax(p)
 
         v = self.value_head(x)
         v = self.value_bn(v)
         v = self.value_relu1(v)
-        v = v.view(v.size(0), -1)
+        v = v.view(v.size(0), -1)  # (B, 1, m, n) -> (B, mn)
         v = self.value_fc(v)
         v = self.value_relu2(v)
         v = self.value_scalar(v)
         v = self.value_out(v)
 
         return p, v
+
+    def predict(self, states):
+        '''추론 전용 (eval 모드, gradient 없음)
+           states: (3, m, n) 또는 (B, 3, m, n) 넘파이 배열
+           리턴: (B, m * n) 정책, (B, 1) 가치 넘파이 배열
+        '''
+        states = np.asarray(states, 'float32')
+        if states.ndim == 3:
+            states = states[np.newaxis]
+        training = self.training
+        self.eval()
+        with torch.no_grad():
+            p, v = self(torch.from_numpy(states))
+        self.train(training)
+        return p.numpy(), v.numpy()
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+''' MCTS 트리 node 저장소 ------------------------------------------------
+# 모든 node의 edge(N, W, Q, P)를 float32 (capacity, 9, 4) 배열 하나에 모아서 저장
+ node마다 따로 배열과 dict 항목을 만들지 않으므로 node 하나에 약 150바이트
+ (edge 9*4*4 = 144바이트 + packed code 8바이트)
+# node 번호(key): packed code를 완전 해석 테이블과 같은 3진수 국면 번호로 바꾸고
+ 0번 평면(내 표시)이 O인지를 1비트 붙인 값 (0 ~ 2*3^9-1)
+ 파이썬 hash를 쓰지 않으므로 프로세스가 달라도 같은 번호 -> 파일로 저장, 병렬 워커끼리 합치기 가능
+# key -> 배열의 행 번호는 크기 2*3^9 int32 배열로 바로 찾음
+# CANONICAL_TRANSFORM[key]: 그 node를 대표 state로 보내는 대칭 변환 (미리 계산, 매 수 8가지를 비교하지 않음)
+ CANONICAL_KEY[key]: 대표 state의 node 번호 (row(code, key)로 넘기면 번호를 다시 계산하지 않음)
+# 배열이 차면 크기를 2배로 늘림 (늘리면 전에 꺼낸 edge view는 새 배열을 보지 않으니 다시 꺼낼 것)
+# 3x3이 아닌 보드(n_cells != 9)는 code가 27비트를 넘으므로 code -> 행 번호를 dict로 찾음
+--------------------------------------------------------------- '''
+import numpy as np
+
+from solver import N_INDEX, BITS_TO_BASE3, code_index
+from symmetry import canonical_codes
+
+N, W, Q, P = 0, 1, 2, 3
+N_KEYS = 2 * N_INDEX
+BITS_TO_BASE3_ARRAY = np.array(BITS_TO_BASE3, 'int64')
+
+
+def node_key(code):
+    '''27비트 packed code의 node 번호'''
+    return code_index(code) * 2 + ((code & code >> 18) != 0)
+
+
+def node_keys(codes):
+    '''(M,) code 배열의 node 번호 (node_key의 배열 버전)'''
+    codes = np.asarray(codes, 'int64')
+    mark_o = codes >> 18
+    mark_x = (codes | codes >> 9) & 511 & ~mark_o
+    index = BITS_TO_BASE3_ARRAY[mark_o] + 2 * BITS_TO_BASE3_ARRAY[mark_x]
+    return index * 2 + ((codes & mark_o) != 0)
+
+
+def key_codes():
+    '''node 번호마다 그 번호가 되는 packed code (node_key의 역, 나올 수 없는 번호도 포함)'''
+    keys = np.arange(N_KEYS)
+    index, mine_o = keys // 2, keys % 2
+    digits = index[:, None] // 3 ** np.arange(9) % 3
+    bits = 1 << np.arange(9)
+    mark_o = (digits == 1).dot(bits)
+    mark_x = (digits == 2).dot(bits)
+    mine = np.where(mine_o, mark_o, mark_x)
+    return mine | ((mark_o | mark_x) & ~mine) << 9 | mark_o << 18
+
+
+# 대표 code는 어느 평면이 내 것인지와 관계없이 같은 변환으로 정해짐 -> node 번호만으로 찾을 수 있음
+_CANONICAL = canonical_codes(key_codes())
+CANONICAL_TRANSFORM = tuple(_CANONICAL[1].tolist())
+CANONICAL_KEY = tuple(node_keys(_CANONICAL[0]).tolist())
+
+
+class NodePool(object):
+    def __init__(self, capacity=1024, dtype='float32', n_cells=9):
+        self.n_cells = n_cells
+        self.compact = n_cells == 9
+        if self.compact:
+            # node 번호 -> 행 번호 (-1: 없음)
+            self.index = np.full(N_KEYS, -1, 'int32')
+            self.codes = np.zeros(capacity, 'int64')
+        else:
+            self.index = {}
+            self.codes = np.zeros(capacity, object)
+        # 행마다 node의 packed code와 edge, 추가된 순서대로 채움
+        self.data = np.zeros((capacity, n_cells, 4), dtype)
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def _find(self, code):
+        '''node의 행 번호 (없으면 -1)'''
+        if self.compact:
+            # item()으로 파이썬 int를 꺼냄 (넘파이 스칼라는 비교, 인덱싱이 느림)
+            return self.index.item(node_key(code))
+        return self.index.get(code, -1)
+
+    def __contains__(self, code):
+        return self._find(code) >= 0
+
+    def __getitem__(self, code):
+        '''node의 (n_cells, 4) edge view, 없으면 KeyError'''
+        row = self._find(code)
+        if row < 0:
+            raise KeyError(code)
+        return self.data[row]
+
+    @property
+    def capacity(self):
+        return len(self.codes)
+
+    @property
+    def nbytes(self):
+        '''배열 메모리 (3x3이 아닌 보드는 dict와 code 객체 크기는 빠짐)'''
+        if self.compact:
+            return self.index.nbytes + self.codes.nbytes + self.data.nbytes
+        return self.codes.nbytes + self.data.nbytes
+
+    def _reserve(self, size):
+        '''size개의 행이 들어갈 수 있게 배열을 2배씩 늘림'''
+        if size <= self.capacity:
+            return
+        capacity = max(self.capacity * 2, size)
+        codes = np.zeros(capacity, self.codes.dtype)
+        data = np.zeros((capacity, self.n_cells, 4), self.data.dtype)
+        codes[:self.size] = self.codes[:self.size]
+        data[:self.size] = self.data[:self.size]
+        self.codes = codes
+        self.data = data
+
+    def row(self, code, key=None):
+        '''node의 행 번호, 없으면 0으로 채운 행을 새로 만듦
+           key: 미리 구한 node 번호 (3x3 보드에서만)
+        '''
+        if self.compact:
+            if key is None:
+                key = node_key(code)
+            row = self.index.item(key)
+        else:
+            key = code
+            row = self.index.get(key, -1)
+        if row < 0:
+            self._reserve(self.size + 1)
+            row = self.size
+            self.index[key] = row
+            self.codes[row] = code
+            self.size += 1
+        return row
+
+    def edge(self, code, key=None):
+        '''node의 (n_cells, 4) edge view, 없으면 새로 만듦'''
+        row = self.row(code, key)
+        return self.data[row]
+
+    def rows(self, codes):
+        '''(M,) code 배열의 행 번호, 없는 node는 처음 나온 순서대로 새로 만듦'''
+        if not self.compact:
+            return np.array([self.row(code) for code in codes], 'int64')
+        codes = np.asarray(codes, 'int64')
+        keys = node_keys(codes)
+        new = np.flatnonzero(self.index[keys] < 0)
+        if len(new):
+            _, first = np.unique(keys[new], return_index=True)
+            new = new[np.sort(first)]
+            self._reserve(self.size + len(new))
+            added = np.arange(self.size, self.size + len(new))
+            self.index[keys[new]] = added
+            self.codes[added] = codes[new]
+            self.size += len(new)
+        return self.index[keys]
+
+    def nodes(self):
+        '''추가된 순서대로 node의 packed code 배열'''
+        return self.codes[:self.size]
+
+    def edges(self):
+        '''nodes()와 같은 순서의 (K, n_cells, 4) edge 배열 (view)'''
+        return self.data[:self.size]
+
+    def items(self):
+        for row in range(self.size):
+            yield int(self.codes[row]), self.data[row]
+
+    def merge(self, codes, edges):
+        '''다른 트리의 (code, edge)를 합침: N, W는 더하고 Q는 다시 계산
+           처음 들어온 node는 P도 그대로 가져옴
+        '''
+        edges = np.asarray(edges).reshape(-1, self.n_cells, 4)
+        size = self.size
+        rows = self.rows(codes)
+        # 새 node는 가장 먼저 나온 행의 P를 씀 (역순으로 써서 먼저 나온 값이 남게)
+        new = np.flatnonzero(rows >= size)[::-1]
+        self.data[rows[new], :, P] = edges[new, :, P]
+        np.add.at(self.data[:, :, N], rows, edges[:, :, N])
+        np.add.at(self.data[:, :, W], rows, edges[:, :, W])
+        touched = np.unique(rows)
+        edge = self.data[touched]
+        edge[:, :, Q] = 0
+        np.divide(edge[:, :, W], edge[:, :, N], out=edge[:, :, Q],
+                  where=edge[:, :, N] > 0)
+        self.data[touched] = edge
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+''' 정책 테이블 (게임 서버용) ------------------------------------------
+# 학습된 ZeroTree의 pi를 도달 가능한 모든 state에 대해 미리 펼쳐서 배열 하나로 만듦
+ 행 번호: node_pool.node_key (3진수 국면 번호 * 2 + 내 표시가 O인지) -> 2*3^9행
+ 대칭으로 모은 node의 pi는 state마다 원래 좌표로 되돌려서 저장
+ 트리에 없는 state는 빈칸에 동일 확률 (ZeroTree.get_pi 랜덤 정책의 기댓값)
+# 행마다 alias method 테이블(prob, alias)을 저장 -> 착수는 행 조회 한번 + 난수 한번
+ x = 9 * u (u: 0~1 난수), i = int(x) -> x - i < prob[i]면 i, 아니면 alias[i]
+--------------------------------------------------------------- '''
+import numpy as np
+from gym.utils import seeding
+
+from tictactoe_env import BITS_TO_PLANE, pack_state
+from symmetry import canonical_codes, INV_PERMS
+from solver import SolvedTable, TABLE_PATH, POW3
+from node_pool import N_KEYS, node_key, node_keys
+
+PLAYER = 0
+OPPONENT = 1
+MARK_O = 2
+POLICY_PATH = 'data/policy_table.npz'
+
+
+def reachable_codes(table=None):
+    '''실제 게임에서 나올 수 있는 모든 state의 packed code (내 표시가 O, X인 경우 모두)'''
+    table = table if table is not None else SolvedTable(TABLE_PATH)
+    index = np.flatnonzero(table.reachable)
+    digits = (index[:, None] // POW3) % 3
+    weights = 1 << np.arange(9)
+    mark_o = (digits == 1).dot(weights)
+    mark_x = (digits == 2).dot(weights)
+    codes = np.concatenate([mark_o | mark_x << 9 | mark_o << 18,
+                            mark_x | mark_o << 9 | mark_o << 18])
+    # 빈 보드는 두 경우가 같은 code
+    return np.unique(codes)
+
+
+def alias_table(pi):
+    '''(9,) 확률 분포의 alias method 테이블 (prob, alias) (Vose 방식)'''
+    n = len(pi)
+    scaled = [p * n for p in pi]
+    prob = [1.] * n
+    alias = list(range(n))
+    small = [i for i in range(n) if scaled[i] < 1]
+    large = [i for i in range(n) if scaled[i] >= 1]
+    while small and large:
+        less = small.pop()
+        more = large.pop()
+        prob[less] = scaled[less]
+        alias[less] = more
+        scaled[more] += scaled[less] - 1
+        if scaled[more] < 1:
+            small.append(more)
+        else:
+            large.append(more)
+    return prob, alias
+
+
+class PolicyTable(object):
+    '''state(packed code) -> 착수 분포 테이블: 행 조회 한번과 난수 한번으로 착수'''
+
+    def __init__(self, path=None):
+        self.pi = np.zeros((N_KEYS, 9), 'float32')
+        self.prob = np.ones((N_KEYS, 9), 'float')
+        self.alias = np.tile(np.arange(9, dtype='int8'), (N_KEYS, 1))
+        if path is not None:
+            self.load(path)
+
+    @classmethod
+    def from_tree(cls, tree, table=None, mask_illegal=False):
+        '''ZeroTree를 도달 가능한 모든 state의 정책 테이블로 컴파일
+           mask_illegal=True면 이미 찬 칸의 확률을 빼고 다시 정규화
+           (기본값은 ZeroTree.get_pi와 같은 분포)
+        '''
+        policy = cls()
+        codes = reachable_codes(table)
+        keys = node_keys(codes)
+        if tree.symmetry:
+            nodes, transforms = canonical_codes(codes)
+        else:
+            nodes, transforms = codes, np.zeros(len(codes), 'int64')
+        # 트리에 없는 state: 빈칸에 동일 확률 (다 찬 보드는 9칸 동일)
+        legal = BITS_TO_PLANE[(codes | codes >> 9) & 511]
+        legal = 1 - legal
+        legal[legal.sum(axis=1) == 0] = 1
+        pi = legal / legal.sum(axis=1, keepdims=True)
+        # 트리에 있는 state: 대표 좌표의 pi를 state 좌표로 되돌림
+        tree_nodes = np.fromiter(tree.pi_data.keys(), 'int64',
+                                 len(tree.pi_data))
+        tree_pi = np.array(list(tree.pi_data.values())).reshape(-1, 9)
+        order = np.argsort(tree_nodes)
+        sorted_nodes = np.append(tree_nodes[order], -1)  # 못 찾으면 -1과 비교
+        pos = np.searchsorted(sorted_nodes[:-1], nodes)
+        found = np.flatnonzero(sorted_nodes[pos] == nodes)
+        rows = tree_pi[order[pos[found]]]
+        pi[found] = rows[np.arange(len(found))[:, None],
+                         INV_PERMS[transforms[found]]]
+        if mask_illegal:
+            masked = pi * legal
+            total = masked.sum(axis=1, keepdims=True)
+            pi = np.where(total > 0, masked / np.maximum(total, 1e-300), pi)
+        policy.pi[keys] = pi
+        for key, row in zip(keys.tolist(), pi.tolist()):
+            policy.prob[key], policy.alias[key] = alias_table(row)
+        return policy
+
+    def save(self, path=POLICY_PATH):
+        np.savez(path, pi=self.pi, prob=self.prob, alias=self.alias)
+
+    def load(self, path=POLICY_PATH):
+        data = np.load(path)
+        self.pi = data['pi']
+        self.prob = data['prob']
+        self.alias = data['alias']
+
+    def sample(self, code, u):
+        '''packed code의 state에서 난수 u(0~1)로 착수할 칸 번호'''
+        key = node_key(code)
+        x = u * 9
+        cell = int(x)
+        if x - cell < self.prob[key, cell]:
+            return cell
+        return int(self.alias[key, cell])
+
+
+# 정책 테이블 에이전트 (ZeroAgent와 같은 방식으로 사용)
+class PolicyAgent(object):
+    def __init__(self, policy=None):
+        self.policy = policy if policy is not None else PolicyTable(POLICY_PATH)
+        self.first_turn = None
+        self.action_count = None
+        self.reset_episode()
+        self.seed()
+
+    def seed(self, seed=None):
+        self.np_random, seed = seeding.np_random(seed)
+        return [seed]
+
+    def reset_episode(self):
+        self.action_count = -1
+
+    def select_action(self, state, mode=''):
+        cell = self.policy.sample(pack_state(state),
+                                  self.np_random.random_sample())
+        if mode == 'self':
+            self.action_count += 1
+            user_type = (self.first_turn + self.action_count) % 2
+        else:
+            user_type = PLAYER
+        return np.array([user_type, cell // 3, cell % 3])
+
+
+if __name__ == "__main__":
+    import time
+    from agent_rl import ZeroAgent
+    from tictactoe_env import WIN_ARRAY, unpack_state
+    start = time.perf_counter()
+    agent = ZeroAgent()
+    load = time.perf_counter() - start
+    start = time.perf_counter()
+    policy = PolicyTable.from_tree(agent.model)
+    compile_time = time.perf_counter() - start
+    policy.save(POLICY_PATH)
+    print('ZeroTree load: %.3f sec, compile: %.3f sec, table: %.1f MB' %
+          (load, compile_time,
+           (policy.pi.nbytes + policy.prob.nbytes + policy.alias.nbytes) / 1e6))
+    # 착수 1회 시간 비교 (끝나지 않은 같은 state들로)
+    rng = np.random.RandomState(2018)
+    codes = reachable_codes()
+    board = (codes | codes >> 9) & 511
+    codes = codes[(board != 511) & ~WIN_ARRAY[codes & 511] &
+                  ~WIN_ARRAY[(codes >> 9) & 511]]
+    states = [unpack_state(c)
+              for c in codes[rng.randint(len(codes), size=2000)].tolist()]
+    server = PolicyAgent(policy)
+    for name, player in (('ZeroAgent', agent), ('PolicyAgent', server)):
+        start = time.perf_counter()
+        for state in states:
+            player.select_action(state)
+        print('%-12s %.1f us/move' %
+              (name, (time.perf_counter() - start) / len(states) * 1e6))
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+''' 셀프 플레이 단계별 시간 측정 ------------------------------------------
+# Profiler.instrument(obj, 'method', 'stage')로 인스턴스의 메서드를 시간 재는 함수로 바꿔 끼움
+ 측정을 켠 경우에만 바꿔 끼우므로 끄면 원래 메서드 그대로 (오버헤드 0)
+ 단계마다 누적 시간과 호출 횟수를 모음 (안쪽 단계의 시간은 바깥 단계에도 포함됨)
+# episode_done(수)을 에피소드마다 부르면 최근 window판 기준 episodes/sec, moves/sec 계산
+# trace=True면 호출마다 이벤트를 남겨서 Chrome trace 형식 JSON으로 저장 가능
+ (chrome://tracing 또는 Perfetto에서 열기, 호출 수만큼 메모리를 쓰므로 짧은 실행에만)
+--------------------------------------------------------------- '''
+import functools
+import json
+import time
+from collections import OrderedDict, deque
+
+
+class Profiler(object):
+    def __init__(self, window=1000, trace=False):
+        # 단계 이름 -> [누적 시간(sec), 호출 횟수], 등록한 순서대로
+        self.stages = OrderedDict()
+        self.trace = trace
+        self.events = []
+        # 최근 window판의 (끝난 시각, 수)
+        self.window = deque(maxlen=window)
+        self.episodes = 0
+        self.moves = 0
+        self.start = time.perf_counter()
+        self.last = self.start
+
+    def instrument(self, obj, method, stage=None):
+        '''obj.method를 시간 재는 함수로 바꿈 (인스턴스에만 적용, 클래스는 그대로)'''
+        stage = stage or '%s.%s' % (type(obj).__name__, method)
+        record = self.stages.setdefault(stage, [0., 0])
+        func = getattr(obj, method)
+        events = self.events if self.trace else None
+        origin = self.start
+
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                record[0] += elapsed
+                record[1] += 1
+                if events is not None:
+                    events.append((stage, start - origin, elapsed))
+
+        setattr(obj, method, timed)
+        return timed
+
+    def episode_done(self, moves):
+        self.last = time.perf_counter()
+        self.episodes += 1
+        self.moves += moves
+        self.window.append((self.last, moves))
+
+    def rates(self):
+        '''최근 window판 기준 (episodes/sec, moves/sec)'''
+        if len(self.window) < 2:
+            return 0., 0.
+        elapsed = self.window[-1][0] - self.window[0][0]
+        if elapsed <= 0:
+            return 0., 0.
+        # 첫 에피소드는 구간 시작점으로만 씀
+        moves = sum(m for _, m in self.window) - self.window[0][1]
+        return (len(self.window) - 1) / elapsed, moves / elapsed
+
+    def summary(self):
+        '''단계별 누적 시간, 호출 횟수, 호출당 시간(us), 전체 대비 비율과 처리량 dict'''
+        wall = self.last - self.start
+        stages = OrderedDict()
+        for stage, (total, calls) in self.stages.items():
+            stages[stage] = {'time': total, 'calls': calls,
+                             'us_per_call': total / calls * 1e6 if calls else 0.,
+                             'share': total / wall if wall > 0 else 0.}
+        episodes_rate, moves_rate = self.rates()
+        return {'wall_time': wall, 'episodes': self.episodes,
+                'moves': self.moves,
+                'episodes_per_sec': self.episodes / wall if wall > 0 else 0.,
+                'moves_per_sec': self.moves / wall if wall > 0 else 0.,
+                'window_episodes_per_sec': episodes_rate,
+                'window_moves_per_sec': moves_rate,
+                'stages': stages}
+
+    def format_summary(self):
+        summary = self.summary()
+        header = ('stage', 'calls', 'total sec', 'us/call', 'share')
+        lines = ['%-24s %10s %12s %12s %8s' % header]
+        for stage, row in summary['stages'].items():
+            lines.append('%-24s %10d %12.3f %12.2f %7.1f%%' %
+                         (stage, row['calls'], row['time'],
+                          row['us_per_call'], row['share'] * 100))
+        lines.append('wall: %.3f sec, episodes/sec: %.1f, moves/sec: %.1f '
+                     '(window: %.1f, %.1f)' %
+                     (summary['wall_time'], summary['episodes_per_sec'],
+                      summary['moves_per_sec'],
+                      summary['window_episodes_per_sec'],
+                      summary['window_moves_per_sec']))
+        return '\n'.join(lines)
+
+    def save_summary(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.summary(), f, indent=2)
+
+    def save_trace(self, path):
+        '''Chrome trace 형식 (시간 단위 us)'''
+        events = [{'name': stage, 'ph': 'X', 'ts': start * 1e6,
+                   'dur': elapsed * 1e6, 'pid': 0, 'tid': 0}
+                  for stage, start, elapsed in self.events]
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
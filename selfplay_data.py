@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+''' 셀프 플레이 데이터 저장 -------------------------------------------------
+# data/state_memory.hdf5 ("state": (n, 27))
+# data/edge_memory.hdf5 ("edge": (n, 3, 3, 4))
+# 에피소드가 끝날 때마다 버퍼에 모았다가 chunk_size 행이 차면 파일 끝에 붙여 씀
+# 데이터셋은 크기 조절 가능(chunked)하게 만들어 두어서 중간에 꺼져도 저장된 데 까지는 사용 가능
+# 'committed' 데이터셋 [에피소드 수, 행 수]에 저장 완료된 데까지를 기록 -> resume=True면 이어서 씀
+ (예전 파일은 속성 'episodes', 'rows'에 기록되어 있음)
+ 처음 형식(chunk 없이 한번에 쓴 파일)은 크기를 바꿀 수 없어서 이어 쓰려고 하면 ValueError
+ 두 파일에 각각 기록하고 (edge 파일 먼저), 읽을 때는 committed_rows()로 둘 중 작은 값까지만 읽음
+ -> 두 기록 사이에 꺼져도 state, edge 행 수가 어긋나지 않음
+# 쓰는 동안에도 다른 프로세스(ZeroTree, train.py 등)가 읽을 수 있게 SWMR(single writer, multiple reader) 모드로 씀
+ -> 읽을 때는 open_data()로 열 것 (SWMR 읽기 모드)
+ SWMR 모드에선 속성을 바꿀 수 없어서 저장 완료 기록을 데이터셋에 둠
+ SWMR 이전 형식의 파일에 이어 쓰는 경우는 SWMR 없이 씀 (쓰는 동안 다른 프로세스가 못 읽음)
+# 파일 속성 'augment'가 켜져 있으면 행마다 8가지 대칭 사본이 저장된 것
+ -> load_tree는 대표 node로 합친 N, W를 8로 나눔
+    대칭이 없는 node는 늘리지 않은 데이터와 같은 값, 자기 자신과 대칭인 node는 그 대칭들의 평균
+    (어느 방향으로 뒀는지는 남지 않으므로) symmetry=False로는 읽을 수 없음 -> ValueError
+# 읽을 때는 행 단위 파이썬 객체를 만들지 않고 블록 단위 배열로 읽어서 바로 집계
+--------------------------------------------------------------- '''
+import logging
+import os
+import h5py
+import numpy as np
+
+from tictactoe_env import pack_states
+from symmetry import canonical_codes, transform_edges, N_SYMMETRY
+
+logger = logging.getLogger(__name__)
+
+N, W, Q, P = 0, 1, 2, 3
+STATE_FILE = 'state_memory.hdf5'
+EDGE_FILE = 'edge_memory.hdf5'
+
+
+class SelfPlayWriter(object):
+    def __init__(self, data_dir='data', chunk_size=4096, compression=None,
+                 resume=False, augment=False):
+        self.data_dir = data_dir
+        self.chunk_size = chunk_size
+        mode = 'a' if resume else 'w'
+        self.state_file = h5py.File(os.path.join(data_dir, STATE_FILE), mode,
+                                    libver='latest')
+        self.edge_file = h5py.File(os.path.join(data_dir, EDGE_FILE), mode,
+                                   libver='latest')
+        self.state_set = self._dataset(self.state_file, 'state', (27,),
+                                       compression)
+        self.edge_set = self._dataset(self.edge_file, 'edge', (3, 3, 4),
+                                      compression)
+        # 처음 형식(한번에 통째로 쓴 파일)은 크기를 바꿀 수 없어서 이어 쓸 수 없음
+        for dataset in (self.state_set, self.edge_set):
+            if dataset.chunks is None or dataset.maxshape[0] is not None:
+                path = dataset.file.filename
+                self.state_file.close()
+                self.edge_file.close()
+                raise ValueError(
+                    '%s: 크기를 바꿀 수 없는(chunk 없는) 예전 형식이라 이어 쓸 수 없음, '
+                    '파일을 옮기고 resume 없이 새로 시작할 것' % path)
+        # 저장 완료된 에피소드 수와 행 수 (이어서 쓸 때 시작 위치)
+        # 쓰다가 꺼져서 기록보다 더 써진 행은 잘라냄
+        self.episodes, rows = _committed(self.state_file, 0)
+        self.state_set.resize(rows, axis=0)
+        self.edge_set.resize(rows, axis=0)
+        if 'committed' not in self.state_file:
+            self.state_file.create_dataset('committed', data=[self.episodes, rows],
+                                           dtype='int64')
+        self.state_meta = self.state_file['committed']
+        if 'committed' not in self.edge_file:
+            self.edge_file.create_dataset('committed', data=[self.episodes, rows],
+                                          dtype='int64')
+        self.edge_meta = self.edge_file['committed']
+        self.edge_meta[...] = [self.episodes, rows]
+        self.augment = bool(self.state_file.attrs.get('augment', augment))
+        self.state_file.attrs['augment'] = self.augment
+        # 여기서부터는 새 객체, 속성을 만들 수 없음
+        try:
+            self.state_file.swmr_mode = True
+            self.edge_file.swmr_mode = True
+        except (RuntimeError, ValueError) as e:
+            logger.warning('SWMR 모드로 열 수 없음, 쓰는 동안 다른 프로세스가 읽을 수 없음: %s', e)
+        # 파일에 쓰기 전 모아두는 버퍼 (에피소드 단위로 채움)
+        self.state_buffer = np.zeros((chunk_size, 27), 'float')
+        self.edge_buffer = np.zeros((chunk_size, 3, 3, 4), 'float')
+        self.buffer_n = 0
+        self.buffer_episodes = 0
+
+    def _dataset(self, hf, name, row_shape, compression):
+        if name in hf:
+            return hf[name]
+        return hf.create_dataset(name, shape=(0,) + row_shape,
+                                 maxshape=(None,) + row_shape,
+                                 chunks=(self.chunk_size,) + row_shape,
+                                 dtype='float', compression=compression)
+
+    def __len__(self):
+        return self.state_set.shape[0] + self.buffer_n
+
+    def append_episode(self, states, edges, episodes=1):
+        '''에피소드 한 판(또는 episodes판)의 (state, edge) 행들을 추가'''
+        states = np.asarray(states).reshape(-1, 27)
+        n = len(states)
+        # 에피소드가 chunk 경계에 걸치지 않도록 먼저 비움
+        if self.buffer_n + n > self.chunk_size:
+            self.flush()
+        if n > self.chunk_size:
+            self._write(states, np.asarray(edges), episodes)
+            return
+        self.state_buffer[self.buffer_n:self.buffer_n + n] = states
+        self.edge_buffer[self.buffer_n:self.buffer_n + n] = edges
+        self.buffer_n += n
+        self.buffer_episodes += episodes
+        if self.buffer_n == self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        '''버퍼의 행들을 파일 끝에 붙이고 디스크에 반영'''
+        if self.buffer_n:
+            self._write(self.state_buffer[:self.buffer_n],
+                        self.edge_buffer[:self.buffer_n],
+                        self.buffer_episodes)
+        self.buffer_n = 0
+        self.buffer_episodes = 0
+
+    def _write(self, states, edges, episodes):
+        start = self.state_set.shape[0]
+        end = start + len(states)
+        self.state_set.resize(end, axis=0)
+        self.edge_set.resize(end, axis=0)
+        self.state_set[start:end] = states
+        self.edge_set[start:end] = edges
+        self.episodes += episodes
+        # 데이터를 먼저 디스크에 쓰고 나서 기록을 갱신해야 기록이 항상 저장된 데이터와 맞음
+        self.edge_file.flush()
+        self.state_file.flush()
+        self.edge_meta[...] = [self.episodes, end]
+        self.edge_file.flush()
+        self.state_meta[...] = [self.episodes, end]
+        self.state_file.flush()
+
+    def close(self):
+        self.flush()
+        self.state_file.close()
+        self.edge_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_data(path):
+    '''읽기용으로 열기 (셀프 플레이가 쓰고 있는 파일도 열 수 있게 SWMR 읽기 모드)'''
+    return h5py.File(path, 'r', swmr=True)
+
+
+def _committed(hf, default_rows):
+    '''파일에 기록된 (저장 완료된 에피소드 수, 행 수), 기록이 없으면 (0, default_rows)'''
+    if 'committed' in hf:
+        episodes, rows = hf['committed'][...].tolist()
+        return int(episodes), int(rows)
+    return (int(hf.attrs.get('episodes', 0)),
+            int(hf.attrs.get('rows', default_rows)))
+
+
+def count_rows(path, name):
+    '''hdf5 데이터셋의 저장 완료된 행 수'''
+    with open_data(path) as hf:
+        return _committed(hf, hf[name].shape[0])[1]
+
+
+def committed_rows(data_dir='data'):
+    '''state, edge 파일 모두 저장 완료된 행 수 (두 파일의 기록 중 작은 값)'''
+    return min(count_rows(os.path.join(data_dir, STATE_FILE), 'state'),
+               count_rows(os.path.join(data_dir, EDGE_FILE), 'edge'))
+
+
+def is_augmented(data_dir='data'):
+    '''8가지 대칭으로 늘려서 저장한 데이터인지'''
+    with open_data(os.path.join(data_dir, STATE_FILE)) as hf:
+        return bool(hf.attrs.get('augment', False))
+
+
+def iter_blocks(path, name, block_size=65536, blocks=None, rows=None,
+                shard=(0, 1)):
+    '''hdf5 데이터셋을 block_size 행씩 배열로 읽음
+       압축/chunk 없이 연속 저장된 데이터셋이면 파일을 memmap으로 바로 봄
+       blocks: 읽을 블록 번호 목록 (없으면 처음부터 끝까지 순서대로)
+       rows: 읽을 행 수 (없으면 이 파일의 저장 완료 기록,
+             state와 edge를 같이 읽을 땐 committed_rows()를 줄 것)
+       shard: (i, n)이면 블록마다 i, i + n, i + 2n, ...번째 행만 읽음 (여러 워커가 블록을 나눠 읽을 때)
+    '''
+    offset, step = shard
+    with open_data(path) as hf:
+        dataset = hf[name]
+        if rows is None:
+            rows = _committed(hf, dataset.shape[0])[1]
+        address = dataset.id.get_offset()
+        if dataset.chunks is None and address is not None:
+            data = np.memmap(path, dtype=dataset.dtype, mode='r',
+                             offset=address, shape=dataset.shape)
+        else:
+            data = dataset
+        if blocks is None:
+            blocks = range((rows + block_size - 1) // block_size)
+        for block in blocks:
+            start = block * block_size
+            end = min(start + block_size, rows)
+            if start + offset >= end:
+                yield np.zeros((0,) + dataset.shape[1:], dataset.dtype)
+                continue
+            yield np.asarray(data[start + offset:end:step])
+
+
+def group_edges(states, edges, symmetry=True):
+    '''(state, edge) 행들을 node(packed code)별로 합침
+       리턴: (K,) node code, (K, 3, 3, 4) 합친 edge (symmetry면 대표 좌표 기준)
+    '''
+    codes = pack_states(states)
+    edges = np.asarray(edges)
+    if symmetry:
+        codes, transforms = canonical_codes(codes)
+        edges = transform_edges(edges, transforms)
+    nodes, inverse = np.unique(codes, return_inverse=True)
+    sums = np.zeros((len(nodes),) + edges.shape[1:], 'float')
+    np.add.at(sums, inverse.reshape(-1), edges)
+    return nodes, sums
+
+
+def load_tree(data_dir='data', symmetry=True, block_size=65536):
+    '''저장된 셀프 플레이 데이터를 블록 단위로 읽어 node별로 합친 트리를 만듦
+       메모리는 블록 크기와 node 수에만 비례 (전체 행을 한번에 올리지 않음)
+       대칭으로 늘려서 저장한 데이터면 N, W를 N_SYMMETRY로 나눔
+        (자기 자신과 대칭인 node는 대칭들의 평균이 됨, symmetry=False면 ValueError)
+    '''
+    augmented = is_augmented(data_dir)
+    if augmented and not symmetry:
+        raise ValueError('%s: 대칭으로 늘린 데이터는 symmetry=False로 읽을 수 없음 '
+                         '(실제로 둔 방향을 알 수 없음)' % data_dir)
+    rows = committed_rows(data_dir)
+    state_blocks = iter_blocks(os.path.join(data_dir, STATE_FILE), 'state',
+                               block_size, rows=rows)
+    edge_blocks = iter_blocks(os.path.join(data_dir, EDGE_FILE), 'edge',
+                              block_size, rows=rows)
+    node_list = []
+    sum_list = []
+    for states, edges in zip(state_blocks, edge_blocks):
+        nodes, sums = group_edges(states, edges, symmetry)
+        # 블록끼리 다시 합쳐서 node 수만큼만 들고 있음
+        node_list.append(nodes)
+        sum_list.append(sums)
+        nodes = np.concatenate(node_list)
+        sums = np.concatenate(sum_list)
+        nodes, inverse = np.unique(nodes, return_inverse=True)
+        merged = np.zeros((len(nodes),) + sums.shape[1:], 'float')
+        np.add.at(merged, inverse.reshape(-1), sums)
+        node_list = [nodes]
+        sum_list = [merged]
+    if not node_list:
+        return np.zeros(0, 'int64'), np.zeros((0, 3, 3, 4), 'float')
+    if augmented:
+        sum_list[0][:, :, :, [N, W]] /= N_SYMMETRY
+    return node_list[0], sum_list[0]
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+''' 틱택토 완전 해석 테이블 -----------------------------------------------
+# 도달 가능한 모든 국면(5,478개)을 negamax로 한번 풀어서 배열에 저장
+# 국면 번호(perfect hash): 칸 값(0:빈칸, 1:O, 2:X)을 3진수로 읽은 값 (0 ~ 3^9-1)
+ index = sum(칸값[i] * 3^i), i = 행 * 3 + 열
+# 저장하는 값 (모두 index로 접근)
+ value: 둘 차례인 쪽 기준 게임 이론값 (승:1, 무:0, 패:-1)
+ best_moves: 최선수 집합 (9비트 마스크)
+ win_moves: 두면 바로 이기는 수 집합 (9비트 마스크)
+ reachable: 실제 게임에서 나올 수 있는 국면인지
+--------------------------------------------------------------- '''
+import os
+import numpy as np
+from gym.utils import seeding
+
+from tictactoe_env import WIN_TABLE, unpack_state
+
+PLAYER = 0
+OPPONENT = 1
+MARK_O = 2
+N_INDEX = 3 ** 9
+POW3 = 3 ** np.arange(9)
+# 9비트 평면 -> 3진수 index 변환 테이블 (O는 1배, X는 2배 해서 더함)
+BITS_TO_BASE3 = tuple(int(np.dot((b >> np.arange(9)) & 1, POW3))
+                      for b in range(512))
+TABLE_PATH = 'data/solved_table.npz'
+
+
+def state_index(state):
+    '''(3, 3, 3) state의 국면 번호'''
+    state = np.asarray(state).reshape(3, 9)
+    mark_o = state[MARK_O]
+    mark_x = state[PLAYER] + state[OPPONENT] - mark_o
+    return int(np.dot(mark_o, POW3) + 2 * np.dot(mark_x, POW3))
+
+
+def code_index(code):
+    '''27비트 packed code의 국면 번호'''
+    mark_o = code >> 18
+    mark_x = ((code | code >> 9) & 511) & ~mark_o
+    return BITS_TO_BASE3[mark_o] + 2 * BITS_TO_BASE3[mark_x]
+
+
+def mask_to_cells(mask):
+    '''9비트 마스크를 칸 번호 배열로'''
+    return np.flatnonzero((mask >> np.arange(9)) & 1)
+
+
+class SolvedTable(object):
+    '''완전 해석 테이블: 국면 번호로 값과 최선수를 O(1)에 조회'''
+
+    def __init__(self, path=None):
+        self.value = np.zeros(N_INDEX, 'int8')
+        self.best_moves = np.zeros(N_INDEX, 'uint16')
+        self.win_moves = np.zeros(N_INDEX, 'uint16')
+        self.reachable = np.zeros(N_INDEX, bool)
+        if path is not None and os.path.exists(path):
+            self.load(path)
+        else:
+            self._solve()
+
+    def _solve(self):
+        '''빈 보드부터 memoized negamax로 모든 도달 가능한 국면 풀기'''
+        self._negamax(0, 0, 0)
+
+    def _negamax(self, bits_o, bits_x, index):
+        if self.reachable[index]:
+            return self.value[index]
+        self.reachable[index] = True
+        # 직전에 둔 쪽이 이겼으면 둘 차례인 쪽은 패배, 다 찼으면 무승부
+        if WIN_TABLE[bits_o] or WIN_TABLE[bits_x]:
+            self.value[index] = -1
+            return -1
+        if bits_o | bits_x == 511:
+            self.value[index] = 0
+            return 0
+        o_turn = bin(bits_o).count('1') == bin(bits_x).count('1')
+        best = -2
+        best_mask = win_mask = 0
+        for cell in range(9):
+            bit = 1 << cell
+            if (bits_o | bits_x) & bit:
+                continue
+            if o_turn:
+                child = -self._negamax(bits_o | bit, bits_x,
+                                       index + int(POW3[cell]))
+                if WIN_TABLE[bits_o | bit]:
+                    win_mask |= bit
+            else:
+                child = -self._negamax(bits_o, bits_x | bit,
+                                       index + 2 * int(POW3[cell]))
+                if WIN_TABLE[bits_x | bit]:
+                    win_mask |= bit
+            if child > best:
+                best, best_mask = child, bit
+            elif child == best:
+                best_mask |= bit
+        self.value[index] = best
+        self.best_moves[index] = best_mask
+        self.win_moves[index] = win_mask
+        return best
+
+    def save(self, path=TABLE_PATH):
+        np.savez(path, value=self.value, best_moves=self.best_moves,
+                 win_moves=self.win_moves, reachable=self.reachable)
+
+    def load(self, path=TABLE_PATH):
+        data = np.load(path)
+        self.value = data['value']
+        self.best_moves = data['best_moves']
+        self.win_moves = data['win_moves']
+        self.reachable = data['reachable']
+
+    def state_value(self, state):
+        '''둘 차례인 쪽 기준 게임 이론값'''
+        return int(self.value[state_index(state)])
+
+    def optimal_moves(self, state):
+        '''최선수의 칸 번호 배열 (행 * 3 + 열)'''
+        return mask_to_cells(int(self.best_moves[state_index(state)]))
+
+    def winning_moves(self, state):
+        '''두면 바로 이기는 수의 칸 번호 배열'''
+        return mask_to_cells(int(self.win_moves[state_index(state)]))
+
+    def policy_accuracy(self, tree):
+        '''ZeroTree 정책 평가: 학습된 pi가 최선수에 준 확률의 평균,
+           pi의 최댓값이 최선수인 비율을 리턴
+        '''
+        mass = []
+        hit = []
+        for node, pi in tree.pi_data.items():
+            best = self.optimal_moves(unpack_state(node))
+            pi = np.asarray(pi).flatten()
+            mass.append(pi[best].sum())
+            hit.append(pi.argmax() in best)
+        return float(np.mean(mass)), float(np.mean(hit))
+
+
+# 완전 해석 에이전트 (ZeroAgent와 같은 방식으로 사용)
+class PerfectAgent(object):
+    def __init__(self, table=None):
+        self.table = table if table is not None else SolvedTable(TABLE_PATH)
+        self.first_turn = None
+        self.action_count = None
+        self.reset_episode()
+        self.seed()
+
+    def seed(self, seed=None):
+        self.np_random, seed = seeding.np_random(seed)
+        return [seed]
+
+    def reset_episode(self):
+        self.action_count = -1
+
+    def select_action(self, state, mode=''):
+        # 최선수 중 하나를 랜덤으로
+        cells = self.table.optimal_moves(state)
+        cell = cells[self.np_random.choice(len(cells))]
+        if mode == 'self':
+            self.action_count += 1
+            user_type = (self.first_turn + self.action_count) % 2
+        else:
+            user_type = PLAYER
+        return np.r_[user_type, divmod(cell, 3)]
+
+
+if __name__ == "__main__":
+    import time
+    start = time.perf_counter()
+    table = SolvedTable()
+    print('solve: %.3f sec, reachable: %d, empty board value: %d' %
+          (time.perf_counter() - start, table.reachable.sum(), table.value[0]))
+    table.save(TABLE_PATH)
+    start = time.perf_counter()
+    SolvedTable(TABLE_PATH)
+    print('load: %.2f ms' % ((time.perf_counter() - start) * 1e3))
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+''' 보드 대칭 -----------------------------------------------------------
+# 틱택토 보드는 회전 4가지 * 좌우반전 2가지 = 8가지 대칭(D4)이 있음
+# 대칭인 state들은 모두 같은 국면이므로 대표 state(canonical) 하나로 모아서 다룸
+# 변환 t는 9칸 인덱스 순열로 표현: 변환된 평면[j] = 원래 평면[PERMS[t][j]]
+# 대표 state: 8가지 변환 중 packed code가 가장 작은 것
+# 좌표 변환
+ 원래 좌표 a -> 대표 좌표 INV_PERMS[t][a]
+ 대표 좌표 j -> 원래 좌표 PERMS[t][j]
+--------------------------------------------------------------- '''
+import numpy as np
+
+from tictactoe_env import pack_state
+
+_GRID = np.arange(9).reshape(3, 3)
+# 0~3: 90도씩 회전, 4~7: 좌우반전 후 90도씩 회전
+PERMS = np.array([np.rot90(g, k).flatten()
+                  for g in (_GRID, np.fliplr(_GRID)) for k in range(4)])
+INV_PERMS = np.argsort(PERMS, axis=1)
+N_SYMMETRY = len(PERMS)
+
+# 9비트 평면을 변환한 결과 테이블: PERM_BITS[t][bits]
+PERM_BITS = tuple(
+    tuple(sum(1 << j for j in range(9) if b >> int(perm[j]) & 1)
+          for b in range(512))
+    for perm in PERMS)
+PERM_BITS_ARRAY = np.array(PERM_BITS, 'int64')
+
+
+def transform_code(code, t):
+    '''27비트 packed code에 변환 t를 적용'''
+    table = PERM_BITS[t]
+    return table[code & 511] | table[(code >> 9) & 511] << 9 | \
+        table[code >> 18] << 18
+
+
+def canonical_code(code):
+    '''packed code의 대표 code와 그때의 변환 t를 리턴'''
+    best, best_t = code, 0
+    for t in range(1, N_SYMMETRY):
+        c = transform_code(code, t)
+        if c < best:
+            best, best_t = c, t
+    return best, best_t
+
+
+def canonical_codes(codes):
+    '''(M,) code 배열의 대표 code와 변환 t를 한번에 구함 (canonical_code의 배열 버전)'''
+    codes = np.asarray(codes, 'int64')
+    table = PERM_BITS_ARRAY
+    candidates = table[:, codes & 511] | table[:, (codes >> 9) & 511] << 9 | \
+        table[:, codes >> 18] << 18
+    transforms = candidates.argmin(axis=0)
+    return candidates[transforms, np.arange(len(codes))], transforms
+
+
+def transform_edges(edges, transforms):
+    '''(M, 3, 3, ...) 배열의 행마다 각자의 변환 t를 적용'''
+    edges = np.asarray(edges)
+    flat = edges.reshape((len(edges), 9) + edges.shape[3:])
+    rows = np.arange(len(edges))[:, None]
+    return flat[rows, PERMS[transforms]].reshape(edges.shape)
+
+
+def canonicalize(state):
+    '''(3, 3, 3) state의 대표 code와 변환 t를 리턴'''
+    return canonical_code(pack_state(state))
+
+
+def transform_action(row, col, t):
+    '''원래 좌표를 변환 t를 적용한 대표 좌표로 바꿈'''
+    return divmod(int(INV_PERMS[t][row * 3 + col]), 3)
+
+
+def transform_edge(edge, t):
+    '''(3, 3, ...) 배열(edge, pi 등)을 원래 좌표 -> 대표 좌표로 변환'''
+    shape = edge.shape
+    return edge.reshape((9,) + shape[2:])[PERMS[t]].reshape(shape)
+
+
+def inverse_transform_edge(edge, t):
+    '''(3, 3, ...) 배열을 대표 좌표 -> 원래 좌표로 되돌림'''
+    shape = edge.shape
+    return edge.reshape((9,) + shape[2:])[INV_PERMS[t]].reshape(shape)
+
+
+def augment(states, edges):
+    '''학습 데이터를 8가지 대칭으로 늘림 (D4 augmentation)
+       states: (M, 27) 펼친 state, edges: (M, 3, 3, 4)
+       리턴: (8M, 27), (8M, 3, 3, 4) 변환 t 순서로 이어 붙임
+    '''
+    states = np.asarray(states).reshape(-1, 3, 9)
+    edges = np.asarray(edges)
+    flat_edges = edges.reshape(len(edges), 9, -1)
+    aug_states = [states[:, :, perm].reshape(len(states), 27)
+                  for perm in PERMS]
+    aug_edges = [flat_edges[:, perm].reshape(edges.shape) for perm in PERMS]
+    return np.concatenate(aug_states), np.concatenate(aug_edges)
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+''' eval_cache 테스트 (python -m pytest) ----------------------------------
+# 캐시 결과가 net.predict와 같고, 같은 국면은 한번만 forward하는지
+# weight가 바뀌면 (optimizer.step, load_state_dict) 다음 조회 때 비우고 새 weight로 평가하는지
+# capacity를 넘으면 가장 오래 안 쓴 항목부터 버리는지, symmetry=True면 정책을 원래 좌표로 되돌리는지
+--------------------------------------------------------------- '''
+import numpy as np
+import pytest
+import torch
+
+from eval_cache import EvalCache
+from frozen_network import FrozenNetwork
+from neural_network_cpu import NeuralNetwork
+from policy_table import reachable_codes
+from solver import SolvedTable
+from symmetry import canonical_codes, INV_PERMS
+from tictactoe_env import unpack_states
+
+
+@pytest.fixture(scope='module')
+def codes():
+    return reachable_codes(SolvedTable())
+
+
+def _net(seed=2018):
+    torch.manual_seed(seed)
+    net = NeuralNetwork()
+    # 출력이 국면마다 확실히 다르게 weight를 키움
+    with torch.no_grad():
+        for param in net.parameters():
+            param.normal_(0, 0.5)
+    return net
+
+
+def _predict(net, codes):
+    p, v = net.predict(unpack_states(codes).reshape(-1, 3, 3, 3))
+    return p, v[:, 0]
+
+
+def test_matches_predict(codes):
+    net = _net()
+    cache = EvalCache(net)
+    batch = np.concatenate([codes[:50], codes[:50], codes[20:80]])
+    p, v = cache.evaluate(batch)
+    expected_p, expected_v = _predict(net, batch)
+    np.testing.assert_allclose(p, expected_p, atol=1e-6)
+    np.testing.assert_allclose(v, expected_v, atol=1e-6)
+    assert len(cache) == 80
+    assert cache.stats['misses'] == 80 and cache.stats['hits'] == 80
+    cache.evaluate(codes[:80])
+    assert cache.stats['misses'] == 80 and cache.stats['hits'] == 160
+
+
+def test_invalidated_after_optimizer_step(codes):
+    net = _net()
+    cache = EvalCache(net)
+    _, before_v = cache.evaluate(codes[:100])
+    optimizer = torch.optim.SGD(net.parameters(), lr=0.5)
+    states = torch.from_numpy(
+        unpack_states(codes[:100]).reshape(-1, 3, 3, 3).astype('float32'))
+    p, v = net(states)
+    optimizer.zero_grad()
+    (v.sum() - p[:, 0].sum()).backward()
+    optimizer.step()
+    p, v = cache.evaluate(codes[:100])
+    expected_p, expected_v = _predict(net, codes[:100])
+    np.testing.assert_allclose(p, expected_p, atol=1e-6)
+    np.testing.assert_allclose(v, expected_v, atol=1e-6)
+    assert not np.allclose(v, before_v)
+    assert cache.stats['invalidations'] == 1
+    assert cache.stats['misses'] == 200
+
+
+def test_invalidated_after_load_state_dict(codes):
+    net = _net()
+    cache = EvalCache(net)
+    cache.evaluate(codes[:10])
+    net.load_state_dict(_net(7).state_dict())
+    p, _ = cache.evaluate(codes[:10])
+    np.testing.assert_allclose(p, _predict(net, codes[:10])[0], atol=1e-6)
+    assert cache.stats['invalidations'] == 1
+    # weight가 그대로면 predict(eval 모드)로는 비우지 않음
+    cache.evaluate(codes[:10])
+    assert cache.stats['invalidations'] == 1
+
+
+def test_frozen_network_needs_clear(codes):
+    frozen = FrozenNetwork(_net())
+    cache = EvalCache(frozen)
+    cache.evaluate(codes[:10])
+    cache.evaluate(codes[:10])
+    assert cache.stats['invalidations'] == 0 and len(cache) == 10
+    cache.clear()
+    assert len(cache) == 0 and cache.stats['invalidations'] == 1
+
+
+def test_lru_eviction(codes):
+    cache = EvalCache(_net(), capacity=4)
+    cache.evaluate(codes[:4])
+    cache.evaluate(codes[:1])  # 0번이 가장 최근
+    cache.evaluate(codes[4:6])
+    assert [code in cache for code in codes[:6].tolist()] == \
+        [True, False, False, True, True, True]
+    assert cache.stats['evictions'] == 2
+
+
+def test_symmetry(codes):
+    net = _net()
+    cache = EvalCache(net, symmetry=True)
+    p, v = cache.evaluate(codes)
+    nodes, transforms = canonical_codes(codes)
+    node_p, node_v = _predict(net, nodes)
+    expected = node_p[np.arange(len(codes))[:, None], INV_PERMS[transforms]]
+    np.testing.assert_allclose(p, expected, atol=1e-6)
+    np.testing.assert_allclose(v, node_v, atol=1e-6)
+    assert len(cache) == len(np.unique(nodes)) < len(codes)
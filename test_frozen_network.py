@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+''' frozen_network 테스트 (python -m pytest) ------------------------------
+# BN을 접은 FrozenNetwork(NumPy), TorchScript 모듈이 eager NeuralNetwork.predict와 같은 출력을 내는지
+ (BN 통계를 랜덤으로 바꿔서 접기가 실제로 일을 하게, 3x3과 4x4 보드, batch 1과 여러 개)
+# 파일로 저장한 TorchScript를 다시 불러와도 같은지, 변환 후 원래 weight를 바꿔도 결과가 그대로인지
+--------------------------------------------------------------- '''
+import numpy as np
+import pytest
+import torch
+
+from frozen_network import FrozenNetwork, export_torchscript
+from neural_network_cpu import NeuralNetwork
+
+
+def _net(board_shape=(3, 3), seed=2018):
+    '''weight와 BN 통계(running mean/var)를 모두 랜덤으로 채운 신경망'''
+    torch.manual_seed(seed)
+    net = NeuralNetwork(board_shape)
+    with torch.no_grad():
+        for param in net.parameters():
+            param.normal_(0, 0.5)
+        for name, buf in net.named_buffers():
+            if name.endswith('running_mean'):
+                buf.normal_(0, 0.5)
+            elif name.endswith('running_var'):
+                buf.uniform_(0.5, 2)
+    return net
+
+
+def _states(board_shape, size, seed=7):
+    rng = np.random.RandomState(seed)
+    return (rng.rand(size, 3, *board_shape) < 0.3).astype('float32')
+
+
+def _script_predict(module, states):
+    with torch.no_grad():
+        p, v = module(torch.from_numpy(states))
+    return p.numpy(), v.numpy()
+
+
+@pytest.mark.parametrize('board_shape', [(3, 3), (4, 4)])
+def test_outputs_match_eager(board_shape):
+    net = _net(board_shape)
+    frozen = FrozenNetwork(net)
+    script = export_torchscript(net)
+    for size in (1, 64):
+        states = _states(board_shape, size)
+        eager_p, eager_v = net.predict(states)
+        for p, v in (frozen.predict(states), _script_predict(script, states)):
+            assert p.shape == eager_p.shape and v.shape == eager_v.shape
+            np.testing.assert_allclose(p, eager_p, atol=1e-5)
+            np.testing.assert_allclose(v, eager_v, atol=1e-5)
+    # (3, m, n) 하나만 넣어도 predict와 같음
+    state = _states(board_shape, 1)[0]
+    np.testing.assert_allclose(frozen.predict(state)[0], net.predict(state)[0],
+                               atol=1e-5)
+
+
+def test_saved_torchscript(tmp_path):
+    net = _net()
+    path = str(tmp_path / 'net.pt')
+    export_torchscript(net, path)
+    loaded = torch.jit.load(path)
+    states = _states((3, 3), 32)
+    eager_p, eager_v = net.predict(states)
+    p, v = _script_predict(loaded, states)
+    np.testing.assert_allclose(p, eager_p, atol=1e-5)
+    np.testing.assert_allclose(v, eager_v, atol=1e-5)
+
+
+def test_weights_copied_at_conversion():
+    net = _net()
+    frozen = FrozenNetwork(net)
+    script = export_torchscript(net)
+    states = _states((3, 3), 16)
+    eager_p, eager_v = net.predict(states)
+    with torch.no_grad():
+        for param in net.parameters():
+            param.zero_()
+    for p, v in (frozen.predict(states), _script_predict(script, states)):
+        np.testing.assert_allclose(p, eager_p, atol=1e-5)
+        np.testing.assert_allclose(v, eager_v, atol=1e-5)
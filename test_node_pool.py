@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+''' node_pool 테스트 (python -m pytest) -----------------------------------
+# node 번호: 도달 가능한 state마다 다르고, key_codes로 되돌리면 같은 code, 배열 버전과 같은 값
+ CANONICAL_KEY, CANONICAL_TRANSFORM이 canonical_codes와 같은지
+# 배열이 차면 2배로 늘어나고 이미 있던 edge는 그대로인지 (3x3, dict를 쓰는 큰 보드 모두)
+# rows()가 row()와 같은 순서로 행을 만들고, merge()가 N, W를 더하고 Q를 다시 계산하는지
+--------------------------------------------------------------- '''
+import numpy as np
+import pytest
+
+from node_pool import NodePool, node_key, node_keys, key_codes, \
+    CANONICAL_KEY, CANONICAL_TRANSFORM, N, W, Q, P
+from policy_table import reachable_codes
+from solver import SolvedTable
+from symmetry import canonical_codes
+
+
+@pytest.fixture(scope='module')
+def codes():
+    return reachable_codes(SolvedTable())
+
+
+def test_keys_unique_and_invertible(codes):
+    keys = node_keys(codes)
+    assert len(np.unique(keys)) == len(codes)
+    assert [node_key(code) for code in codes.tolist()] == keys.tolist()
+    np.testing.assert_array_equal(key_codes()[keys], codes)
+
+
+def test_canonical_tables(codes):
+    nodes, transforms = canonical_codes(codes)
+    keys = node_keys(codes)
+    np.testing.assert_array_equal(np.array(CANONICAL_KEY)[keys],
+                                  node_keys(nodes))
+    np.testing.assert_array_equal(np.array(CANONICAL_TRANSFORM)[keys],
+                                  transforms)
+
+
+def test_growth_keeps_edges(codes):
+    pool = NodePool(capacity=2)
+    rng = np.random.RandomState(2018)
+    values = rng.rand(len(codes), 9, 4).astype('float32')
+    capacities = set()
+    for i, code in enumerate(codes[:300].tolist()):
+        assert code not in pool
+        pool.edge(code)[:] = values[i]
+        capacities.add(pool.capacity)
+        assert pool.row(code) == i  # 이미 있으면 새로 만들지 않음
+    assert len(pool) == 300
+    assert capacities == {2, 4, 8, 16, 32, 64, 128, 256, 512}
+    np.testing.assert_array_equal(pool.nodes(), codes[:300])
+    np.testing.assert_array_equal(pool.edges(), values[:300])
+    for i, code in enumerate(codes[:300].tolist()):
+        np.testing.assert_array_equal(pool[code], values[i])
+    with pytest.raises(KeyError):
+        pool[int(codes[300])]
+
+
+def test_growth_large_board():
+    pool = NodePool(capacity=1, n_cells=16)
+    codes = [(1 << 40) + i for i in range(20)] + [3, 1 << 47]
+    for i, code in enumerate(codes):
+        pool.edge(code)[:, N] = i
+    assert len(pool) == len(codes) and pool.capacity == 32
+    for i, code in enumerate(codes):
+        assert pool.row(code) == i
+        assert (pool[code][:, N] == i).all()
+    np.testing.assert_array_equal(pool.rows(codes[::-1]),
+                                  np.arange(len(codes))[::-1])
+
+
+def test_rows_matches_row(codes):
+    rng = np.random.RandomState(7)
+    batch = codes[rng.randint(len(codes), size=500)]
+    pool = NodePool(capacity=4)
+    single = NodePool(capacity=4)
+    pool.row(int(batch[3]))
+    single.row(int(batch[3]))
+    rows = pool.rows(batch)
+    np.testing.assert_array_equal(rows, [single.row(c) for c in batch.tolist()])
+    np.testing.assert_array_equal(pool.nodes(), single.nodes())
+
+
+def test_merge(codes):
+    pool = NodePool()
+    edge = pool.edge(int(codes[0]))
+    edge[:, N], edge[:, W], edge[:, P] = 2, 1, 0.5
+    merged = np.zeros((3, 9, 4), 'float32')
+    merged[:, :, N], merged[:, :, W] = 2, -1
+    merged[:, :, P] = [[0.1], [0.2], [0.3]]
+    pool.merge([codes[0], codes[1], codes[1]], merged)
+    first, second = pool[int(codes[0])], pool[int(codes[1])]
+    np.testing.assert_allclose(first[:, [N, W, Q, P]], [[4, 0, 0, 0.5]] * 9)
+    # 새 node는 먼저 나온 P, N, W는 두 번 다 더함
+    np.testing.assert_allclose(second[:, [N, W, Q, P]], [[4, -2, -0.5, 0.2]] * 9)
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+''' policy_table 테스트 (python -m pytest) --------------------------------
+# alias 테이블로 뽑는 분포가 원래 pi와 정확히 같은지 (0인 칸은 절대 안 나옴)
+# PolicyTable의 행이 ZeroTree.get_pi와 같고, sample()의 빈도가 그 pi를 따르는지
+# 저장했다 불러와도 같은 테이블인지
+--------------------------------------------------------------- '''
+import numpy as np
+import pytest
+
+from policy_table import PolicyTable, alias_table, reachable_codes
+from selfplay_data import SelfPlayWriter
+from mcts_zero import run_selfplay
+from agent_rl import ZeroTree
+from node_pool import node_key
+from solver import SolvedTable
+from symmetry import canonical_code
+from tictactoe_env import unpack_state
+
+
+def _alias_distribution(prob, alias):
+    '''alias 테이블이 뽑는 정확한 분포: 칸 i를 1/n로 고르고 prob[i]면 i, 아니면 alias[i]'''
+    n = len(prob)
+    dist = np.zeros(n)
+    for i in range(n):
+        dist[i] += prob[i] / n
+        dist[alias[i]] += (1 - prob[i]) / n
+    return dist
+
+
+def _sample_counts(policy, code, k=2000):
+    '''난수 u를 [0, 1)에 고르게 9k개 넣어서 sample()한 칸별 비율'''
+    u = (np.arange(9 * k) + 0.5) / (9 * k)
+    cells = [policy.sample(code, x) for x in u.tolist()]
+    return np.bincount(cells, minlength=9) / len(u)
+
+
+def test_alias_table_exact():
+    rng = np.random.RandomState(2018)
+    rows = [np.full(9, 1 / 9), np.eye(9)[4], rng.dirichlet(np.ones(9) * 0.3)]
+    for _ in range(50):
+        pi = rng.dirichlet(np.ones(9))
+        pi[rng.rand(9) < 0.4] = 0
+        if pi.sum() > 0:
+            rows.append(pi / pi.sum())
+    for pi in rows:
+        prob, alias = alias_table(pi.tolist())
+        np.testing.assert_allclose(_alias_distribution(prob, alias), pi,
+                                   atol=1e-12)
+        # 확률이 0인 칸은 자기 자신으로도, 다른 칸의 alias로도 안 나옴
+        for cell in np.flatnonzero(pi == 0):
+            assert prob[cell] == 0
+            assert cell not in [alias[i] for i in range(9) if prob[i] < 1]
+
+
+@pytest.fixture(scope='module')
+def tree(tmp_path_factory):
+    data_dir = tmp_path_factory.mktemp('data')
+    with SelfPlayWriter(str(data_dir), chunk_size=256) as writer:
+        run_selfplay(300, seed=7, writer=writer)
+    return ZeroTree(str(data_dir))
+
+
+def test_policy_matches_tree(tree, tmp_path):
+    table = SolvedTable()
+    policy = PolicyTable.from_tree(tree, table)
+    hits = 0
+    for code in reachable_codes(table).tolist():
+        pi = policy.pi[node_key(code)]
+        state = unpack_state(code)
+        if canonical_code(code)[0] in tree.pi_data:
+            hits += 1
+            np.testing.assert_allclose(pi, tree.get_pi(state).flatten(),
+                                       atol=1e-6)
+        elif not (state[0] + state[1]).all():
+            # 트리에 없는 state: 빈칸에 동일 확률
+            empty = (state[0] + state[1]).flatten() == 0
+            np.testing.assert_allclose(pi, empty / empty.sum(), atol=1e-6)
+    assert hits > 100
+    # 트리에 있는 state들에서 sample() 빈도가 pi를 따름
+    for node in list(tree.pi_data)[:20]:
+        key = node_key(node)
+        counts = _sample_counts(policy, node)
+        np.testing.assert_allclose(counts, policy.pi[key], atol=1e-3)
+        assert (counts[policy.pi[key] == 0] == 0).all()
+    policy.save(str(tmp_path / 'policy.npz'))
+    loaded = PolicyTable(str(tmp_path / 'policy.npz'))
+    np.testing.assert_array_equal(loaded.prob, policy.prob)
+    np.testing.assert_array_equal(loaded.alias, policy.alias)
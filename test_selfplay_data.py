@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+''' selfplay_data 테스트 (python -m pytest) -------------------------------
+# 같은 에피소드를 대칭으로 늘려서 저장한 데이터와 늘리지 않은 데이터가 같은 트리, 같은 pi가 되는지
+# 늘린 데이터를 symmetry=False로 읽으면 ValueError
+# ZeroTree pi는 빈칸에만 확률을 줌
+--------------------------------------------------------------- '''
+import numpy as np
+import pytest
+
+from selfplay_data import SelfPlayWriter, load_tree
+from symmetry import N_SYMMETRY, transform_code, transform_edges
+from mcts_zero import run_selfplay
+from agent_rl import ZeroTree
+from tictactoe_env import BITS_TO_PLANE
+
+N, W, Q, P = 0, 1, 2, 3
+
+
+def _write_run(data_dir, augment):
+    with SelfPlayWriter(str(data_dir), chunk_size=256,
+                        augment=augment) as writer:
+        run_selfplay(300, seed=7, writer=writer, augment_data=augment)
+
+
+def _symmetrize(node, edge):
+    '''대칭인 node(자기 자신으로 가는 변환이 있는 node)는 그 변환들의 평균 edge
+       (늘린 데이터에선 그 변환들로 바뀐 사본이 같은 node에 같이 모이므로)
+    '''
+    stabilizer = [t for t in range(N_SYMMETRY) if transform_code(node, t) == node]
+    edges = np.repeat(edge[None], len(stabilizer), axis=0)
+    return transform_edges(edges, np.array(stabilizer)).mean(axis=0)
+
+
+def _legal(codes):
+    '''node code별 빈칸 마스크 (M, 9)'''
+    return BITS_TO_PLANE[(codes | codes >> 9) & 511] == 0
+
+
+def test_augmented_run_loads_same_tree(tmp_path):
+    plain_dir = tmp_path / 'plain'
+    augmented_dir = tmp_path / 'augmented'
+    plain_dir.mkdir()
+    augmented_dir.mkdir()
+    _write_run(plain_dir, False)
+    _write_run(augmented_dir, True)
+
+    plain_nodes, plain_edges = load_tree(str(plain_dir))
+    aug_nodes, aug_edges = load_tree(str(augmented_dir))
+    np.testing.assert_array_equal(plain_nodes, aug_nodes)
+    expected = np.array([_symmetrize(node, edge) for node, edge
+                         in zip(plain_nodes.tolist(), plain_edges)])
+    np.testing.assert_allclose(aug_edges[:, :, :, [N, W]],
+                               expected[:, :, :, [N, W]], atol=1e-9)
+
+    plain_tree = ZeroTree(str(plain_dir))
+    aug_tree = ZeroTree(str(augmented_dir))
+    symmetric = np.array([any(transform_code(node, t) == node
+                              for t in range(1, N_SYMMETRY))
+                          for node in plain_nodes.tolist()])
+    # 대칭이 없는 node는 pi가 그대로 같아야 함
+    np.testing.assert_allclose(aug_tree.pi_array[~symmetric],
+                               plain_tree.pi_array[~symmetric], atol=1e-9)
+    # 대칭인 node는 대칭 평균을 낸 방문 횟수의 pi와 같아야 함
+    visit = expected[symmetric][:, :, :, N].reshape(-1, 9)
+    np.testing.assert_allclose(aug_tree.pi_array[symmetric].reshape(-1, 9),
+                               plain_tree.softmax(visit, _legal(plain_nodes)[symmetric]),
+                               atol=1e-9)
+
+
+def test_pi_only_on_empty_cells(tmp_path):
+    _write_run(tmp_path, False)
+    for temperature in (None, 1., 0):
+        tree = ZeroTree(str(tmp_path), temperature=temperature)
+        pi = tree.pi_array.reshape(-1, 9)
+        legal = _legal(tree.node_data)
+        assert not pi[~legal].any()
+        np.testing.assert_allclose(pi.sum(axis=1), 1)
+
+
+def test_augmented_run_needs_symmetry(tmp_path):
+    _write_run(tmp_path, True)
+    with pytest.raises(ValueError):
+        load_tree(str(tmp_path), symmetry=False)
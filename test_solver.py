@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+''' solver 테스트 (python -m pytest) --------------------------------------
+# SolvedTable이 도달 가능한 국면 5,478개를 모두 풀었는지
+# 값, 최선수, 바로 이기는 수가 보드를 직접 훑는 minimax와 같은지
+# 국면 번호가 state, packed code 어느 쪽으로 구해도 같은지
+# PerfectAgent는 랜덤 상대에게 지지 않음
+--------------------------------------------------------------- '''
+import numpy as np
+import pytest
+
+from solver import SolvedTable, PerfectAgent, state_index, code_index, POW3
+from tictactoe_env import TicTacToeEnv, line_windows, unpack_state, \
+    PLAYER, OPPONENT
+
+LINES = line_windows(3, 3, 3)
+
+
+@pytest.fixture(scope='module')
+def table():
+    return SolvedTable()
+
+
+def _winner(board):
+    for a, b, c in LINES:
+        if board[a] and board[a] == board[b] == board[c]:
+            return board[a]
+    return 0
+
+
+def _minimax(board, memo):
+    '''board: 칸 값 tuple (0:빈칸, 1:O, 2:X) -> (둘 차례 기준 값, 최선수 집합, 바로 이기는 수 집합)'''
+    if board in memo:
+        return memo[board]
+    if _winner(board):
+        result = (-1, set(), set())
+    elif all(board):
+        result = (0, set(), set())
+    else:
+        mark = 1 if board.count(1) == board.count(2) else 2
+        values = {}
+        wins = set()
+        for cell in range(9):
+            if board[cell]:
+                continue
+            child = board[:cell] + (mark,) + board[cell + 1:]
+            values[cell] = -_minimax(child, memo)[0]
+            if _winner(child):
+                wins.add(cell)
+        best = max(values.values())
+        result = (best, {c for c, v in values.items() if v == best}, wins)
+    memo[board] = result
+    return result
+
+
+def _to_code(board, my_mark):
+    '''칸 값 tuple -> my_mark(1:O, 2:X) 쪽이 0번평면인 packed code'''
+    bits = [sum(1 << i for i in range(9) if board[i] == mark)
+            for mark in (1, 2)]
+    mine, other = (bits[0], bits[1]) if my_mark == 1 else (bits[1], bits[0])
+    return mine | other << 9 | bits[0] << 18
+
+
+def _cells(mask):
+    return {i for i in range(9) if mask >> i & 1}
+
+
+def test_reachable_positions(table):
+    memo = {}
+    _minimax((0,) * 9, memo)
+    assert len(memo) == 5478
+    assert table.reachable.sum() == 5478
+    index = [int(np.dot(board, POW3)) for board in memo]
+    assert table.reachable[index].all()
+
+
+def test_values_and_moves(table):
+    memo = {}
+    _minimax((0,) * 9, memo)
+    for board, (value, best, wins) in memo.items():
+        index = int(np.dot(board, POW3))
+        assert table.value[index] == value
+        assert _cells(int(table.best_moves[index])) == best
+        assert _cells(int(table.win_moves[index])) == wins
+    # 빈 보드는 무승부, 어디 둬도 무승부
+    assert table.value[0] == 0
+    assert _cells(int(table.best_moves[0])) == set(range(9))
+
+
+def test_lookup_by_state(table):
+    # O: 0, 4 / X: 1, 2 -> O 차례, 8에 두면 이김
+    board = (1, 2, 2, 0, 1, 0, 0, 0, 0)
+    for my_mark in (1, 2):
+        code = _to_code(board, my_mark)
+        state = unpack_state(code)
+        assert state_index(state) == code_index(code) == int(np.dot(board, POW3))
+        assert table.state_value(state) == 1
+        assert list(table.winning_moves(state)) == [8]
+        assert 8 in table.optimal_moves(state)
+
+
+def test_perfect_agent_never_loses(table):
+    env = TicTacToeEnv()
+    env.seed(2018)
+    agent = PerfectAgent(table)
+    agent.seed(2018)
+    rng = np.random.RandomState(2018)
+    for _ in range(100):
+        state = env.reset()
+        done = False
+        turn = rng.randint(2)
+        while not done:
+            if turn == PLAYER:
+                action = agent.select_action(state)
+            else:
+                empty = np.flatnonzero((state[PLAYER] + state[OPPONENT]).flatten() == 0)
+                cell = int(rng.choice(empty))
+                action = [OPPONENT, cell // 3, cell % 3]
+            state, reward, done, _ = env.step(action)
+            turn = 1 - turn
+        assert reward >= 0
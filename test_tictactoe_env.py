@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+''' tictactoe_env 테스트 (python -m pytest) -------------------------------
+# BatchTicTacToeEnv가 보드마다 TicTacToeEnv._step과 같은 state, 보상, 종료를 주는지
+ (반칙수 포함, 끝난 보드는 자동 리셋)
+# 줄 카운터 승리 판정이 예전 방식(보드 전체를 승리 패턴과 비교)과 같은 결과를 주는지
+ (m*n 보드, 재사용 모드, BitboardTicTacToeEnv 포함)
+--------------------------------------------------------------- '''
+import numpy as np
+
+from tictactoe_env import TicTacToeEnv, BitboardTicTacToeEnv, \
+    BatchTicTacToeEnv, pack_state, PLAYER, OPPONENT, MARK_O
+
+
+def _random_action(rng, who, legal_only=False, state=None):
+    '''who가 둘 칸을 랜덤으로 (legal_only가 아니면 이미 찬 칸도 나옴)'''
+    if legal_only:
+        cells = np.flatnonzero((state[PLAYER] + state[OPPONENT]).flatten() == 0)
+        cell = int(rng.choice(cells))
+    else:
+        cell = int(rng.randint(9))
+    return [who, cell // 3, cell % 3]
+
+
+def test_batch_env_matches_step():
+    n_envs = 64
+    rng = np.random.RandomState(2018)
+    batch = BatchTicTacToeEnv(n_envs, observe=False)
+    states = batch.reset()
+    envs = [TicTacToeEnv() for _ in range(n_envs)]
+    singles = [env.reset() for env in envs]
+    turns = rng.randint(2, size=n_envs)
+    finished = 0
+    for _ in range(400):
+        actions = np.array([_random_action(rng, (turns[i] + envs[i].step_count) % 2,
+                                           rng.rand() < 0.8, singles[i])
+                            for i in range(n_envs)])
+        states, rewards, dones, info = batch.step(actions)
+        for i, env in enumerate(envs):
+            state, reward, done, single_info = env.step(actions[i])
+            assert rewards[i] == reward
+            assert dones[i] == done
+            assert info['steps'][i] == single_info['steps']
+            if done:
+                finished += 1
+                state = env.reset()
+                turns[i] = rng.randint(2)
+            assert states[i] == pack_state(state)
+            singles[i] = state
+    assert finished > n_envs
+
+
+def test_batch_env_observe():
+    batch = BatchTicTacToeEnv(2)
+    batch.reset()
+    states, rewards, dones, _ = batch.step([[PLAYER, 0, 0], [OPPONENT, 1, 1]])
+    env = TicTacToeEnv()
+    env.reset()
+    assert states.shape == (2, 3, 3, 3)
+    np.testing.assert_array_equal(states[0], env.step([PLAYER, 0, 0])[0])
+    assert not dones.any()
+    np.testing.assert_array_equal(batch.legal_mask()[1],
+                                  np.arange(9) != 4)
+
+
+def _has_line(plane, k):
+    '''plane에 가로, 세로, 대각선으로 k개 연속이 있는지 (보드 전체를 훑음)'''
+    m, n = plane.shape
+    for row in range(m):
+        for col in range(n):
+            for d_row, d_col in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                cells = [(row + i * d_row, col + i * d_col) for i in range(k)]
+                if all(0 <= r < m and 0 <= c < n and plane[r, c]
+                       for r, c in cells):
+                    return True
+    return False
+
+
+def _pattern_result(env, before, action):
+    '''예전 _step 방식의 (보상, 종료): 반칙 체크 후 보드 전체에서 0번평면, 1번평면 순서로 승리 확인'''
+    who, row, col = action
+    if before[PLAYER, row, col] or before[OPPONENT, row, col]:
+        return (-1 if who == PLAYER else 1), True
+    state = env.state
+    if _has_line(state[PLAYER], env.k):
+        return 1, True
+    if _has_line(state[OPPONENT], env.k):
+        return -1, True
+    # 3x3이면 O표시 5개 = 보드가 다 참
+    if np.count_nonzero(state[PLAYER] + state[OPPONENT]) == env.m * env.n:
+        assert np.count_nonzero(state[MARK_O]) == (env.m * env.n + 1) // 2
+        return 0, True
+    return 0, False
+
+
+def _play_random(env, rng, n_games):
+    for _ in range(n_games):
+        env.reset()
+        first = rng.randint(2)
+        done = False
+        while not done:
+            who = (first + env.step_count) % 2
+            if rng.rand() < 0.9:
+                empty = (env.state[PLAYER] + env.state[OPPONENT]) == 0
+                cell = int(rng.choice(np.flatnonzero(empty)))
+            else:
+                cell = int(rng.randint(env.m * env.n))
+            action = [who, cell // env.n, cell % env.n]
+            before = np.array(env.state[:2])
+            _, reward, done, _ = env.step(action)
+            yield action, before, reward, done
+
+
+def test_line_counter_matches_pattern_check():
+    rng = np.random.RandomState(2018)
+    for env in (TicTacToeEnv(), TicTacToeEnv(dtype='uint8'),
+                TicTacToeEnv(4, 5, 3), TicTacToeEnv(5, 5, 4)):
+        wins = 0
+        for action, before, reward, done in _play_random(env, rng, 300):
+            assert (reward, done) == _pattern_result(env, before, action)
+            wins += reward != 0
+        assert wins > 0
+
+
+def test_bitboard_env_matches_env():
+    rng = np.random.RandomState(7)
+    env = TicTacToeEnv()
+    bitboards = (BitboardTicTacToeEnv(), BitboardTicTacToeEnv(observe=False))
+    for action, _, reward, done in _play_random(env, rng, 500):
+        if env.step_count == 1:
+            for bitboard in bitboards:
+                bitboard.reset()
+        for bitboard in bitboards:
+            _, bit_reward, bit_done, info = bitboard.step(action)
+            assert (bit_reward, bit_done) == (reward, done)
+            assert info['steps'] == env.step_count
+            assert pack_state(bitboard.observation()) == pack_state(env.state)
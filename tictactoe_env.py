@@ -9,6 +9,9 @@ logger = logging.getLogger(__name__)   # 실행 로그 남기기, 생략해도 
 ''' 소개 -----------------------------------------------------------
 # 규칙: O, X 를 번갈아 가면서 표시하고 3개 연속으로 한줄을 채우면 승리, 무승부 있음
 # state: (3, 3, 3) 넘파이 배열: 3*3 평면 3장
+# TicTacToeEnv(m, n, k)로 m*n 보드에서 k개 연속이면 승리하는 게임으로 확장 가능 (state: (3, m, n))
+ ex) TicTacToeEnv(9, 9, 5), 오목: TicTacToeEnv(15, 15, 5)
+ 비트보드, 배치 환경과 대칭/완전 해석 테이블은 3x3만 지원
  0번 평면: 나의 표시만 1로 체크
  1번 평면: 상대 표시만 1로 체크 (현재 셀프 플레이만 지원)
  2번 평면: O표시만 1로 체크 (누가 OX인지 구별 용)
@@ -31,8 +34,99 @@ logger = logging.getLogger(__name__)   # 실행 로그 남기기, 생략해도 
  ]
 --------------------------------------------------------------- '''
 
+# verbosity 단계별 로그 레벨: 0.조용히 1.요약만 2.매 수 출력
+VERBOSITY_LEVEL = {0: logging.WARNING, 1: logging.INFO, 2: logging.DEBUG}
+
+
+def set_verbosity(verbosity):
+    '''env, MCTS, agent 모듈의 출력을 한번에 설정 (모두 logging으로 출력)
+       로그 레벨이 꺼져 있으면 메세지 포매팅 비용도 들지 않음
+    '''
+    level = VERBOSITY_LEVEL[max(0, min(verbosity, 2))]
+    logging.basicConfig(format='%(message)s')
+    logging.getLogger().setLevel(level)
+    return level
+
+
 PLAYER = 0  # 플레이어 식별 변수
 OPPONENT = 1  # 상대 식별 변수
+MARK_O = 2  # O표시 평면 식별 변수
+
+# 승리패턴 8가지 구성 (1:돌이 있는 곳, 0: 돌이 없는 곳), 매 step마다 만들지 않도록 한번만 생성
+WIN_PATTERN = np.array([[[1, 1, 1], [0, 0, 0], [0, 0, 0]],
+                        [[0, 0, 0], [1, 1, 1], [0, 0, 0]],
+                        [[0, 0, 0], [0, 0, 0], [1, 1, 1]],
+                        [[1, 0, 0], [1, 0, 0], [1, 0, 0]],
+                        [[0, 0, 1], [0, 0, 1], [0, 0, 1]],
+                        [[0, 1, 0], [0, 1, 0], [0, 1, 0]],
+                        [[0, 0, 1], [0, 1, 0], [1, 0, 0]],
+                        [[1, 0, 0], [0, 1, 0], [0, 0, 1]]], 'float')
+
+''' 비트보드 -----------------------------------------------------------
+# 평면 하나(3*3)를 9비트 정수로 표현: [행][열] 칸 -> 비트 (행 * 3 + 열)
+# 3개의 평면을 합친 27비트 정수(packed code)로 state 전체를 표현
+ code = 0번평면 | 1번평면 << 9 | 2번평면 << 18
+--------------------------------------------------------------- '''
+# 승리패턴 8가지의 비트 마스크
+WIN_MASKS = tuple(int(np.dot(p.flatten(), 1 << np.arange(9)))
+                  for p in WIN_PATTERN.astype(int))
+# 512가지 비트보드의 승리 여부 룩업 테이블
+WIN_TABLE = tuple(any((b & m) == m for m in WIN_MASKS) for b in range(512))
+# 512가지 비트보드를 3*3 평면으로 펼친 테이블 (관찰값 만들 때 사용)
+BITS_TO_PLANE = ((np.arange(512)[:, None] >> np.arange(9)) & 1).astype('float')
+BIT_WEIGHTS = 1 << np.arange(27)
+BIT_WEIGHTS_FLOAT = BIT_WEIGHTS.astype('float')  # 0/1 state와 바로 내적하는 용
+# 배치 연산용 넘파이 테이블: 승리 여부, 비트 개수
+WIN_ARRAY = np.array(WIN_TABLE)
+POPCOUNT = np.array([bin(b).count('1') for b in range(512)])
+# 승리 판정할 줄의 방향 (행, 열): 가로, 세로, 대각선, 반대 대각선
+LINE_DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
+
+
+def line_windows(m, n, k):
+    '''m*n 보드에서 k칸 연속인 모든 줄의 칸 번호(행 * n + 열) 목록
+       3x3, k=3이면 가로 3, 세로 3, 대각선 2 -> 8줄
+    '''
+    lines = []
+    for d_row, d_col in LINE_DIRECTIONS:
+        for row in range(m):
+            for col in range(n):
+                end_row = row + (k - 1) * d_row
+                end_col = col + (k - 1) * d_col
+                if 0 <= end_row < m and 0 <= end_col < n:
+                    lines.append(tuple((row + i * d_row) * n + col + i * d_col
+                                       for i in range(k)))
+    return lines
+
+
+def pack_state(state):
+    '''(3, 3, 3) state를 27비트 정수 code로 변환 (state의 값은 0 또는 1)
+       (3, m, n) state는 같은 순서로 3*m*n비트 파이썬 정수로 변환
+    '''
+    state = np.asarray(state)
+    if state.size == 27:
+        return int(state.reshape(27).dot(BIT_WEIGHTS_FLOAT))
+    bits = np.packbits(state.reshape(-1) != 0, bitorder='little')
+    return int.from_bytes(bits.tobytes(), 'little')
+
+
+def pack_states(states):
+    '''(M, 27) 또는 (M, 3, 3, 3) state 배열을 (M,) code 배열로 한번에 변환'''
+    states = np.asarray(states).reshape(-1, 27)
+    return (states != 0).astype('int64').dot(BIT_WEIGHTS)
+
+
+def unpack_states(codes):
+    '''(M,) 27비트 code 배열을 (M, 27) state 배열로 한번에 되돌림 (pack_states의 반대)'''
+    codes = np.asarray(codes, 'int64')
+    planes = np.stack([codes & 511, (codes >> 9) & 511, codes >> 18], axis=1)
+    return BITS_TO_PLANE[planes].reshape(len(codes), 27)
+
+
+def unpack_state(code):
+    '''27비트 정수 code를 (3, 3, 3) state로 되돌림'''
+    return BITS_TO_PLANE[[code & 511, (code >> 9) & 511,
+                          code >> 18]].reshape(3, 3, 3)
 
 
 class TicTacToeEnv(gym.Env):
@@ -43,22 +137,46 @@ class TicTacToeEnv(gym.Env):
     metadata = {'render.modes': ['human', 'rgb_array']}
     reward_range = (-1, 0, 1)  # 보상의 범위 참고: 패배:-1, 무승부:0, 승리:1
 
-    def __init__(self):
+    def __init__(self, m=3, n=3, k=3, buffer=None, dtype=None):
         self.mark_O = None  # O가 누군지 매칭, _reset()에서 설정
         self.mark_X = None  # X가 누군지 매칭
-        self.board_size = 3  # 3x3 보드 사이즈
+        self.m = m  # 보드 행 수
+        self.n = n  # 보드 열 수
+        self.k = k  # 한줄에 k개 연속이면 승리
         self.board_n = 3  # 보드 개수 3개: 0.플레이어보드, 1.상대보드, 2.O구별 보드
-        # 관찰 공간: 3*3개짜리 3장, 허용 범위 [0,1] 있으면 1, 없으면 0
+        # 관찰 공간: m*n개짜리 3장, 허용 범위 [0,1] 있으면 1, 없으면 0
         self.observation_space = spaces.Box(low=0,
                                             high=1,
-                                            shape=(self.board_size,
-                                                   self.board_size,
+                                            shape=(self.m,
+                                                   self.n,
                                                    self.board_n))
         # 액션 공간: (player ,opponent 구분 | 행, 열)
-        self.action_space = spaces.MultiDiscrete([[0, 1], [0, 2], [0, 2]])
+        self.action_space = spaces.MultiDiscrete(
+            [[0, 1], [0, self.m - 1], [0, self.n - 1]])
+        # 승리 판정용 줄(k칸 연속) 목록과 칸마다 속한 줄 번호
+        self.lines = line_windows(self.m, self.n, self.k)
+        self.cell_lines = [[] for _ in range(self.m * self.n)]
+        for line, cells in enumerate(self.lines):
+            for cell in cells:
+                self.cell_lines[cell].append(line)
+        self.line_count = None  # 플레이어별 줄마다 채운 칸 수, _reset()에서 설정
+        self.zero_lines = [0] * len(self.lines)
+        # state를 써넣을 배열: buffer를 주거나 dtype(예: 'uint8')을 정하면 배열 하나를 계속 재사용
+        # 이 모드에선 reset(), step()이 매번 같은 배열을 리턴하므로 보관하려면 복사하거나 pack_state로
+        # info dict와 줄 카운터도 새로 만들지 않고 재사용 (info도 다음 step에서 바뀜)
+        if buffer is None and dtype is not None:
+            buffer = np.zeros((self.board_n, self.m, self.n), dtype)
+        if buffer is not None and buffer.shape != (self.board_n, self.m, self.n):
+            raise ValueError('buffer shape %s != %s' % (
+                buffer.shape, (self.board_n, self.m, self.n)))
+        self.buffer = buffer
+        self.info = {'steps': 0}  # 재사용 모드에서 step()이 리턴할 info
         self.step_count = None  # 액션 진행 횟수 초기화
         self.viewer = None  # 뷰어 초기화
         self.state = None  # 상태 초기화
+        # 종료 결과별 누적 횟수 (매 판 출력 대신 집계)
+        self.outcome_count = {'win': 0, 'lose': 0, 'draw': 0,
+                              'illegal_win': 0, 'illegal_lose': 0}
         self._seed()  # 랜덤 시드 설정하는 함수 호출
 
     # 랜덤 시드 생성 및 설정 함수
@@ -69,15 +187,30 @@ class TicTacToeEnv(gym.Env):
         return [seed]
 
     def _reset(self):  # 상태 리셋 함수
-        # 상태 초기화 (3*3 개짜리배열 3장) 2진으로만 해결하기 위해!
-        self.state = np.zeros(
-            (self.board_size, self.board_size, self.board_n), 'float')
+        # 상태 초기화 (m*n 개짜리배열 3장) 2진으로만 해결하기 위해!
+        if self.buffer is not None:  # 재사용 모드: 새로 만들지 않고 0으로 채움
+            self.buffer.fill(0)
+            self.state = self.buffer
+        else:
+            self.state = np.zeros((self.board_n, self.m, self.n), 'float')
         self.step_count = 0  # 액션 진행 횟수 0
+        if self.buffer is not None and self.line_count is not None:
+            for count in self.line_count:  # 재사용 모드: 있던 카운터를 0으로
+                count[:] = self.zero_lines
+        else:
+            self.line_count = [[0] * len(self.lines) for _ in range(2)]  # 줄 카운터 0
         self.viewer = None   # 뷰어 리셋
         self.mark_O = None  # O 주체 리셋
         self.mark_X = None  # X 주체 리셋
         return self.state  # 상태 리턴
 
+    def _info(self):
+        '''step()이 리턴할 info (재사용 모드면 같은 dict를 고쳐서 씀)'''
+        if self.buffer is None:
+            return {'steps': self.step_count}
+        self.info['steps'] = self.step_count
+        return self.info
+
     def _step(self, action):
         """한번의 행동에 상태가 어떻게 변하는지 정하는 함수
             승부가 나면 reset()을 호출(메소드 내부 또는 에이전트)하여 환경을 초기화 해야 함
@@ -87,18 +220,20 @@ class TicTacToeEnv(gym.Env):
         self.step_count += 1
         # 규칙 위반 필터링: 액션 자리에 이미 자리가 차있음
         for i in range(2):
-            if self.state[i][action[1]][action[2]] == 1:
+            if self.state.item(i, action[1], action[2]) == 1:
                 if action[0] == PLAYER:  # 근데 그게 플레이어가 한 짓이면 반칙패
                     reward = -1
                     done = True  # 게임 종료
-                    info = {'steps': self.step_count}  # 액션 1회로 인정
-                    print('Illegal Lose!')  # 출력
+                    info = self._info()  # 액션 1회로 인정
+                    self.outcome_count['illegal_lose'] += 1
+                    logger.debug('Illegal Lose! %s', info)  # 출력
                     return self.state, reward, done, info  # 필수 요소 리턴
                 elif action[0] == OPPONENT:  # 상대가 한짓이면 반대
                     reward = 1
                     done = True
-                    info = {'steps': self.step_count}
-                    print('Illegal Win!')
+                    info = self._info()
+                    self.outcome_count['illegal_win'] += 1
+                    logger.debug('Illegal Win! %s', info)
                     return self.state, reward, done, info
         # 반칙이 아니면 진행
         # step_count 1, 3, 5 같은 홀수번째 액션은 O표시니까
@@ -106,50 +241,50 @@ class TicTacToeEnv(gym.Env):
             # 첫 action엔 action주체를 불러와서 O표시가 누군지 매칭해주고
             if self.step_count == 1:
                 self.mark_O = action[0]
-            self.state[2][action[1]][action[2]] = 1  # O표시용 2번보드에 동기화
+            self.state[2, action[1], action[2]] = 1  # O표시용 2번보드에 동기화
             # 주체를 식별해서 해당 보드에도 적용
-            self.state[action[0]][action[1]][action[2]] = 1
+            self.state[action[0], action[1], action[2]] = 1
         else:  # 짝수번 째 액션은  X니까 해당 보드에만 적용
-            self.state[action[0]][action[1]][action[2]] = 1
-        return self.__check_win()  # 승패 체크해서 리턴
-
-    def __check_win(self):  # state 승패체크용 내부 함수
-        # 승리패턴 8가지 구성 (1:돌이 있는 곳, 0: 돌이 없는 곳)
-        win_pattern = np.array([[[1, 1, 1], [0, 0, 0], [0, 0, 0]],
-                                [[0, 0, 0], [1, 1, 1], [0, 0, 0]],
-                                [[0, 0, 0], [0, 0, 0], [1, 1, 1]],
-                                [[1, 0, 0], [1, 0, 0], [1, 0, 0]],
-                                [[0, 0, 1], [0, 0, 1], [0, 0, 1]],
-                                [[0, 1, 0], [0, 1, 0], [0, 1, 0]],
-                                [[0, 0, 1], [0, 1, 0], [1, 0, 0]],
-                                [[1, 0, 0], [0, 1, 0], [0, 0, 1]]], 'float')
-        for i in range(2):
-            for k in range(8):  # 0,1번 보드가 승리패턴과 일치하면
-                # 바이너리 배열은 패턴을 포함할때 서로 곱(행렬곱아님)하면 패턴 자신이 나옴; 고민하다 발견
-                if np.array_equal(self.state[i] * win_pattern[k], win_pattern[k]):
-                    if i == PLAYER:  # 주체인 i가 플레이어면 승리
-                        reward = 1  # 보상 1
-                        done = True  # 게임 끝
-                        info = {'steps': self.step_count}  # step 수 기록
-                        print('You Win!', info)  # 승리 메세지 출력
-                        return self.state, reward, done, info  # 필수 값 리턴!
-                    else:  # 주체가 상대면 패배
-                        reward = -1  # 보상 -1
-                        done = True  # 게임 끝
-                        info = {'steps': self.step_count}  # step 수 기록
-                        print('You Lose!', info)  # 너 짐
-                        return self.state, reward, done, info  # 필수 값 리턴!
-        # 다 돌려봤는데 승부난게 없더라 근데 O식별용 2번보드에 들어있는게 5개면? 비김
-        if np.count_nonzero(self.state[2]) == 5:
+            self.state[action[0], action[1], action[2]] = 1
+        return self.__check_win(action)  # 승패 체크해서 리턴
+
+    def __check_win(self, action):  # state 승패체크용 내부 함수
+        # 방금 둔 칸이 속한 줄의 카운터만 1씩 올림 (3x3이면 칸마다 2~4줄)
+        # 이번 수 전에는 승부가 안 났으므로 새로 이길 수 있는 건 방금 둔 쪽뿐
+        i, row, col = action
+        count = self.line_count[i]
+        win = False
+        for line in self.cell_lines[row * self.n + col]:
+            count[line] += 1
+            if count[line] == self.k:  # 줄이 다 채워지면 승리
+                win = True
+        if win:
+            if i == PLAYER:  # 주체인 i가 플레이어면 승리
+                reward = 1  # 보상 1
+                done = True  # 게임 끝
+                info = self._info()  # step 수 기록
+                self.outcome_count['win'] += 1
+                logger.debug('You Win! %s', info)  # 승리 메세지 출력
+                return self.state, reward, done, info  # 필수 값 리턴!
+            else:  # 주체가 상대면 패배
+                reward = -1  # 보상 -1
+                done = True  # 게임 끝
+                info = self._info()  # step 수 기록
+                self.outcome_count['lose'] += 1
+                logger.debug('You Lose! %s', info)  # 너 짐
+                return self.state, reward, done, info  # 필수 값 리턴!
+        # 승부난게 없는데 보드가 다 찼으면(반칙이면 이미 끝났으니 착수 횟수 = 칸 수)? 비김
+        if self.step_count == self.m * self.n:
             reward = 0  # 보상 0
             done = True  # 게임 끝
-            info = {'steps': self.step_count}
-            print('Draw!', info)  # 비김
+            info = self._info()
+            self.outcome_count['draw'] += 1
+            logger.debug('Draw! %s', info)  # 비김
             return self.state, reward, done, info
         else:  # 이거 다~~~ 아니면 다음 수 둬야지
             reward = 0
             done = False  # 안 끝남!
-            info = {'steps': self.step_count}
+            info = self._info()
             return self.state, reward, done, info
 
     def _render(self, mode='human', close=False):  # 현재 상태를 그려주는 함수
@@ -161,156 +296,220 @@ class TicTacToeEnv(gym.Env):
 
         if self.viewer is None:
             from gym.envs.classic_control import rendering  # 렌더링 모듈 임포트
-            # 뷰어의 좌표 딕트로 구성
-            render_loc = {0: (50, 250), 1: (150, 250), 2: (250, 250),
-                          3: (50, 150), 4: (150, 150), 5: (250, 150),
-                          6: (50, 50), 7: (150, 50), 8: (250, 50)}
+            # 칸 하나의 크기: 3x3은 100, 큰 보드는 창이 600을 넘지 않게 줄임
+            cell = min(100, 600 // max(self.m, self.n))
 
             # -------------------- 뷰어 생성 --------------------- #
-            # 캔버스 역할의 뷰어 초기화 가로 세로 300
-            self.viewer = rendering.Viewer(300, 300)
+            # 캔버스 역할의 뷰어 초기화 가로 n칸 세로 m칸
+            self.viewer = rendering.Viewer(self.n * cell, self.m * cell)
             # 가로 세로 선 생성 (시작점좌표, 끝점좌표), 색정하기 (r, g, b)
-            line_1 = rendering.Line((0, 100), (300, 100))
-            line_1.set_color(0, 0, 0)
-            line_2 = rendering.Line((0, 200), (300, 200))
-            line_2.set_color(0, 0, 0)
-            line_a = rendering.Line((100, 0), (100, 300))
-            line_a.set_color(0, 0, 0)
-            line_b = rendering.Line((200, 0), (200, 300))
-            line_b.set_color(0, 0, 0)
-            # 뷰어에 선 붙이기
-            self.viewer.add_geom(line_1)
-            self.viewer.add_geom(line_2)
-            self.viewer.add_geom(line_a)
-            self.viewer.add_geom(line_b)
+            for i in range(1, self.m):
+                line = rendering.Line((0, i * cell), (self.n * cell, i * cell))
+                line.set_color(0, 0, 0)
+                self.viewer.add_geom(line)  # 뷰어에 선 붙이기
+            for j in range(1, self.n):
+                line = rendering.Line((j * cell, 0), (j * cell, self.m * cell))
+                line.set_color(0, 0, 0)
+                self.viewer.add_geom(line)
 
             # ----------- OX 마크 이미지 생성 및 위치 지정 -------------- #
-            # 9개의 위치에 O,X 모두 위치지정해 놓음 (18장)
+            # 모든 칸에 O,X 모두 위치지정해 놓음 (칸 수 * 2장)
             # 그림파일 위치는 이 파일이 있는 폴더 내부의 img 폴더
-            # 그림 객체 생성
-            self.image_O1 = rendering.Image("img/O.png", 96, 96)
-            # 위치 컨트롤 하는 객체
-            trans_O1 = rendering.Transform(render_loc[0])
-            # 이놈을 이미지에 장착 (이미지를 뷰어에 붙이기 전까진 렌더링 안됨)
-            self.image_O1.add_attr(trans_O1)
-
-            self.image_O2 = rendering.Image("img/O.png", 96, 96)
-            trans_O2 = rendering.Transform(render_loc[1])
-            self.image_O2.add_attr(trans_O2)
-
-            self.image_O3 = rendering.Image("img/O.png", 96, 96)
-            trans_O3 = rendering.Transform(render_loc[2])
-            self.image_O3.add_attr(trans_O3)
+            # 0행이 맨 위, 이미지 중심이 칸 중심에 오도록 위치 지정
+            self.images = {}
+            for r in range(self.m):
+                for c in range(self.n):
+                    loc = (c * cell + cell // 2,
+                           (self.m - 1 - r) * cell + cell // 2)
+                    for mark in ('O', 'X'):
+                        # 그림 객체 생성
+                        image = rendering.Image('img/%s.png' % mark,
+                                                cell - 4, cell - 4)
+                        # 위치 컨트롤 하는 객체를 이미지에 장착
+                        # (이미지를 뷰어에 붙이기 전까진 렌더링 안됨)
+                        image.add_attr(rendering.Transform(loc))
+                        self.images[mark, r, c] = image
 
-            self.image_O4 = rendering.Image("img/O.png", 96, 96)
-            trans_O4 = rendering.Transform(render_loc[3])
-            self.image_O4.add_attr(trans_O4)
-
-            self.image_O5 = rendering.Image("img/O.png", 96, 96)
-            trans_O5 = rendering.Transform(render_loc[4])
-            self.image_O5.add_attr(trans_O5)
-
-            self.image_O6 = rendering.Image("img/O.png", 96, 96)
-            trans_O6 = rendering.Transform(render_loc[5])
-            self.image_O6.add_attr(trans_O6)
-
-            self.image_O7 = rendering.Image("img/O.png", 96, 96)
-            trans_O7 = rendering.Transform(render_loc[6])
-            self.image_O7.add_attr(trans_O7)
-
-            self.image_O8 = rendering.Image("img/O.png", 96, 96)
-            trans_O8 = rendering.Transform(render_loc[7])
-            self.image_O8.add_attr(trans_O8)
-
-            self.image_O9 = rendering.Image("img/O.png", 96, 96)
-            trans_O9 = rendering.Transform(render_loc[8])
-            self.image_O9.add_attr(trans_O9)
-
-            self.image_X1 = rendering.Image("img/X.png", 96, 96)
-            trans_X1 = rendering.Transform(render_loc[0])
-            self.image_X1.add_attr(trans_X1)
-
-            self.image_X2 = rendering.Image("img/X.png", 96, 96)
-            trans_X2 = rendering.Transform(render_loc[1])
-            self.image_X2.add_attr(trans_X2)
-
-            self.image_X3 = rendering.Image("img/X.png", 96, 96)
-            trans_X3 = rendering.Transform(render_loc[2])
-            self.image_X3.add_attr(trans_X3)
+        # ------------ 상태 정보에 맞는 이미지를 뷰어에 붙이는 과정 -------------- #
+        self.mark_X = abs(self.mark_O - 1)  # O가 0이면 X는 1, 1이면 0으로 세팅
+        # 칸마다 O,X가 있는지 확인하여 해당하는 이미지를 뷰어에 붙임 (렌더링 때 보임)
+        for r in range(self.m):
+            for c in range(self.n):
+                if self.state[self.mark_O][r][c] == 1:
+                    self.viewer.add_geom(self.images['O', r, c])
+                elif self.state[self.mark_X][r][c] == 1:
+                    self.viewer.add_geom(self.images['X', r, c])
+        # rgb 모드면 뷰어를 렌더링해서 리턴해라
+        return self.viewer.render(return_rgb_array=mode == 'rgb_array')
 
-            self.image_X4 = rendering.Image("img/X.png", 96, 96)
-            trans_X4 = rendering.Transform(render_loc[3])
-            self.image_X4.add_attr(trans_X4)
 
-            self.image_X5 = rendering.Image("img/X.png", 96, 96)
-            trans_X5 = rendering.Transform(render_loc[4])
-            self.image_X5.add_attr(trans_X5)
+class BitboardTicTacToeEnv(TicTacToeEnv):
+    """비트보드로 동작하는 틱택토 환경 (TicTacToeEnv와 규칙, 보상 동일)
+        state 전체를 27비트 정수 code 하나로 들고 있고 (평면마다 9비트)
+        승리 판정은 방금 둔 쪽 평면의 WIN_TABLE 조회 한번으로 끝냄
+        observe=True면 (3, 3, 3) 배열 하나를 계속 재사용하면서 방금 둔 칸만 써넣음
+         -> reset(), step()이 매번 같은 배열과 같은 info dict를 리턴 (TicTacToeEnv의 재사용 모드와 같음)
+            보관하려면 복사하거나 pack_state로
+        observe=False면 배열 대신 code를 state로 리턴,
+        배열이 필요할 때만 observation()으로 만들어 씀
+    """
 
-            self.image_X6 = rendering.Image("img/X.png", 96, 96)
-            trans_X6 = rendering.Transform(render_loc[5])
-            self.image_X6.add_attr(trans_X6)
+    def __init__(self, observe=True):
+        self.observe = observe
+        self.code = None  # 0번평면 | 1번평면 << 9 | 2번평면 << 18
+        super(BitboardTicTacToeEnv, self).__init__()
+        if observe:
+            self.buffer = np.zeros((self.board_n, self.m, self.n), 'float')
+
+    def observation(self):
+        """현재 비트보드를 (3, 3, 3) float 배열로 새로 만들어 리턴"""
+        return unpack_state(self.code)
+
+    def _reset(self):
+        self.code = 0
+        self.step_count = 0
+        self.viewer = None
+        self.mark_O = None
+        self.mark_X = None
+        if self.observe:
+            self.buffer.fill(0)
+            self.state = self.buffer
+            return self.state
+        self.state = None
+        return self.code
 
-            self.image_X7 = rendering.Image("img/X.png", 96, 96)
-            trans_X7 = rendering.Transform(render_loc[6])
-            self.image_X7.add_attr(trans_X7)
+    def _step(self, action):
+        self.step_count += 1
+        info = self.info
+        info['steps'] = self.step_count
+        who, row, col = action
+        bit = 1 << (row * 3 + col)
+        code = self.code
+        # 규칙 위반 필터링: 액션 자리에 이미 자리가 차있음 (0번, 1번 평면)
+        if (code | code >> 9) & bit:
+            state = self.state if self.observe else code
+            if who == PLAYER:
+                self.outcome_count['illegal_lose'] += 1
+                logger.debug('Illegal Lose! %s', info)
+                return state, -1, True, info
+            elif who == OPPONENT:
+                self.outcome_count['illegal_win'] += 1
+                logger.debug('Illegal Win! %s', info)
+                return state, 1, True, info
+        # 홀수번째 액션은 O표시, 바뀐 칸만 state에 반영
+        code |= bit << 9 * who
+        if self.step_count % 2 == 1:
+            if self.step_count == 1:
+                self.mark_O = who
+            code |= bit << 18
+            if self.observe:
+                self.state[MARK_O, row, col] = 1
+        self.code = code
+        if self.observe:
+            state = self.state
+            state[who, row, col] = 1
+        else:
+            state = code
+        # 승패 체크: 이번 수 전에는 승부가 안 났으므로 방금 둔 쪽 평면만 룩업 테이블 조회
+        if WIN_TABLE[(code >> 9 * who) & 511]:
+            if who == PLAYER:
+                self.outcome_count['win'] += 1
+                logger.debug('You Win! %s', info)
+                return state, 1, True, info
+            self.outcome_count['lose'] += 1
+            logger.debug('You Lose! %s', info)
+            return state, -1, True, info
+        # 반칙이면 이미 끝났으므로 9수째면 보드가 다 참 -> 비김
+        if self.step_count == 9:
+            self.outcome_count['draw'] += 1
+            logger.debug('Draw! %s', info)
+            return state, 0, True, info
+        return state, 0, False, info
+
+    def _render(self, mode='human', close=False):
+        # observe=False면 그릴 때만 배열을 만듦
+        if not close and not self.observe and self.code is not None:
+            self.state = self.observation()
+        return super(BitboardTicTacToeEnv, self)._render(mode, close)
+
+
+class BatchTicTacToeEnv(object):
+    """N개의 틱택토 보드를 한번에 진행하는 배치 환경
+        보드는 (N, 3) 비트보드 배열로 저장 (0번평면, 1번평면, 2번평면)
+        step()은 (N, 3) action 배열을 받아 넘파이 연산 한번으로 N판을 진행,
+        반칙/승패/무승부 판정과 보상은 TicTacToeEnv._step과 동일
+        끝난 보드는 자동으로 리셋되어 리턴되는 state는 새 보드임
+    """
 
-            self.image_X8 = rendering.Image("img/X.png", 96, 96)
-            trans_X8 = rendering.Transform(render_loc[7])
-            self.image_X8.add_attr(trans_X8)
+    def __init__(self, n_envs, observe=True):
+        self.n_envs = n_envs
+        self.observe = observe  # False면 (N,) 27비트 code를 state로 리턴
+        self.board_size = 3
+        self.board_n = 3
+        self.bits = None
+        self.step_count = None
+        self.mark_O = None  # O가 누군지 매칭, 정해지기 전엔 -1
+        self._seed()
 
-            self.image_X9 = rendering.Image("img/X.png", 96, 96)
-            trans_X9 = rendering.Transform(render_loc[8])
-            self.image_X9.add_attr(trans_X9)
+    def _seed(self, seed=None):
+        self.np_random, seed = seeding.np_random(seed)
+        return [seed]
 
-        # ------------ 상태 정보에 맞는 이미지를 뷰어에 붙이는 과정 -------------- #
-        self.mark_X = abs(self.mark_O - 1)  # O가 0이면 X는 1, 1이면 0으로 세팅
-        # 좌표번호마다 O,X가 있는지 확인하여 해당하는 이미지를 뷰어에 붙임 (렌더링 때 보임)
-        if self.state[self.mark_O][0][0] == 1:
-            self.viewer.add_geom(self.image_O1)
-        elif self.state[self.mark_X][0][0] == 1:
-            self.viewer.add_geom(self.image_X1)
-
-        if self.state[self.mark_O][0][1] == 1:
-            self.viewer.add_geom(self.image_O2)
-        elif self.state[self.mark_X][0][1] == 1:
-            self.viewer.add_geom(self.image_X2)
-
-        if self.state[self.mark_O][0][2] == 1:
-            self.viewer.add_geom(self.image_O3)
-        elif self.state[self.mark_X][0][2] == 1:
-            self.viewer.add_geom(self.image_X3)
-
-        if self.state[self.mark_O][1][0] == 1:
-            self.viewer.add_geom(self.image_O4)
-        elif self.state[self.mark_X][1][0] == 1:
-            self.viewer.add_geom(self.image_X4)
-
-        if self.state[self.mark_O][1][1] == 1:
-            self.viewer.add_geom(self.image_O5)
-        elif self.state[self.mark_X][1][1] == 1:
-            self.viewer.add_geom(self.image_X5)
-
-        if self.state[self.mark_O][1][2] == 1:
-            self.viewer.add_geom(self.image_O6)
-        elif self.state[self.mark_X][1][2] == 1:
-            self.viewer.add_geom(self.image_X6)
-
-        if self.state[self.mark_O][2][0] == 1:
-            self.viewer.add_geom(self.image_O7)
-        elif self.state[self.mark_X][2][0] == 1:
-            self.viewer.add_geom(self.image_X7)
-
-        if self.state[self.mark_O][2][1] == 1:
-            self.viewer.add_geom(self.image_O8)
-        elif self.state[self.mark_X][2][1] == 1:
-            self.viewer.add_geom(self.image_X8)
-
-        if self.state[self.mark_O][2][2] == 1:
-            self.viewer.add_geom(self.image_O9)
-        elif self.state[self.mark_X][2][2] == 1:
-            self.viewer.add_geom(self.image_X9)
-        # rgb 모드면 뷰어를 렌더링해서 리턴해라
-        return self.viewer.render(return_rgb_array=mode == 'rgb_array')
+    def seed(self, seed=None):
+        return self._seed(seed)
+
+    def _get_state(self):
+        if self.observe:
+            return BITS_TO_PLANE[self.bits].reshape(
+                self.n_envs, self.board_n, self.board_size, self.board_size)
+        return self.bits[:, PLAYER] | self.bits[:, OPPONENT] << 9 | \
+            self.bits[:, MARK_O] << 18
+
+    def reset(self):
+        self.bits = np.zeros((self.n_envs, self.board_n), 'int64')
+        self.step_count = np.zeros(self.n_envs, 'int64')
+        self.mark_O = np.full(self.n_envs, -1, 'int64')
+        return self._get_state()
+
+    def legal_mask(self):
+        """(N, 9) 빈자리 마스크 (착수 가능하면 True)"""
+        board = self.bits[:, PLAYER] | self.bits[:, OPPONENT]
+        return BITS_TO_PLANE[board] == 0
+
+    def step(self, actions):
+        actions = np.asarray(actions)
+        who = actions[:, 0]
+        bit = 1 << (actions[:, 1] * self.board_size + actions[:, 2])
+        self.step_count += 1
+        rewards = np.zeros(self.n_envs, 'int64')
+        # 규칙 위반 필터링: 플레이어가 하면 반칙패, 상대가 하면 반칙승
+        illegal = ((self.bits[:, PLAYER] | self.bits[:, OPPONENT]) & bit) != 0
+        rewards[illegal & (who == PLAYER)] = -1
+        rewards[illegal & (who == OPPONENT)] = 1
+        legal = np.flatnonzero(~illegal)
+        # 첫 action의 주체가 O, 홀수번째 action은 O표시 평면에도 기록
+        first = legal[self.step_count[legal] == 1]
+        self.mark_O[first] = who[first]
+        mark = legal[self.step_count[legal] % 2 == 1]
+        self.bits[mark, MARK_O] |= bit[mark]
+        self.bits[legal, who[legal]] |= bit[legal]
+        # 승패 체크: 0번평면 먼저, 그 다음 1번평면
+        win = np.zeros(self.n_envs, bool)
+        win[legal] = WIN_ARRAY[self.bits[legal, PLAYER]]
+        lose = np.zeros(self.n_envs, bool)
+        lose[legal] = WIN_ARRAY[self.bits[legal, OPPONENT]] & ~win[legal]
+        rewards[win] = 1
+        rewards[lose] = -1
+        # O표시가 5개면 비김
+        draw = np.zeros(self.n_envs, bool)
+        draw[legal] = POPCOUNT[self.bits[legal, MARK_O]] == 5
+        dones = illegal | win | lose | draw
+        info = {'steps': self.step_count.copy()}
+        # 끝난 보드 자동 리셋
+        self.bits[dones] = 0
+        self.step_count[dones] = 0
+        self.mark_O[dones] = -1
+        return self._get_state(), rewards, dones, info
 
 
 # 테스트용 지워도 무방
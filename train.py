@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+''' NeuralNetwork 학습 ----------------------------------------------------
+# mcts_zero.py가 만든 data/state_memory.hdf5, data/edge_memory.hdf5로 신경망 학습
+# 데이터셋은 파일을 블록 단위로 읽어서 바로 미니배치로 만들어 내보냄 (전체를 메모리에 올리지 않음)
+ DataLoader 워커들은 모든 블록을 같은 순서로 읽고 블록 안의 행을 나눠 가짐 (워커 i: 행 i, i + 워커 수, ...)
+ -> 블록 수가 워커 수보다 적어도 노는 워커가 없음
+# 워커는 기본 2개까지만 쓰고 (데이터 준비는 가벼움) 나머지 코어는 torch 연산 스레드에
+# 학습 target (행 하나 = 에피소드의 한 수)
+ state: 펼친 27칸 -> (3, 3, 3)
+ π: edge의 방문 횟수 N을 정규화 (셀프 플레이 한 판의 행이면 둔 칸만 1)
+ z: 방문한 칸의 W / N (그 수를 둔 쪽 기준 결과: 승 1, 무 0, 패 -1)
+# 손실: (z - v)^2 - π·log(p), weight decay는 optimizer에서
+# augment=True면 행마다 8가지 대칭 중 하나를 랜덤으로 적용 (이미 늘려서 저장한 데이터면 생략)
+# 체크포인트: checkpoint_dir/checkpoint_%04d.pt (epoch마다), resume=True면 마지막 것부터 이어서
+--------------------------------------------------------------- '''
+import argparse
+import glob
+import logging
+import os
+import time
+import numpy as np
+import torch
+from torch.utils.data import DataLoader, IterableDataset, get_worker_info
+
+from tictactoe_env import set_verbosity
+from selfplay_data import STATE_FILE, EDGE_FILE, committed_rows, \
+    iter_blocks, is_augmented
+from symmetry import PERMS, N_SYMMETRY
+from neural_network_cpu import NeuralNetwork
+
+logger = logging.getLogger(__name__)
+
+N, W, Q, P = 0, 1, 2, 3
+CHECKPOINT_DIR = 'data/checkpoints'
+# 기본 DataLoader 워커 수 상한 (블록을 읽어 배치로 자르는 일이라 2개면 학습 속도를 따라감)
+MAX_WORKERS = 2
+
+
+def make_targets(states, edges):
+    '''(M, 27) state, (M, 3, 3, 4) edge 블록을 (state, π, z) 배열로 변환
+       방문 기록이 없는 행은 뺌
+    '''
+    visit = edges[:, :, :, N].reshape(-1, 9)
+    total = visit.sum(axis=1)
+    keep = total > 0
+    pi = visit[keep] / total[keep, None]
+    z = edges[keep][:, :, :, W].reshape(-1, 9).sum(axis=1) / total[keep]
+    states = states[keep].reshape(-1, 3, 3, 3)
+    return (states.astype('float32'), pi.astype('float32'),
+            z.astype('float32')[:, None])
+
+
+def random_symmetry(states, pi, rng):
+    '''행마다 8가지 대칭 중 하나를 랜덤으로 골라 state와 π에 같이 적용'''
+    perms = PERMS[rng.randint(N_SYMMETRY, size=len(states))]
+    rows = np.arange(len(states))[:, None]
+    flat = states.reshape(len(states), 3, 9)
+    states = flat[rows[:, :, None], np.arange(3)[None, :, None],
+                  perms[:, None, :]].reshape(-1, 3, 3, 3)
+    return states, pi[rows, perms]
+
+
+class SelfPlayDataset(IterableDataset):
+    '''셀프 플레이 hdf5를 블록 단위로 읽어 (state, π, z) 미니배치를 내보냄
+       DataLoader(dataset, batch_size=None, num_workers=...)로 사용
+    '''
+
+    def __init__(self, data_dir='data', batch_size=256, block_size=65536,
+                 augment=False, shuffle=True, seed=2018):
+        self.state_path = os.path.join(data_dir, STATE_FILE)
+        self.edge_path = os.path.join(data_dir, EDGE_FILE)
+        self.batch_size = batch_size
+        self.block_size = block_size
+        self.shuffle = shuffle
+        self.seed = seed
+        self.epoch = 0
+        self.rows = committed_rows(data_dir)
+        self.n_blocks = (self.rows + block_size - 1) // block_size
+        # 이미 8가지 대칭으로 늘려서 저장한 데이터면 또 늘리지 않음
+        self.augment = augment and not is_augmented(data_dir)
+
+    def set_epoch(self, epoch):
+        '''epoch마다 블록, 행 순서가 달라지도록 (워커 프로세스에도 전달됨)'''
+        self.epoch = epoch
+
+    def __len__(self):
+        '''epoch당 미니배치 수 (블록 끝의 자투리 배치 포함, 방문 없는 행은 세지 않음)
+           워커가 여럿이면 블록마다 워커별 자투리 배치가 생겨 실제로는 조금 더 많음
+        '''
+        full, rest = divmod(self.rows, self.block_size)
+        per_block = (self.block_size + self.batch_size - 1) // self.batch_size
+        return full * per_block + (rest + self.batch_size - 1) // self.batch_size
+
+    def __iter__(self):
+        info = get_worker_info()
+        worker_id, workers = (0, 1) if info is None else (info.id, info.num_workers)
+        rng = np.random.RandomState(self.seed + self.epoch * 1009 + worker_id)
+        blocks = np.arange(self.n_blocks)
+        if self.shuffle:
+            # 모든 워커가 같은 순서로 섞고 블록마다 자기 몫의 행만 가져감
+            np.random.RandomState(self.seed + self.epoch).shuffle(blocks)
+        blocks = blocks.tolist()
+        shard = (worker_id, workers)
+        state_blocks = iter_blocks(self.state_path, 'state', self.block_size,
+                                   blocks, self.rows, shard)
+        edge_blocks = iter_blocks(self.edge_path, 'edge', self.block_size,
+                                  blocks, self.rows, shard)
+        for states, edges in zip(state_blocks, edge_blocks):
+            states, pi, z = make_targets(states, edges)
+            if self.augment:
+                states, pi = random_symmetry(states, pi, rng)
+            order = rng.permutation(len(states)) if self.shuffle \
+                else np.arange(len(states))
+            for start in range(0, len(order), self.batch_size):
+                batch = order[start:start + self.batch_size]
+                yield (torch.from_numpy(states[batch]),
+                       torch.from_numpy(pi[batch]),
+                       torch.from_numpy(z[batch]))
+
+
+def loss_function(p, v, pi, z):
+    '''AlphaZero 손실: 가치 MSE + 정책 cross entropy (p는 softmax 출력)'''
+    value_loss = ((z - v) ** 2).mean()
+    policy_loss = -(pi * torch.log(p + 1e-8)).sum(dim=1).mean()
+    return value_loss, policy_loss
+
+
+def save_checkpoint(path, net, optimizer, epoch, step):
+    torch.save({'model': net.state_dict(), 'optimizer': optimizer.state_dict(),
+                'epoch': epoch, 'step': step}, path)
+
+
+def latest_checkpoint(checkpoint_dir=CHECKPOINT_DIR):
+    paths = sorted(glob.glob(os.path.join(checkpoint_dir, 'checkpoint_*.pt')))
+    return paths[-1] if paths else None
+
+
+def load_checkpoint(path, net, optimizer=None):
+    '''체크포인트를 불러와 (epoch, step) 리턴'''
+    checkpoint = torch.load(path, map_location='cpu')
+    net.load_state_dict(checkpoint['model'])
+    if optimizer is not None:
+        optimizer.load_state_dict(checkpoint['optimizer'])
+    return checkpoint['epoch'], checkpoint['step']
+
+
+def train(data_dir='data', epochs=10, batch_size=256, lr=0.01,
+          weight_decay=1e-4, workers=None, augment=True,
+          checkpoint_dir=CHECKPOINT_DIR, resume=False, block_size=65536,
+          log_interval=100, seed=2018):
+    '''셀프 플레이 데이터로 NeuralNetwork를 학습하고 (신경망, 마지막 epoch 평균 손실) 리턴
+       workers: DataLoader 워커 수 (기본: CPU 코어 수 - 1, 최대 MAX_WORKERS), 나머지 코어는 torch 연산에
+    '''
+    torch.manual_seed(seed)
+    cores = os.cpu_count() or 1
+    if workers is None:
+        workers = min(max(cores - 1, 0), MAX_WORKERS)
+    torch.set_num_threads(max(cores - workers, 1))
+    net = NeuralNetwork()
+    optimizer = torch.optim.SGD(net.parameters(), lr=lr, momentum=0.9,
+                                weight_decay=weight_decay)
+    start_epoch = step = 0
+    if resume and latest_checkpoint(checkpoint_dir):
+        start_epoch, step = load_checkpoint(latest_checkpoint(checkpoint_dir),
+                                            net, optimizer)
+        logger.info('resume from epoch: %d step: %d', start_epoch, step)
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    dataset = SelfPlayDataset(data_dir, batch_size, block_size, augment,
+                              seed=seed)
+    loss = (0., 0.)
+    for epoch in range(start_epoch, epochs):
+        dataset.set_epoch(epoch)
+        loader = DataLoader(dataset, batch_size=None, num_workers=workers)
+        net.train()
+        total = np.zeros(2)
+        rows = 0
+        start = time.perf_counter()
+        for states, pi, z in loader:
+            p, v = net(states)
+            value_loss, policy_loss = loss_function(p, v, pi, z)
+            optimizer.zero_grad()
+            (value_loss + policy_loss).backward()
+            optimizer.step()
+            step += 1
+            total += np.array([value_loss.item(), policy_loss.item()]) * len(z)
+            rows += len(z)
+            if log_interval and step % log_interval == 0:
+                logger.debug('step: %d value loss: %.4f policy loss: %.4f',
+                             step, value_loss.item(), policy_loss.item())
+        loss = tuple(total / max(rows, 1))
+        elapsed = time.perf_counter() - start
+        logger.info('epoch: %d value loss: %.4f policy loss: %.4f '
+                    'rows/sec: %.0f', epoch + 1, loss[0], loss[1],
+                    rows / max(elapsed, 1e-9))
+        save_checkpoint(os.path.join(checkpoint_dir,
+                                     'checkpoint_%04d.pt' % (epoch + 1)),
+                        net, optimizer, epoch + 1, step)
+    return net, loss
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-v', '--verbose', action='store_const', const=2,
+                        default=1, dest='verbosity', help='step마다 손실 출력')
+    parser.add_argument('-q', '--quiet', action='store_const', const=0,
+                        dest='verbosity', help='출력 없이 실행')
+    parser.add_argument('--data-dir', default='data')
+    parser.add_argument('--epochs', type=int, default=10)
+    parser.add_argument('--batch-size', type=int, default=256)
+    parser.add_argument('--lr', type=float, default=0.01)
+    parser.add_argument('--weight-decay', type=float, default=1e-4)
+    parser.add_argument('--workers', type=int, default=None,
+                        help='DataLoader 워커 수 (기본: CPU 코어 수 - 1, 최대 %d)'
+                             % MAX_WORKERS)
+    parser.add_argument('--no-augment', action='store_true',
+                        help='대칭 augmentation 끄기')
+    parser.add_argument('--checkpoint-dir', default=CHECKPOINT_DIR)
+    parser.add_argument('--resume', action='store_true',
+                        help='마지막 체크포인트부터 이어서 학습')
+    parser.add_argument('--block-size', type=int, default=65536,
+                        help='파일에서 한번에 읽을 행 수')
+    parser.add_argument('--seed', type=int, default=2018)
+    args = parser.parse_args()
+    set_verbosity(args.verbosity)
+    train(args.data_dir, args.epochs, args.batch_size, args.lr,
+          args.weight_decay, args.workers, not args.no_augment,
+          args.checkpoint_dir, args.resume, args.block_size, seed=args.seed)